@@ -26,6 +26,8 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 
 from api.db.database import Base  # noqa: E402
+# tables the api itself never imports
+import api.db.models.imports  # noqa: E402, F401
 
 target_metadata = Base.metadata
 # target_metadata = None
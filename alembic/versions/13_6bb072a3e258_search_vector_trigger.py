@@ -0,0 +1,91 @@
+"""search vector trigger
+
+Revision ID: 6bb072a3e258
+Revises: dddd1d8c6f8b
+Create Date: 2026-10-18 16:12:53.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '6bb072a3e258'
+down_revision: Union[str, None] = 'dddd1d8c6f8b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+# to_tsvector over array_to_string is not immutable, so the vector can not be a
+# generated column. The trigger keeps file_config and search_vector in sync with
+# file_language and file_text and skips updates that change neither.
+CREATE_TRIGGER = """
+CREATE FUNCTION file_text_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.file_config := NEW.file_language::regconfig;
+    IF TG_OP = 'UPDATE'
+        AND NEW.file_text IS NOT DISTINCT FROM OLD.file_text
+        AND NEW.file_config = OLD.file_config THEN
+        NEW.search_vector := OLD.search_vector;
+        RETURN NEW;
+    END IF;
+    IF NEW.file_text IS NULL THEN
+        NEW.search_vector := NULL;
+    ELSE
+        NEW.search_vector := to_tsvector(NEW.file_config, array_to_string(NEW.file_text, ' '));
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER file_text_search_vector
+    BEFORE INSERT OR UPDATE OF file_text, file_language, search_vector ON file_text
+    FOR EACH ROW EXECUTE FUNCTION file_text_search_vector();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER file_text_search_vector ON file_text;
+DROP FUNCTION file_text_search_vector();
+"""
+
+# rebuilds the rows in id order, one committed batch at a time
+BACKFILL = sa.text("""
+WITH batch AS (
+    SELECT id FROM file_text WHERE id > :last_id ORDER BY id LIMIT :batch_size
+)
+UPDATE file_text SET
+    file_config = file_language::regconfig,
+    search_vector = CASE WHEN file_text IS NULL THEN NULL
+        ELSE to_tsvector(file_language::regconfig, array_to_string(file_text, ' ')) END
+FROM batch WHERE file_text.id = batch.id
+RETURNING file_text.id
+""")
+
+
+def backfill() -> None:
+    bind = op.get_bind()
+    last_id = '00000000-0000-0000-0000-000000000000'
+    with op.get_context().autocommit_block():
+        while True:
+            ids = bind.execute(BACKFILL, {'last_id': last_id, 'batch_size': BACKFILL_BATCH_SIZE}).scalars().all()
+            if not ids:
+                break
+            last_id = max(ids)
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.add_column('file_text', sa.Column('file_config', postgresql.REGCONFIG(), server_default=sa.text("'english'::regconfig"), nullable=False))
+    # ### end Alembic commands ###
+    op.execute(CREATE_TRIGGER)
+    backfill()
+
+
+def downgrade() -> None:
+    op.execute(DROP_TRIGGER)
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_column('file_text', 'file_config')
+    # ### end Alembic commands ###
@@ -0,0 +1,173 @@
+"""per page search configs
+
+Revision ID: 0e0155552881
+Revises: bd7e10b590b6
+Create Date: 2026-10-18 11:06:02.308880
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0e0155552881'
+down_revision: Union[str, None] = 'bd7e10b590b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the search vector is concatenated from one to_tsvector per page, each page in
+# its own config. Without page_configs the whole text uses file_config as before.
+SEARCH_VECTOR_TRIGGER = """
+CREATE OR REPLACE FUNCTION file_text_search_vector() RETURNS trigger AS $$
+DECLARE
+    page integer;
+BEGIN
+    NEW.file_config := NEW.file_language::regconfig;
+    IF TG_OP = 'UPDATE'
+        AND NEW.file_text IS NOT DISTINCT FROM OLD.file_text
+        AND NEW.file_config = OLD.file_config
+        AND NEW.page_configs IS NOT DISTINCT FROM OLD.page_configs THEN
+        NEW.search_vector := OLD.search_vector;
+        RETURN NEW;
+    END IF;
+    IF NEW.file_text IS NULL THEN
+        NEW.search_vector := NULL;
+    ELSIF NEW.page_configs IS NULL THEN
+        NEW.search_vector := to_tsvector(NEW.file_config, array_to_string(NEW.file_text, ' '));
+    ELSE
+        NEW.search_vector := ''::tsvector;
+        FOR page IN 1 .. cardinality(NEW.file_text) LOOP
+            NEW.search_vector := NEW.search_vector || to_tsvector(
+                coalesce(NEW.page_configs[page], NEW.file_config),
+                coalesce(NEW.file_text[page], '')
+            );
+        END LOOP;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER file_text_search_vector ON file_text;
+CREATE TRIGGER file_text_search_vector
+    BEFORE INSERT OR UPDATE OF file_text, file_language, page_configs, search_vector ON file_text
+    FOR EACH ROW EXECUTE FUNCTION file_text_search_vector();
+"""
+
+SYNC_PAGES_TRIGGER = """
+CREATE OR REPLACE FUNCTION file_text_sync_pages() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND NEW.file_text IS NOT DISTINCT FROM OLD.file_text
+        AND NEW.file_config = OLD.file_config
+        AND NEW.page_configs IS NOT DISTINCT FROM OLD.page_configs THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO file_pages (file_id, page_no, user_id, text, page_config)
+    SELECT NEW.file_id, page.page_no, NEW.user_id, page.text,
+        coalesce(NEW.page_configs[page.page_no], NEW.file_config)
+    FROM unnest(NEW.file_text) WITH ORDINALITY AS page(text, page_no)
+    ON CONFLICT (file_id, page_no) DO UPDATE
+        SET text = EXCLUDED.text, page_config = EXCLUDED.page_config
+        WHERE file_pages.text IS DISTINCT FROM EXCLUDED.text
+            OR file_pages.page_config <> EXCLUDED.page_config;
+    DELETE FROM file_pages
+    WHERE file_id = NEW.file_id AND page_no > coalesce(cardinality(NEW.file_text), 0);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER file_text_sync_pages ON file_text;
+CREATE TRIGGER file_text_sync_pages
+    AFTER INSERT OR UPDATE OF file_text, file_language, page_configs ON file_text
+    FOR EACH ROW EXECUTE FUNCTION file_text_sync_pages();
+"""
+
+# the query OR'ed over the distinct configs, used to match mixed language documents
+CREATE_QUERY_FUNCTION = """
+CREATE FUNCTION websearch_to_tsquery_any(configs regconfig[], query text) RETURNS tsquery AS $$
+DECLARE
+    config regconfig;
+    result tsquery;
+BEGIN
+    FOR config IN SELECT DISTINCT c FROM unnest(configs) AS c WHERE c IS NOT NULL LOOP
+        IF result IS NULL THEN
+            result := websearch_to_tsquery(config, query);
+        ELSE
+            result := result || websearch_to_tsquery(config, query);
+        END IF;
+    END LOOP;
+    RETURN result;
+END
+$$ LANGUAGE plpgsql STABLE;
+"""
+
+# the functions and triggers of migration 13 and 14
+DOWNGRADE_TRIGGERS = """
+DROP FUNCTION websearch_to_tsquery_any(regconfig[], text);
+
+CREATE OR REPLACE FUNCTION file_text_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.file_config := NEW.file_language::regconfig;
+    IF TG_OP = 'UPDATE'
+        AND NEW.file_text IS NOT DISTINCT FROM OLD.file_text
+        AND NEW.file_config = OLD.file_config THEN
+        NEW.search_vector := OLD.search_vector;
+        RETURN NEW;
+    END IF;
+    IF NEW.file_text IS NULL THEN
+        NEW.search_vector := NULL;
+    ELSE
+        NEW.search_vector := to_tsvector(NEW.file_config, array_to_string(NEW.file_text, ' '));
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER file_text_search_vector ON file_text;
+CREATE TRIGGER file_text_search_vector
+    BEFORE INSERT OR UPDATE OF file_text, file_language, search_vector ON file_text
+    FOR EACH ROW EXECUTE FUNCTION file_text_search_vector();
+
+CREATE OR REPLACE FUNCTION file_text_sync_pages() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND NEW.file_text IS NOT DISTINCT FROM OLD.file_text
+        AND NEW.file_config = OLD.file_config THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO file_pages (file_id, page_no, user_id, text, page_config)
+    SELECT NEW.file_id, page.page_no, NEW.user_id, page.text, NEW.file_config
+    FROM unnest(NEW.file_text) WITH ORDINALITY AS page(text, page_no)
+    ON CONFLICT (file_id, page_no) DO UPDATE
+        SET text = EXCLUDED.text, page_config = EXCLUDED.page_config
+        WHERE file_pages.text IS DISTINCT FROM EXCLUDED.text
+            OR file_pages.page_config <> EXCLUDED.page_config;
+    DELETE FROM file_pages
+    WHERE file_id = NEW.file_id AND page_no > coalesce(cardinality(NEW.file_text), 0);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER file_text_sync_pages ON file_text;
+CREATE TRIGGER file_text_sync_pages
+    AFTER INSERT OR UPDATE OF file_text, file_language ON file_text
+    FOR EACH ROW EXECUTE FUNCTION file_text_sync_pages();
+"""
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.add_column('file_text', sa.Column('page_configs', sa.ARRAY(postgresql.REGCONFIG()), nullable=True))
+    # ### end Alembic commands ###
+    op.execute(SEARCH_VECTOR_TRIGGER)
+    op.execute(SYNC_PAGES_TRIGGER)
+    op.execute(CREATE_QUERY_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute(DOWNGRADE_TRIGGERS)
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_column('file_text', 'page_configs')
+    # ### end Alembic commands ###
@@ -0,0 +1,43 @@
+"""scope content hashes by user
+
+Revision ID: 0c75ffc102d1
+Revises: e4833a486b30
+Create Date: 2026-10-18 12:05:41.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c75ffc102d1'
+down_revision: Union[str, None] = 'e4833a486b30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('content_hashes', sa.Column('user_id', sa.UUID(), nullable=True))
+    # the owner of the source file, other users lose the shared entry
+    op.execute(
+        "UPDATE content_hashes SET user_id = files.user_id"
+        " FROM files WHERE files.id = content_hashes.file_id"
+    )
+    op.execute("DELETE FROM content_hashes WHERE user_id IS NULL")
+    op.alter_column('content_hashes', 'user_id', nullable=False)
+    op.drop_constraint('content_hashes_pkey', 'content_hashes', type_='primary')
+    op.create_primary_key('content_hashes_pkey', 'content_hashes', ['user_id', 'sha256'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('content_hashes_pkey', 'content_hashes', type_='primary')
+    # keep the oldest entry of every hash
+    op.execute(
+        "DELETE FROM content_hashes a USING content_hashes b"
+        " WHERE a.sha256 = b.sha256"
+        " AND (a.created_on, a.user_id) > (b.created_on, b.user_id)"
+    )
+    op.create_primary_key('content_hashes_pkey', 'content_hashes', ['sha256'])
+    op.drop_column('content_hashes', 'user_id')
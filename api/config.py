@@ -1,6 +1,7 @@
-from os import environ as env
+from os import environ as env, cpu_count
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
+from sqlalchemy.engine import make_url
 
 
 load_dotenv(find_dotenv())
@@ -9,8 +10,141 @@ load_dotenv(find_dotenv())
 DEV_MODE: bool = env.get("DEV_MODE", False)
 VERSION: str = env.get("version", "0.0.1")
 DATABASE_URI: str = env.get("DATABASE_URI")
+# asyncpg url used by the api, defaults to DATABASE_URI with the asyncpg driver
+ASYNC_DATABASE_URI: str = env.get(
+    "ASYNC_DATABASE_URI",
+    make_url(DATABASE_URI).set(drivername="postgresql+asyncpg") if DATABASE_URI else None,
+)
+DB_POOL_SIZE: int = int(env.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW: int = int(env.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT: int = int(env.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE: int = int(env.get("DB_POOL_RECYCLE", 1800))
 SECRET_KEY: str = env.get("SECRET_KEY")
 if SECRET_KEY is None:
     raise Exception("SECRET_KEY must not be none!!!")
+# verified tokens and their users are cached for this many seconds, 0 disables it
+AUTH_CACHE_TTL: float = float(env.get("AUTH_CACHE_TTL", 60))
+AUTH_CACHE_SIZE: int = int(env.get("AUTH_CACHE_SIZE", 10000))
 
 BASE_FILE_DIR: Path = Path(env.get("BASE_FILE_DIR", "files")).absolute()
+# uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE: int = int(env.get("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+# 0 disables the limit
+MAX_UPLOAD_SIZE_MB: int = int(env.get("MAX_UPLOAD_SIZE_MB", 0))
+# pdfs per bulk upload, including those inside zip archives
+BULK_UPLOAD_MAX_FILES: int = int(env.get("BULK_UPLOAD_MAX_FILES", 1000))
+# uncompressed size of all pdfs of a bulk upload, a small zip can unpack to a
+# lot. 0 disables the limit
+BULK_UPLOAD_MAX_SIZE_MB: int = int(env.get("BULK_UPLOAD_MAX_SIZE_MB", 4096))
+
+# stored files, "local" keeps them below BASE_FILE_DIR, "s3" in a bucket
+STORAGE_BACKEND: str = env.get("STORAGE_BACKEND", "local")
+# look up files in the flat BASE_FILE_DIR/<id> layout used before sharding,
+# can be disabled once they are moved, see api/modules/storage/migrate.py
+STORAGE_LEGACY_FALLBACK: bool = env.get("STORAGE_LEGACY_FALLBACK", "true") == "true"
+# s3 compatible object storage, e.g. minio with S3_ENDPOINT_URL=http://localhost:9000
+# without keys boto3 falls back to its own configuration
+S3_BUCKET: str = env.get("S3_BUCKET", "edms")
+S3_PREFIX: str = env.get("S3_PREFIX", "files/")
+S3_ENDPOINT_URL: str | None = env.get("S3_ENDPOINT_URL")
+S3_REGION: str | None = env.get("S3_REGION")
+S3_ACCESS_KEY_ID: str | None = env.get("S3_ACCESS_KEY_ID")
+S3_SECRET_ACCESS_KEY: str | None = env.get("S3_SECRET_ACCESS_KEY")
+# local copies of the stored objects, which ocr and rendering work on
+STORAGE_CACHE_DIR: Path = Path(
+    env.get("STORAGE_CACHE_DIR", Path(BASE_FILE_DIR, ".cache", "storage"))
+).absolute()
+STORAGE_CACHE_SIZE_MB: int = int(env.get("STORAGE_CACHE_SIZE_MB", 4096))
+
+# file listings
+FILE_LIST_MAX_LIMIT: int = int(env.get("FILE_LIST_MAX_LIMIT", 1000))
+# rows fetched per round trip while a listing is streamed
+FILE_LIST_BATCH_SIZE: int = int(env.get("FILE_LIST_BATCH_SIZE", 100))
+
+# full text search
+SEARCH_MAX_LIMIT: int = int(env.get("SEARCH_MAX_LIMIT", 100))
+# see ts_headline in the postgres docs
+SEARCH_HEADLINE_OPTIONS: str = env.get(
+    "SEARCH_HEADLINE_OPTIONS",
+    'MaxFragments=3, MinWords=5, MaxWords=20, FragmentDelimiter=" ... "',
+)
+
+# background ocr job queue
+OCR_WORKERS: int = int(env.get("OCR_WORKERS", cpu_count() or 1))
+OCR_JOB_POLL_INTERVAL: float = float(env.get("OCR_JOB_POLL_INTERVAL", 2.0))
+OCR_JOB_MAX_ATTEMPTS: int = int(env.get("OCR_JOB_MAX_ATTEMPTS", 3))
+# seconds without a heartbeat after which a running job is considered abandoned,
+# e.g. by a machine that went down. The pools renew it every requeue interval
+OCR_JOB_TIMEOUT: int = int(env.get("OCR_JOB_TIMEOUT", 3600))
+# seconds between two checks of the pool for abandoned jobs
+OCR_JOB_REQUEUE_INTERVAL: float = float(env.get("OCR_JOB_REQUEUE_INTERVAL", 60))
+
+# bulk importer, see api/importer.py
+IMPORT_WORKERS: int = int(env.get("IMPORT_WORKERS", OCR_WORKERS))
+# files waiting between two stages of the import pipeline
+IMPORT_QUEUE_SIZE: int = int(env.get("IMPORT_QUEUE_SIZE", 256))
+# files written to the db per transaction
+IMPORT_BATCH_SIZE: int = int(env.get("IMPORT_BATCH_SIZE", 100))
+# seconds between two progress reports
+IMPORT_REPORT_INTERVAL: float = float(env.get("IMPORT_REPORT_INTERVAL", 10))
+
+# page parallel ocr
+# cores shared by all concurrently running ocr jobs
+OCR_CORE_BUDGET: int = int(env.get("OCR_CORE_BUDGET", cpu_count() or 1))
+# max cores a single job may use
+OCR_JOB_CORES: int = int(env.get("OCR_JOB_CORES", OCR_CORE_BUDGET))
+OCR_SHARD_PAGES: int = int(env.get("OCR_SHARD_PAGES", 8))
+# documents with less pages are ocred in one piece
+OCR_SHARD_MIN_PAGES: int = int(env.get("OCR_SHARD_MIN_PAGES", 16))
+# pages with less characters in their text layer are ocred if they are covered
+# by images to at least this share, see api/modules/ocr/classify.py
+OCR_PAGE_MIN_CHARS: int = int(env.get("OCR_PAGE_MIN_CHARS", 32))
+OCR_PAGE_MIN_IMAGE_COVERAGE: float = float(env.get("OCR_PAGE_MIN_IMAGE_COVERAGE", 0.25))
+# ocred pages are cached by their content and the ocr settings, 0 disables it
+OCR_PAGE_CACHE_DIR: Path = Path(
+    env.get("OCR_PAGE_CACHE_DIR", Path(BASE_FILE_DIR, ".cache", "ocr_pages"))
+).absolute()
+OCR_PAGE_CACHE_SIZE_MB: int = int(env.get("OCR_PAGE_CACHE_SIZE_MB", 1024))
+
+# deferred size optimization of the stored pdfs
+# local hours optimization jobs are claimed in, e.g. "22-6", empty for always
+OPTIMIZE_HOURS: str = env.get("OPTIMIZE_HOURS", "22-6")
+OPTIMIZE_JPEG_QUALITY: int = int(env.get("OPTIMIZE_JPEG_QUALITY", 75))
+# smaller gains are not worth replacing the stored file
+OPTIMIZE_MIN_GAIN: float = float(env.get("OPTIMIZE_MIN_GAIN", 0.05))
+
+# rasterizing compression, see api/modules/file/compress.py
+COMPRESS_DPI: int = int(env.get("COMPRESS_DPI", 100))
+COMPRESS_JPEG_QUALITY: int = int(env.get("COMPRESS_JPEG_QUALITY", 75))
+COMPRESS_WORKERS: int = int(env.get("COMPRESS_WORKERS", cpu_count() or 1))
+# documents with less pages are rendered in process
+COMPRESS_PARALLEL_MIN_PAGES: int = int(env.get("COMPRESS_PARALLEL_MIN_PAGES", 8))
+
+# page previews, named sizes as name:width in pixels
+PREVIEW_SIZES: dict[str, int] = {
+    name: int(width)
+    for name, width in (
+        size.split(":")
+        for size in env.get("PREVIEW_SIZES", "thumbnail:256,preview:1024").split(",")
+    )
+}
+# rendered right after the upload, for the first page
+PREVIEW_EAGER_SIZES: list[str] = env.get("PREVIEW_EAGER_SIZES", "thumbnail").split(",")
+# webp or jpeg
+PREVIEW_FORMAT: str = env.get("PREVIEW_FORMAT", "webp")
+PREVIEW_QUALITY: int = int(env.get("PREVIEW_QUALITY", 80))
+PREVIEW_CACHE_DIR: Path = Path(
+    env.get("PREVIEW_CACHE_DIR", Path(BASE_FILE_DIR, ".cache", "previews"))
+).absolute()
+PREVIEW_CACHE_SIZE_MB: int = int(env.get("PREVIEW_CACHE_SIZE_MB", 512))
+# seconds browsers may keep a preview, they never change for the same url
+PREVIEW_MAX_AGE: int = int(env.get("PREVIEW_MAX_AGE", 365 * 24 * 3600))
+
+# pdf text extraction
+EXTRACT_WORKERS: int = int(env.get("EXTRACT_WORKERS", cpu_count() or 1))
+EXTRACT_SHARD_PAGES: int = int(env.get("EXTRACT_SHARD_PAGES", 64))
+# documents with less pages are extracted in process
+EXTRACT_PARALLEL_MIN_PAGES: int = int(env.get("EXTRACT_PARALLEL_MIN_PAGES", 256))
+# extracted documents kept in memory, 0 disables the cache
+EXTRACT_CACHE_SIZE: int = int(env.get("EXTRACT_CACHE_SIZE", 16))
+EXTRACT_CACHE_TTL: float = float(env.get("EXTRACT_CACHE_TTL", 300))
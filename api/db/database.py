@@ -1,10 +1,10 @@
 import sys
+from typing import AsyncIterator
 
 sys.path.append(".")
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.orm.session import Session as DB
+from sqlalchemy.ext.asyncio import AsyncSession as DB
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 
 from api import config
@@ -12,30 +12,24 @@ from api import config
 Base = declarative_base()
 
 
-SessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=create_engine(config.DATABASE_URI)
+engine = create_async_engine(
+    config.ASYNC_DATABASE_URI,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
+    pool_recycle=config.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+
+# expire_on_commit=False, async sessions can not lazy load expired attributes
+SessionLocal = async_sessionmaker(
+    bind=engine, autoflush=False, expire_on_commit=False
 )
 
 
-def db(func):
-    def wrapper(*args, **kwargs):
-        try:
-            close = False
-            if "db" in kwargs and not isinstance(kwargs["db"], DB):
-                raise Exception(
-                    f"Invalid argument db type passed to {func.__name__} required type: sqlalchemy.orm.session.Session - passed type: {type(kwargs['db']).__name__}"
-                )
-
-            else:
-                kwargs["db"] = db = SessionLocal()
-                close = True
-
-            return func(*args, **kwargs)
-        finally:
-            try:
-                if close:
-                    db.close()
-            except Exception:
-                pass
-
-    return wrapper
+async def get_db() -> AsyncIterator[DB]:
+    """
+    FastAPI dependency, one session per request shared by all dependencies
+    """
+    async with SessionLocal() as db:
+        yield db
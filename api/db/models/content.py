@@ -0,0 +1,86 @@
+import sys
+
+from sqlalchemy import Column, UUID, String, DateTime, func, ForeignKey, select
+from sqlalchemy.dialects.postgresql import insert
+
+sys.path.append(".")
+from api.db.database import DB, Base
+from api.db.models.users import User
+
+
+class ContentHash(Base):
+    """
+    Content addressed index of processed files, per user. Maps the sha256 of
+    an uploaded pdf to the user's first file with these bytes whose text is in
+    the db. Never shared between users, a hit would tell that another user has
+    the document and link their files into the uploader's.
+    """
+
+    __tablename__ = "content_hashes"
+
+    user_id: UUID = Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    sha256: str = Column(String(length=64), primary_key=True, nullable=False)
+    file_id: UUID = Column(UUID(as_uuid=True), ForeignKey("files.id"), nullable=False)
+
+    created_on: DateTime = Column(DateTime(), nullable=False, server_default=func.now())
+
+    @staticmethod
+    async def get(user: User, sha256: str, db: DB) -> "ContentHash | None":
+        return await db.scalar(
+            select(ContentHash).where(
+                ContentHash.user_id == user.id, ContentHash.sha256 == sha256
+            )
+        )
+
+    @staticmethod
+    async def get_many(user: User, hashes: list[str], db: DB) -> dict[str, UUID]:
+        """
+        The file ids of the known hashes among hashes
+        """
+        if not hashes:
+            return {}
+
+        rows = await db.execute(
+            select(ContentHash.sha256, ContentHash.file_id).where(
+                ContentHash.user_id == user.id,
+                ContentHash.sha256.in_(set(hashes)),
+            )
+        )
+        return {row.sha256: row.file_id for row in rows}
+
+    @staticmethod
+    async def register(user: User, sha256: str, file_id: UUID, db: DB) -> None:
+        # the first processed file stays the source for its hash
+        await db.execute(
+            insert(ContentHash)
+            .values(user_id=user.id, sha256=sha256, file_id=file_id)
+            .on_conflict_do_nothing(
+                index_elements=[ContentHash.user_id, ContentHash.sha256]
+            )
+        )
+        await db.commit()
+
+    @staticmethod
+    async def register_many(
+        user: User, files: list[tuple[str, UUID]], db: DB, commit: bool = True
+    ) -> None:
+        """
+        files are (sha256, file_id) of files of user, see register
+        """
+        if not files:
+            return
+
+        await db.execute(
+            insert(ContentHash)
+            .values(
+                [
+                    {"user_id": user.id, "sha256": sha256, "file_id": file_id}
+                    for sha256, file_id in files
+                ]
+            )
+            .on_conflict_do_nothing(
+                index_elements=[ContentHash.user_id, ContentHash.sha256]
+            )
+        )
+        if commit:
+            await db.commit()
@@ -1,5 +1,6 @@
 import sys
-from typing import Self
+from functools import reduce
+from typing import AsyncIterator, Self
 
 import jwt
 import uuid
@@ -13,25 +14,31 @@ from sqlalchemy import (
     String,
     DateTime,
     Boolean,
+    Integer,
     Text,
+    Computed,
     func,
     ForeignKey,
 )
-from sqlalchemy.orm import relationship, Mapped
+from sqlalchemy import select, insert, update, literal, null, false, tuple_, cast, Row
+from sqlalchemy import column, values
+from sqlalchemy import FetchedValue, text as sql_text
+from sqlalchemy.orm import relationship, Mapped, aliased
 
 # from sqlalchemy_utils.types import TSVectorType
 # from sqlalchemy_searchable import make_searchable, search
 # from werkzeug.security import check_password_hash, generate_password_hash
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.dialects.postgresql import TSVECTOR
-from sqlalchemy.orm import joinedload
+from sqlalchemy.dialects.postgresql import TSVECTOR, REGCONFIG
+from sqlalchemy.orm import joinedload, noload
+from sqlalchemy.orm.attributes import set_committed_value
 
 sys.path.append(".")
-from api.modules.language.detect_language import detect_language
+from api.modules.language.detect_language import detect_page_languages
 from api.modules.language.languages import Languages
 from logger import get_logger
-from api.config import SECRET_KEY
-from api.db.database import db, DB, Base
+from api.config import SECRET_KEY, FILE_LIST_BATCH_SIZE, SEARCH_HEADLINE_OPTIONS
+from api.db.database import DB, Base
 from api.db.models.users import User
 from api.exceptions.db import ServerDBException
 from api.exceptions.base import ServerHTTPException
@@ -39,6 +46,22 @@ from api.exceptions.base import ServerHTTPException
 logger = get_logger()
 
 
+def any_language_query(text: str):
+    """
+    websearch_to_tsquery of the text OR'ed over all languages.
+
+    It does not depend on the row, so postgres can use a gin index for it and
+    recheck the query in the language of the row afterwards.
+    """
+    return reduce(
+        lambda left, right: left.op("||")(right),
+        [
+            func.websearch_to_tsquery(cast(language.value, REGCONFIG), text)
+            for language in Languages
+        ],
+    )
+
+
 class FileText(Base):
     __tablename__ = "file_text"
     # enable full text seach on the file_text
@@ -67,11 +90,23 @@ class FileText(Base):
         String(length=31), nullable=False, server_default=Languages.ENGLISH
     )
 
+    # text search configuration of file_language, set by the trigger below
+    file_config: str = Column(
+        REGCONFIG,
+        nullable=False,
+        server_default=sql_text("'english'::regconfig"),
+        server_onupdate=FetchedValue(),
+    )
+
     # Full-text search vector
+    # maintained by the file_text_search_vector trigger from file_text and
+    # file_config, see alembic migration 13. NULL until the text is known.
     _search_vector = Column(
         TSVECTOR,
         name="search_vector",
-        nullable=False,
+        nullable=True,
+        server_default=FetchedValue(),
+        server_onupdate=FetchedValue(),
     )
 
     @hybrid_property
@@ -80,7 +115,47 @@ class FileText(Base):
 
     @search_vector.expression
     def search_vector(cls):
-        return func.to_tsvector("german", func.array_to_string(cls.file_text, " "))
+        # the stored vector, so that queries hit the gin index
+        return cls._search_vector
+
+    # language of each page, NULL when all pages are in file_language. The
+    # trigger builds the search vector page by page in these configs.
+    page_configs: list[str] = Column(ARRAY(REGCONFIG), nullable=True)
+
+    @hybrid_property
+    def text_search_config(self) -> Languages:
+        return self.file_language
+
+    @text_search_config.expression
+    def text_search_config(cls):
+        return cls.file_config
+
+    @hybrid_property
+    def text_search_configs(self) -> list[str]:
+        return [self.file_language, *(self.page_configs or [])]
+
+    @text_search_configs.expression
+    def text_search_configs(cls):
+        # document config first, websearch_to_tsquery_any ignores duplicates
+        return func.array_prepend(cls.file_config, cls.page_configs)
+
+    @staticmethod
+    def detect_languages(text: list[str]) -> tuple[Languages, list[str] | None]:
+        """
+        Document language and the config of every page, detected once per page
+        """
+        document, pages = detect_page_languages(text)
+        page_configs = [page["language"].value for page in pages]
+        if all(config == document["language"].value for config in page_configs):
+            page_configs = None
+
+        return document["language"], page_configs
+
+    @staticmethod
+    def page_configs_value(page_configs: list[str] | None):
+        if page_configs is None:
+            return null()
+        return cast(literal(page_configs, ARRAY(Text)), ARRAY(REGCONFIG))
 
     created_on: DateTime = Column(DateTime(), nullable=False, server_default=func.now())
     last_modified_on: DateTime = Column(DateTime(), nullable=True, onupdate=func.now())
@@ -94,92 +169,280 @@ class FileText(Base):
         uselist=False,
     )
 
-    @db
     @staticmethod
-    def new(file_id: UUID, user: User, db: DB = DB) -> UUID:
-        id = uuid.uuid4()
-        file_text = FileText()
-
-        file_text.id = id
-        file_text.file_id = file_id
-        file_text.user_id = user.id
-        file_text.file_text = [""]
-        file_text._search_vector = FileText.generate_ts_search_vector(
-            file_text.file_text
-        )
-
-        db.add(file_text)
-        db.commit()
+    def insert_for(
+        new_file,
+        text: list[str] | None = None,
+        language: Languages | None = None,
+        copy_text_from: UUID | None = None,
+    ):
+        """
+        INSERT ... SELECT of the text row for the file inserted by the new_file cte.
+
+        Without text the row stays empty until the ocr writes it, with
+        copy_text_from the text and language of that file are taken over.
+        The search vector is built by the trigger.
+        """
+        columns = [
+            "id",
+            "file_id",
+            "user_id",
+            "deleted",
+            "file_text",
+            "file_language",
+            "page_configs",
+        ]
+
+        if copy_text_from is not None:
+            source = aliased(FileText)
+            rows = select(
+                literal(uuid.uuid4(), UUID(as_uuid=True)),
+                new_file.c.id,
+                new_file.c.user_id,
+                false(),
+                source.file_text,
+                func.coalesce(source.file_language, Languages.ENGLISH.value),
+                source.page_configs,
+            ).select_from(new_file.outerjoin(source, source.file_id == copy_text_from))
+        elif text is not None:
+            page_configs = None
+            if language is None:
+                language, page_configs = FileText.detect_languages(text)
+            rows = select(
+                literal(uuid.uuid4(), UUID(as_uuid=True)),
+                new_file.c.id,
+                new_file.c.user_id,
+                false(),
+                literal(text, ARRAY(Text)),
+                literal(language.value, String),
+                FileText.page_configs_value(page_configs),
+            )
+        else:
+            rows = select(
+                literal(uuid.uuid4(), UUID(as_uuid=True)),
+                new_file.c.id,
+                new_file.c.user_id,
+                false(),
+                null(),
+                literal(Languages.ENGLISH.value, String),
+                null(),
+            )
+
+        return insert(FileText).from_select(columns, rows)
 
-        return id
-
-    @classmethod
-    def create(cls, file_id: UUID, user: User) -> Self:
-        id = cls.new(file_id, user)
+    @staticmethod
+    async def get(id: UUID, user: User, db: DB) -> "FileText":
+        return await db.scalar(
+            select(FileText).where(FileText.id == id, FileText.user_id == user.id)
+        )
 
-        return cls.get(id)
+    @staticmethod
+    async def get_by_file_id(id: UUID, user: User, db: DB) -> "FileText":
+        return await db.scalar(
+            select(FileText).where(FileText.file_id == id, FileText.user_id == user.id)
+        )
 
-    @db
     @staticmethod
-    def get(id: UUID, user: User, db: DB) -> "FileText":
-        return (
-            db.query(FileText)
-            .filter(FileText.id == id, FileText.user_id == user.id)
-            .first()
+    async def has_text(id: UUID, user: User, db: DB) -> bool:
+        """
+        Whether the text of the file was written, by the ocr or copied from a
+        duplicate, without loading it
+        """
+        return bool(
+            await db.scalar(
+                select(FileText.file_text.is_not(None)).where(
+                    FileText.file_id == id, FileText.user_id == user.id
+                )
+            )
         )
 
-    @db
     @staticmethod
-    def get_by_file_id(id: UUID, user: User, db: DB) -> "FileText":
+    def ranked_query(user: User, text: str):
+        """
+        Matching text rows ordered by ts_rank_cd, the text is parsed with
+        websearch_to_tsquery in the language of each document
+        """
+        # the text in the language of the document and of each of its pages
+        document_query = func.websearch_to_tsquery_any(
+            FileText.text_search_configs, text
+        )
+        any_language = any_language_query(text)
+        rank = func.ts_rank_cd(FileText._search_vector, document_query)
+
         return (
-            db.query(FileText)
-            .filter(FileText.file_id == id, FileText.user_id == user.id)
-            .first()
+            select(FileText.id, FileText.file_id, rank.label("rank"))
+            .where(
+                FileText.user_id == user.id,
+                FileText._search_vector.op("@@")(any_language),
+                FileText._search_vector.op("@@")(document_query),
+            )
+            .order_by(rank.desc(), FileText.file_id)
         )
 
     @staticmethod
-    def generate_ts_search_vector(text: list[str], language: Languages) -> str:
-        con = func.array_to_string(text, " ")
-        return func.to_tsvector(language.language_name, con)
+    async def search(
+        user: User, text: str, db: DB, limit: int, offset: int = 0
+    ) -> list[Row]:
+        """
+        One page of ranked hits, the snippets are only built for this page
+        """
+        hits = FileText.ranked_query(user, text).limit(limit).offset(offset).subquery()
+        headline = func.ts_headline(
+            FileText.text_search_config,
+            func.array_to_string(FileText.file_text, " "),
+            func.websearch_to_tsquery(FileText.text_search_config, text),
+            SEARCH_HEADLINE_OPTIONS,
+        )
 
-    @db
-    @staticmethod
-    def find_by_text(user: User, text: str, db: DB) -> list[Self]:
-        res = list()
-        for element in (
-            db.query(FileText)
-            .where(FileText.search_vector.match(text))
-            .filter(FileText.user_id == user.id)
-            .all()
-        ):
-            res.append(element)
-
-        return res
-
-    @db
-    def update_file_text(self, text: list[str], db: DB = DB) -> Self:
-        self.file_text = text
-        self.file_language = detect_language(self.file_text)
-        self._search_vector = self.generate_ts_search_vector(text, self.file_language)
-        db.add(self)
-        db.commit()
-        db.refresh(self)
+        res = await db.execute(
+            select(
+                hits.c.file_id,
+                Files.filename,
+                FileText.file_language,
+                hits.c.rank,
+                headline.label("headline"),
+            )
+            .select_from(hits)
+            .join(FileText, FileText.id == hits.c.id)
+            .join(Files, Files.id == hits.c.file_id)
+            .order_by(hits.c.rank.desc(), hits.c.file_id)
+        )
+
+        return list(res)
+
+    async def update_file_text(self, text: list[str], db: DB) -> Self:
+        language, page_configs = FileText.detect_languages(text)
+        # one UPDATE ... RETURNING instead of a flush followed by a refresh,
+        # config and search vector are set by the trigger
+        file_config, page_configs, search_vector, last_modified_on = (
+            await db.execute(
+                update(FileText)
+                .where(FileText.id == self.id)
+                .values(
+                    {
+                        FileText.file_text: text,
+                        FileText.file_language: language,
+                        FileText.page_configs: FileText.page_configs_value(
+                            page_configs
+                        ),
+                    }
+                )
+                .returning(
+                    FileText.file_config,
+                    FileText.page_configs,
+                    FileText._search_vector,
+                    FileText.last_modified_on,
+                ),
+                execution_options={"synchronize_session": False},
+            )
+        ).one()
+        await db.commit()
+
+        set_committed_value(self, "file_text", text)
+        set_committed_value(self, "file_language", language)
+        set_committed_value(self, "file_config", file_config)
+        set_committed_value(self, "page_configs", page_configs)
+        set_committed_value(self, "_search_vector", search_vector)
+        set_committed_value(self, "last_modified_on", last_modified_on)
 
         return self
 
-    @db
-    def delete(self, db: DB) -> Self:
+    async def delete(self, db: DB) -> Self:
         self.deleted = True
         self.deleted_on = datetime.datetime.now()
 
         db.add(self)
-        db.commit()
+        await db.commit()
 
         return self
 
 
+class FilePage(Base):
+    """
+    One row per page of a file_text, kept in sync with file_text.file_text by
+    the file_text_sync_pages trigger, see alembic migration 14. Only pages
+    whose text changed are rewritten.
+    """
+
+    __tablename__ = "file_pages"
+    __table_args__ = (
+        Index("ix_file_pages_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+    file_id: UUID = Column(
+        UUID(as_uuid=True), ForeignKey("files.id"), primary_key=True, nullable=False
+    )
+    # starts at 1 like the postgres array it is taken from
+    page_no: int = Column(Integer(), primary_key=True, nullable=False)
+    user_id: UUID = Column(UUID(as_uuid=True), nullable=False, index=True)
+
+    text: str = Column(Text(), nullable=True)
+    page_config: str = Column(REGCONFIG, nullable=False)
+    search_vector = Column(
+        TSVECTOR,
+        Computed("to_tsvector(page_config, coalesce(text, ''))", persisted=True),
+    )
+
+    @staticmethod
+    def ranked_query(user: User, text: str):
+        """
+        Matching pages ordered by ts_rank_cd, parsed in the language of each page
+        """
+        page_query = func.websearch_to_tsquery(FilePage.page_config, text)
+        rank = func.ts_rank_cd(FilePage.search_vector, page_query)
+
+        return (
+            select(FilePage.file_id, FilePage.page_no, rank.label("rank"))
+            .where(
+                FilePage.user_id == user.id,
+                FilePage.search_vector.op("@@")(any_language_query(text)),
+                FilePage.search_vector.op("@@")(page_query),
+            )
+            .order_by(rank.desc(), FilePage.file_id, FilePage.page_no)
+        )
+
+    @staticmethod
+    async def search(
+        user: User, text: str, db: DB, limit: int, offset: int = 0
+    ) -> list[Row]:
+        """
+        One page of ranked page hits, the snippets are only built for this page
+        """
+        hits = FilePage.ranked_query(user, text).limit(limit).offset(offset).subquery()
+        headline = func.ts_headline(
+            FilePage.page_config,
+            FilePage.text,
+            func.websearch_to_tsquery(FilePage.page_config, text),
+            SEARCH_HEADLINE_OPTIONS,
+        )
+
+        res = await db.execute(
+            select(
+                hits.c.file_id,
+                hits.c.page_no,
+                Files.filename,
+                hits.c.rank,
+                headline.label("headline"),
+            )
+            .select_from(hits)
+            .join(
+                FilePage,
+                (FilePage.file_id == hits.c.file_id)
+                & (FilePage.page_no == hits.c.page_no),
+            )
+            .join(Files, Files.id == hits.c.file_id)
+            .order_by(hits.c.rank.desc(), hits.c.file_id, hits.c.page_no)
+        )
+
+        return list(res)
+
+
 class Files(Base):
     __tablename__ = "files"
+    # keyset pagination of a users files
+    __table_args__ = (
+        Index("ix_files_user_id_created_on_id", "user_id", "created_on", "id"),
+    )
 
     id: UUID = Column(
         UUID(as_uuid=True),
@@ -191,6 +454,8 @@ class Files(Base):
     user_id: UUID = Column(UUID(as_uuid=True), nullable=False, index=True, unique=False)
 
     filename: str = Column(String(length=255), nullable=False, index=True)
+    # sha256 of the uploaded bytes, used to detect duplicate uploads
+    sha256: str = Column(String(length=64), nullable=True, index=True)
     # Will be added later in the project
     # document_type: Mapped[DocumentType] = relationship(
     #     "DocumentType",
@@ -212,56 +477,222 @@ class Files(Base):
     )
 
     @classmethod
-    @db
-    def new(
-        cls, user: User, filename: str, id: None | UUID = None, db: DB = None
+    async def new(
+        cls,
+        user: User,
+        filename: str,
+        db: DB,
+        id: None | UUID = None,
+        sha256: str | None = None,
+        text: list[str] | None = None,
+        language: Languages | None = None,
+        copy_text_from: UUID | None = None,
+        commit: bool = True,
     ) -> Self:
+        """
+        Inserts the file and its text row in one statement and returns both.
+
+        With commit=False the caller can add more work, e.g. the ocr job,
+        to the same transaction.
+        """
         if id is None:
             id = uuid.uuid4()
 
-        file = cls()
+        new_file = (
+            insert(Files)
+            .values(
+                {
+                    Files.id: id,
+                    Files.user_id: user.id,
+                    Files.filename: filename,
+                    Files.sha256: sha256,
+                    # python side defaults can not be used inside a cte
+                    Files.deleted: False,
+                }
+            )
+            .returning(*Files.__table__.c)
+            .cte("new_file")
+        )
+        new_file_text = (
+            FileText.insert_for(new_file, text, language, copy_text_from)
+            .returning(*FileText.__table__.c)
+            .cte("new_file_text")
+        )
 
-        file.id = id
-        file.user_id = user.id
-        file.filename = filename
+        file_entity = aliased(Files, new_file)
+        file_text_entity = aliased(FileText, new_file_text)
+        file, file_text = (
+            await db.execute(
+                select(file_entity, file_text_entity).select_from(
+                    new_file.join(
+                        new_file_text, new_file_text.c.file_id == new_file.c.id
+                    )
+                )
+            )
+        ).one()
 
-        db.add(file)
-        db.commit()
-        FileText.new(id, user)
+        set_committed_value(file, "file_text", file_text)
+        set_committed_value(file_text, "file", file)
 
-        db.refresh(file)
+        if commit:
+            await db.commit()
 
         return file
 
-    @db
-    def get_without_text(user: User, id: UUID, db: DB) -> "Files":
-        return db.query(Files).filter(Files.id == id, Files.user_id == user.id).first()
+    @staticmethod
+    async def bulk_new(
+        user: User,
+        files: list[tuple[UUID, str, str | None, UUID | None]],
+        db: DB,
+        texts: dict[UUID, tuple[list[str], Languages, list[str] | None]] | None = None,
+        commit: bool = True,
+    ) -> None:
+        """
+        Inserts many files and their text rows, with one multi row insert each.
+
+        files are (id, filename, sha256, copy_text_from), see Files.new.
+        texts are the known texts by file id, with the document language and
+        the page configs from FileText.detect_languages.
+        """
+        texts = texts or {}
+        if not files:
+            return
+
+        await db.execute(
+            insert(Files),
+            [
+                {
+                    "id": id,
+                    "user_id": user.id,
+                    "filename": filename,
+                    "sha256": sha256,
+                    "deleted": False,
+                }
+                for id, filename, sha256, _ in files
+            ],
+        )
+
+        # without a known text empty until the ocr writes them
+        rows = []
+        for id, _, _, copy_text_from in files:
+            if copy_text_from is not None:
+                continue
+            text, language, page_configs = texts.get(
+                id, (None, Languages.ENGLISH, None)
+            )
+            rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "file_id": id,
+                    "user_id": user.id,
+                    "deleted": False,
+                    "file_text": text,
+                    "file_language": language,
+                    "page_configs": page_configs,
+                }
+            )
+        if rows:
+            await db.execute(insert(FileText), rows)
+
+        copies = [
+            (uuid.uuid4(), id, copy_text_from)
+            for id, _, _, copy_text_from in files
+            if copy_text_from is not None
+        ]
+        if copies:
+            pairs = values(
+                column("id", UUID(as_uuid=True)),
+                column("file_id", UUID(as_uuid=True)),
+                column("source_id", UUID(as_uuid=True)),
+                name="copies",
+            ).data(copies)
+            source = aliased(FileText)
+            rows = select(
+                pairs.c.id,
+                pairs.c.file_id,
+                literal(user.id, UUID(as_uuid=True)),
+                false(),
+                source.file_text,
+                func.coalesce(source.file_language, Languages.ENGLISH.value),
+                source.page_configs,
+            ).select_from(pairs.outerjoin(source, source.file_id == pairs.c.source_id))
+            await db.execute(
+                insert(FileText).from_select(
+                    [
+                        "id",
+                        "file_id",
+                        "user_id",
+                        "deleted",
+                        "file_text",
+                        "file_language",
+                        "page_configs",
+                    ],
+                    rows,
+                )
+            )
+
+        if commit:
+            await db.commit()
 
-    @db
     @staticmethod
-    def get_with_text(user: User, id: UUID, db: DB) -> "Files":
-        return (
-            db.query(Files)
+    async def get_without_text(user: User, id: UUID, db: DB) -> "Files":
+        return await db.scalar(
+            select(Files)
+            .options(noload(Files.file_text))
+            .where(Files.id == id, Files.user_id == user.id)
+        )
+
+    @staticmethod
+    async def get_with_text(user: User, id: UUID, db: DB) -> "Files":
+        return await db.scalar(
+            select(Files)
             .options(joinedload(Files.file_text))
-            .filter(Files.id == id, Files.user_id == user.id)
-            .first()
+            .where(Files.id == id, Files.user_id == user.id)
         )
 
     @staticmethod
-    def find_by_text(user: User, text: str) -> list[UUID]:
-        return [file.id for file in FileText.find_by_text(user, text)]
+    async def find_by_text(
+        user: User, text: str, db: DB, limit: int, offset: int = 0
+    ) -> list[UUID]:
+        query = FileText.ranked_query(user, text).limit(limit).offset(offset)
+
+        return [row.file_id for row in await db.execute(query)]
 
-    @db
     @staticmethod
-    def list_all_without_text(user: User, db: DB) -> list["Files"]:
-        return db.query(Files).filter(Files.user_id == user.id).all()
+    def list_page_query(
+        user: User,
+        limit: int,
+        after: tuple[datetime.datetime, UUID] | None = None,
+        with_text: bool = False,
+    ):
+        """
+        Keyset page over (created_on, id), only the listed columns are selected
+        """
+        columns = [Files.id, Files.filename, Files.created_on]
+        if with_text:
+            columns += [FileText.file_language, FileText.file_text]
+
+        query = select(*columns).where(Files.user_id == user.id)
+        if with_text:
+            query = query.outerjoin(FileText, FileText.file_id == Files.id)
+        if after is not None:
+            query = query.where(tuple_(Files.created_on, Files.id) > tuple_(*after))
+
+        return query.order_by(Files.created_on, Files.id).limit(limit)
 
-    @db
     @staticmethod
-    def list_all_with_text(user: User, db: DB) -> list["Files"]:
-        return (
-            db.query(Files)
-            .options(joinedload(Files.file_text))
-            .filter(Files.user_id == user.id)
-            .all()
+    async def stream_page(
+        user: User,
+        db: DB,
+        limit: int,
+        after: tuple[datetime.datetime, UUID] | None = None,
+        with_text: bool = False,
+    ) -> AsyncIterator[Row]:
+        # server side cursor, rows are fetched in batches while they are sent
+        result = await db.stream(
+            Files.list_page_query(user, limit, after, with_text).execution_options(
+                yield_per=FILE_LIST_BATCH_SIZE
+            )
         )
+        async for row in result:
+            yield row
@@ -0,0 +1,105 @@
+import sys
+
+from sqlalchemy import (
+    Column,
+    UUID,
+    BigInteger,
+    String,
+    Text,
+    DateTime,
+    func,
+    ForeignKey,
+    select,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+sys.path.append(".")
+from api.db.database import DB, Base
+
+
+class ImportCheckpoint(Base):
+    """
+    Files imported by the bulk importer, see api/importer.py. Written together
+    with the files, an interrupted import skips them when it is run again,
+    unless their size or mtime changed.
+    """
+
+    __tablename__ = "import_checkpoints"
+
+    user_id: UUID = Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    path: str = Column(Text(), primary_key=True, nullable=False)
+    size: int = Column(BigInteger(), nullable=False)
+    mtime_ns: int = Column(BigInteger(), nullable=False)
+    sha256: str = Column(String(length=64), nullable=False)
+    file_id: UUID = Column(UUID(as_uuid=True), ForeignKey("files.id"), nullable=False)
+
+    created_on: DateTime = Column(DateTime(), nullable=False, server_default=func.now())
+
+    @staticmethod
+    async def imported(
+        user_id: UUID, files: list[tuple[str, int, int]], db: DB
+    ) -> set[str]:
+        """
+        The paths among files, given as (path, size, mtime_ns), that were
+        imported and did not change since
+        """
+        if not files:
+            return set()
+
+        rows = await db.execute(
+            select(
+                ImportCheckpoint.path, ImportCheckpoint.size, ImportCheckpoint.mtime_ns
+            ).where(
+                ImportCheckpoint.user_id == user_id,
+                ImportCheckpoint.path.in_([path for path, _, _ in files]),
+            )
+        )
+        checkpoints = {row.path: (row.size, row.mtime_ns) for row in rows}
+
+        return {
+            path
+            for path, size, mtime_ns in files
+            if checkpoints.get(path) == (size, mtime_ns)
+        }
+
+    @staticmethod
+    async def add_many(
+        user_id: UUID,
+        files: list[tuple[str, int, int, str, UUID]],
+        db: DB,
+        commit: bool = True,
+    ) -> None:
+        """
+        files are (path, size, mtime_ns, sha256, file_id), a changed file
+        replaces its checkpoint
+        """
+        if not files:
+            return
+
+        statement = insert(ImportCheckpoint).values(
+            [
+                {
+                    "user_id": user_id,
+                    "path": path,
+                    "size": size,
+                    "mtime_ns": mtime_ns,
+                    "sha256": sha256,
+                    "file_id": file_id,
+                }
+                for path, size, mtime_ns, sha256, file_id in files
+            ]
+        )
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[ImportCheckpoint.user_id, ImportCheckpoint.path],
+                set_={
+                    "size": statement.excluded.size,
+                    "mtime_ns": statement.excluded.mtime_ns,
+                    "sha256": statement.excluded.sha256,
+                    "file_id": statement.excluded.file_id,
+                    "created_on": func.now(),
+                },
+            )
+        )
+        if commit:
+            await db.commit()
@@ -0,0 +1,349 @@
+import sys
+import uuid
+import datetime
+from enum import StrEnum
+
+from sqlalchemy import (
+    select,
+    insert,
+    update,
+    Column,
+    UUID,
+    Index,
+    String,
+    DateTime,
+    Boolean,
+    Integer,
+    Text,
+    Float,
+    func,
+    ForeignKey,
+)
+
+sys.path.append(".")
+from logger import get_logger
+from api.config import OCR_JOB_MAX_ATTEMPTS, OPTIMIZE_HOURS
+from api.db.database import DB, Base
+from api.db.models.users import User
+from api.modules.ocr.ocr import OcrProfile
+
+logger = get_logger()
+
+
+class JobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class JobKind(StrEnum):
+    OCR = "ocr"
+    # thumbnails of the first page, see api/modules/file/preview.py
+    PREVIEW = "preview"
+    # size optimization of the stored pdf, runs after the text is committed
+    OPTIMIZE = "optimize"
+
+
+# lower runs first, like nice values. Previews are cheap and wanted right away
+JOB_PRIORITY: dict[JobKind, int] = {
+    JobKind.PREVIEW: -10,
+    JobKind.OCR: 0,
+    JobKind.OPTIMIZE: 10,
+}
+
+
+def off_peak(hour: int | None = None, hours: str = OPTIMIZE_HOURS) -> bool:
+    """
+    hours like "22-6", local time, the end hour is excluded. Empty means always.
+    """
+    if not hours:
+        return True
+
+    hour = datetime.datetime.now().hour if hour is None else hour
+    start, end = (int(h) for h in hours.split("-"))
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def claimable_kinds() -> list[JobKind]:
+    # optimization is cpu heavy and not urgent, it waits for the off peak hours
+    if off_peak():
+        return [JobKind.PREVIEW, JobKind.OCR, JobKind.OPTIMIZE]
+    return [JobKind.PREVIEW, JobKind.OCR]
+
+
+class OcrJob(Base):
+    __tablename__ = "ocr_jobs"
+    # the workers poll for the oldest queued job with the lowest priority value
+    __table_args__ = (
+        Index(
+            "ix_ocr_jobs_status_priority_created_on",
+            "status",
+            "priority",
+            "created_on",
+        ),
+    )
+
+    id: UUID = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        index=True,
+        nullable=False,
+        default=uuid.uuid4,
+    )
+    file_id: UUID = Column(
+        UUID(as_uuid=True),
+        ForeignKey("files.id"),
+        nullable=False,
+        index=True,
+    )
+    user_id: UUID = Column(UUID(as_uuid=True), nullable=False, index=True)
+
+    kind: JobKind = Column(
+        String(length=31), nullable=False, server_default=JobKind.OCR
+    )
+    priority: int = Column(
+        Integer(), nullable=False, server_default=str(JOB_PRIORITY[JobKind.OCR])
+    )
+    status: JobStatus = Column(
+        String(length=31), nullable=False, server_default=JobStatus.QUEUED
+    )
+    force_ocr: bool = Column(Boolean(), nullable=False, default=False)
+    profile: OcrProfile = Column(
+        String(length=31), nullable=False, server_default=OcrProfile.ARCHIVAL
+    )
+    attempts: int = Column(Integer(), nullable=False, default=0)
+    worker: str = Column(String(length=255), nullable=True)
+    error: str = Column(Text(), nullable=True)
+    # set once done, to compare the profiles
+    ocr_pages: int = Column(Integer(), nullable=True)
+    ocr_seconds: float = Column(Float(), nullable=True)
+
+    created_on: DateTime = Column(DateTime(), nullable=False, server_default=func.now())
+    started_on: DateTime = Column(DateTime(), nullable=True)
+    finished_on: DateTime = Column(DateTime(), nullable=True)
+    # renewed by the pool of the worker while it is alive, see heartbeat
+    heartbeat_on: DateTime = Column(DateTime(), nullable=True)
+    last_modified_on: DateTime = Column(DateTime(), nullable=True, onupdate=func.now())
+
+    @staticmethod
+    async def enqueue(
+        file_id: UUID,
+        user: User,
+        db: DB,
+        force_ocr: bool = False,
+        profile: OcrProfile = OcrProfile.ARCHIVAL,
+        kind: JobKind = JobKind.OCR,
+        commit: bool = True,
+    ) -> "OcrJob":
+        job = OcrJob()
+
+        job.id = uuid.uuid4()
+        job.file_id = file_id
+        job.user_id = user.id
+        job.kind = kind
+        job.priority = JOB_PRIORITY[kind]
+        job.status = JobStatus.QUEUED
+        job.force_ocr = force_ocr
+        job.profile = profile
+        job.attempts = 0
+
+        db.add(job)
+        if not commit:
+            # committed by the caller, together with the file
+            return job
+
+        await db.commit()
+        await db.refresh(job)
+
+        return job
+
+    @staticmethod
+    async def enqueue_many(
+        file_ids: list[UUID],
+        user: User,
+        db: DB,
+        force_ocr: bool = False,
+        profile: OcrProfile = OcrProfile.ARCHIVAL,
+        kind: JobKind = JobKind.OCR,
+        commit: bool = True,
+    ) -> list[UUID]:
+        """
+        Queues a job for every file with one multi row insert, returns their ids
+        """
+        ids = [uuid.uuid4() for _ in file_ids]
+        if not ids:
+            return ids
+
+        await db.execute(
+            insert(OcrJob),
+            [
+                {
+                    "id": id,
+                    "file_id": file_id,
+                    "user_id": user.id,
+                    "kind": kind,
+                    "priority": JOB_PRIORITY[kind],
+                    "status": JobStatus.QUEUED,
+                    "force_ocr": force_ocr,
+                    "profile": profile,
+                    "attempts": 0,
+                }
+                for id, file_id in zip(ids, file_ids)
+            ],
+        )
+        if commit:
+            await db.commit()
+
+        return ids
+
+    @staticmethod
+    async def get(id: UUID, user: User, db: DB) -> "OcrJob":
+        return await db.scalar(
+            select(OcrJob).where(OcrJob.id == id, OcrJob.user_id == user.id)
+        )
+
+    @staticmethod
+    async def get_latest_by_file_id(
+        file_id: UUID, user: User, db: DB, kind: JobKind = JobKind.OCR
+    ) -> "OcrJob":
+        return await db.scalar(
+            select(OcrJob)
+            .where(
+                OcrJob.file_id == file_id,
+                OcrJob.user_id == user.id,
+                OcrJob.kind == kind,
+            )
+            .order_by(OcrJob.created_on.desc())
+            .limit(1)
+        )
+
+    @staticmethod
+    async def claim(
+        worker: str, db: DB, kinds: list[JobKind] | None = None
+    ) -> "OcrJob | None":
+        if kinds is None:
+            kinds = claimable_kinds()
+
+        # SKIP LOCKED lets every worker grab a different job without blocking
+        job: OcrJob | None = await db.scalar(
+            select(OcrJob)
+            .where(OcrJob.status == JobStatus.QUEUED, OcrJob.kind.in_(kinds))
+            .order_by(OcrJob.priority, OcrJob.created_on)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+
+        if job is None:
+            return None
+
+        job.status = JobStatus.RUNNING
+        job.worker = worker
+        job.attempts += 1
+        job.started_on = datetime.datetime.now()
+        job.heartbeat_on = job.started_on
+
+        await db.commit()
+
+        return job
+
+    @staticmethod
+    async def heartbeat(workers: list[str], db: DB) -> None:
+        """
+        Marks the running jobs of workers as alive, however long they take
+        """
+        await db.execute(
+            update(OcrJob)
+            .where(OcrJob.status == JobStatus.RUNNING, OcrJob.worker.in_(workers))
+            .values({OcrJob.heartbeat_on: datetime.datetime.now()})
+        )
+        await db.commit()
+
+    @staticmethod
+    async def requeue_stale(
+        timeout: int, db: DB, worker: str | None = None
+    ) -> tuple[int, int]:
+        """
+        Queues the running jobs without a heartbeat for more than timeout
+        seconds, e.g. of a machine that went down, or those of worker after it
+        died, again. A job that used up its attempts fails instead, so a job
+        that kills its worker is not retried forever.
+
+        Returns the number of requeued and of failed jobs.
+        """
+        stale = [OcrJob.status == JobStatus.RUNNING]
+        if worker is None:
+            deadline = datetime.datetime.now() - datetime.timedelta(seconds=timeout)
+            stale.append(OcrJob.heartbeat_on < deadline)
+        else:
+            stale.append(OcrJob.worker == worker)
+
+        requeued = await db.execute(
+            update(OcrJob)
+            .where(*stale, OcrJob.attempts < OCR_JOB_MAX_ATTEMPTS)
+            .values({OcrJob.status: JobStatus.QUEUED, OcrJob.worker: None})
+        )
+        failed = await db.execute(
+            update(OcrJob)
+            .where(*stale, OcrJob.attempts >= OCR_JOB_MAX_ATTEMPTS)
+            .values(
+                {
+                    OcrJob.status: JobStatus.FAILED,
+                    OcrJob.worker: None,
+                    OcrJob.finished_on: datetime.datetime.now(),
+                    OcrJob.error: "the worker died or timed out in every attempt",
+                }
+            )
+        )
+        await db.commit()
+
+        return requeued.rowcount, failed.rowcount
+
+    async def finish(self, worker: str, db: DB) -> bool:
+        """
+        Unless the job was taken from worker in the meantime, e.g. requeued as
+        stale, marks it done. Returns whether it did.
+        """
+        return await self._update_claimed(
+            worker,
+            db,
+            status=JobStatus.DONE,
+            error=None,
+            finished_on=datetime.datetime.now(),
+        )
+
+    async def fail(self, error: str, worker: str, db: DB) -> bool:
+        """
+        The failure of a job still claimed by worker, see finish
+        """
+        # retry until the attempts are used up
+        if self.attempts < OCR_JOB_MAX_ATTEMPTS:
+            values = {"status": JobStatus.QUEUED}
+        else:
+            values = {
+                "status": JobStatus.FAILED,
+                "finished_on": datetime.datetime.now(),
+            }
+
+        return await self._update_claimed(
+            worker, db, error=error, worker=None, **values
+        )
+
+    async def _update_claimed(self, claimed_by: str, db: DB, **values) -> bool:
+        result = await db.execute(
+            update(OcrJob)
+            .where(
+                OcrJob.id == self.id,
+                OcrJob.worker == claimed_by,
+                OcrJob.status == JobStatus.RUNNING,
+            )
+            .values(**values)
+        )
+        await db.commit()
+
+        if result.rowcount == 0:
+            logger.warning(f"job {self.id} is no longer claimed by {claimed_by}")
+            return False
+        return True
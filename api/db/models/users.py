@@ -4,19 +4,26 @@ import jwt
 import uuid
 import datetime
 from fastapi import status
-from sqlalchemy import Column, UUID, String, DateTime, Boolean, func
+from sqlalchemy import Column, UUID, String, DateTime, Boolean, func, select
+from sqlalchemy.orm import make_transient_to_detached
 from werkzeug.security import check_password_hash, generate_password_hash
 
 
 sys.path.append(".")
 from logger import get_logger
-from api.config import SECRET_KEY
-from api.db.database import db, DB, Base
+from api.config import SECRET_KEY, AUTH_CACHE_SIZE, AUTH_CACHE_TTL
+from api.db.database import DB, Base
 from api.exceptions.db import ServerDBException
 from api.exceptions.base import ServerHTTPException
+from api.modules.cache.ttl import TTLCache
 
 logger = get_logger()
 
+# verified tokens -> user id and user id -> user, per process.
+# Every change of a user has to invalidate them, see User.invalidate_cache
+_token_cache: TTLCache[str, uuid.UUID] = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+_user_cache: TTLCache[uuid.UUID, "User"] = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -35,11 +42,10 @@ class User(Base):
         return check_password_hash(self.password_hash, password)
     
 
-    @db
     @staticmethod
-    def new(username: str, password: str, db: DB) -> UUID:
+    async def new(username: str, password: str, db: DB) -> UUID:
 
-        if User.username_present(username):
+        if await User.username_present(username, db):
             raise ServerHTTPException(status.HTTP_400_BAD_REQUEST, detail="User with this username is allready present")
         
         user = User()
@@ -48,32 +54,30 @@ class User(Base):
         user.password_hash = generate_password_hash(password)
 
         db.add(user)
-        db.commit()
+        await db.commit()
 
         return user.id
 
-    @db
     @staticmethod
-    def username_present(username: str, db: DB) -> bool:
-        user: User | None = db.query(User).filter(User.username == username).first()
+    async def username_present(username: str, db: DB) -> bool:
+        user: User | None = await db.scalar(select(User).where(User.username == username))
 
         return user is not None
     
-    @db
     @staticmethod
-    def update_username_by_id(id: UUID, username: str, db: DB) -> "User":
-        user = User.get_user_by_id(id, db=db)
+    async def update_username_by_id(id: UUID, username: str, db: DB) -> "User":
+        user = await User.get_user_by_id(id, db)
         user.username = username
 
         db.add(user)
-        db.commit()
+        await db.commit()
+        User.invalidate_cache(id)
 
         return user
 
-    @db
     @staticmethod
-    def get_user_by_token(token: str, db: DB) -> "User":
-        user: User = db.query(User).filter(User.id == token).first()
+    async def get_user_by_token(token: str, db: DB) -> "User":
+        user: User = await db.scalar(select(User).where(User.id == token))
 
         if user is None:
             raise ServerHTTPException(
@@ -83,10 +87,9 @@ class User(Base):
 
         return user
     
-    @db
     @staticmethod
-    def get_user_by_id(id: uuid.UUID, db) -> "User":
-        user: User = db.query(User).filter(User.id == id).first()
+    async def get_user_by_id(id: uuid.UUID, db: DB) -> "User":
+        user: User = await db.scalar(select(User).where(User.id == id))
 
         if user is None:
             raise ServerDBException(
@@ -95,10 +98,9 @@ class User(Base):
 
         return user
     
-    @db
     @staticmethod
-    def get_user_by_username(username: str, db):
-        user = db.query(User).filter(User.username == username).first()
+    async def get_user_by_username(username: str, db: DB):
+        user = await db.scalar(select(User).where(User.username == username))
         
         if user is None:
             raise ServerHTTPException(
@@ -108,18 +110,33 @@ class User(Base):
 
         return user
     
-    @db
-    def delete(self, db: DB):
+    async def delete(self, db: DB):
         self.deleted = True
         self.deleted_on = datetime.datetime.now()
-        db.commit()
+        db.add(self)
+        await db.commit()
+        User.invalidate_cache(self.id, tokens=True)
 
-    @db
-    def update_password(self, password: str, db: DB):
+    @staticmethod
+    async def delete_by_id(id: UUID, db: DB) -> "User":
+        user = await User.get_user_by_id(id, db)
+        await user.delete(db)
+
+        return user
 
-        self.password = generate_password_hash(password)
+    async def update_password(self, password: str, db: DB):
+
+        self.password_hash = generate_password_hash(password)
         db.add(self)
-        db.commit()
+        await db.commit()
+        User.invalidate_cache(self.id, tokens=True)
+
+    @staticmethod
+    async def update_password_by_id(id: UUID, password: str, db: DB) -> "User":
+        user = await User.get_user_by_id(id, db)
+        await user.update_password(password, db)
+
+        return user
 
     def generate_token(self, expires_in=3600) -> str:
         
@@ -133,9 +150,7 @@ class User(Base):
         )
 
     @staticmethod
-    def verify_auth_token(token) -> uuid.UUID|bool:
-        if len(token) == 0:
-            return False
+    def decode_auth_token(token: str) -> tuple[uuid.UUID, datetime.datetime]:
         try:
             data: dict = jwt.decode(
                 token,
@@ -143,9 +158,8 @@ class User(Base):
                 leeway=datetime.timedelta(seconds=10),
                 algorithms=["HS256"]
             )
-            user_id = uuid.UUID(data.get('confirm'))
-            User.get_user_by_id(user_id)
-            return user_id
+            expires = datetime.datetime.fromtimestamp(data["exp"], tz=datetime.timezone.utc)
+            return uuid.UUID(data.get('confirm')), expires
 
         except jwt.ExpiredSignatureError as ex:
             logger.error(ex)
@@ -155,5 +169,41 @@ class User(Base):
             logger.error(ex)
             raise ServerHTTPException(403, {"sucess": False, "message": "The token is invalid"}, exception=ex)
 
+    @staticmethod
+    async def verify_auth_token(token, db: DB) -> "User":
+        """
+        Returns the user of the token, repeated calls are answered from the cache
+        """
+        user_id = _token_cache.get(token)
+        if user_id is None:
+            user_id, expires = User.decode_auth_token(token)
+            now = datetime.datetime.now(tz=datetime.timezone.utc)
+            _token_cache.set(token, user_id, ttl=(expires - now).total_seconds())
+
+        return await User.get_cached_user_by_id(user_id, db)
+
+    @staticmethod
+    async def get_cached_user_by_id(id: uuid.UUID, db: DB) -> "User":
+        """
+        get_user_by_id through the cache, the returned user is a detached copy
+        that is not shared with other requests
+        """
+        user = _user_cache.get(id)
+        if user is None:
+            user = await User.get_user_by_id(id, db)
+            _user_cache.set(id, user.detached_copy())
+            return user
 
+        return user.detached_copy()
 
+    @staticmethod
+    def invalidate_cache(id: uuid.UUID, tokens: bool = False) -> None:
+        _user_cache.pop(id)
+        if tokens:
+            _token_cache.pop_where(lambda token, user_id: user_id == id)
+
+    def detached_copy(self) -> "User":
+        user = User(**{column.key: getattr(self, column.key) for column in User.__table__.columns})
+        make_transient_to_detached(user)
+
+        return user
@@ -15,4 +15,9 @@ class ServerDBException(ServerHTTPException):
 
 class ServerDBStringItemToLong(ServerDBException):
     def __init__(self, message: str, detail: dict = {}, db_model=None) -> None:
-        super().__init__(message, detail, db_model)
\ No newline at end of file
+        super().__init__(message, detail, db_model)
+
+
+class InvalidCursorException(ServerHTTPException):
+    def __init__(self, cursor: str, exception: Exception = None) -> None:
+        super().__init__(400, f'Invalid cursor: {cursor}', exception)
@@ -28,3 +28,49 @@ class InvalidFileOcrStatusException(ServerHTTPException):
 
         status_code = 400
         super().__init__(status_code, detail=self.mesage)
+
+
+class FileTooLargeException(ServerHTTPException):
+    def __init__(self, filename: str | None, max_size: int) -> None:
+        self.filename = filename
+
+        self.mesage = f"The File is larger than {max_size} bytes. {filename}"
+
+        status_code = 413
+        super().__init__(status_code, detail=self.mesage)
+
+
+class PageNotFoundException(ServerHTTPException):
+    def __init__(self, page: int, page_count: int) -> None:
+        self.mesage = f"Page {page} does not exist, the file has {page_count} pages"
+
+        status_code = 404
+        super().__init__(status_code, detail=self.mesage)
+
+
+class InvalidArchiveException(ServerHTTPException):
+    def __init__(self, filename: str | None, additional_message: str = None) -> None:
+        self.filename = filename
+
+        self.mesage = (
+            f"The File is not a valid zip archive. {filename} - {additional_message}"
+        )
+
+        status_code = 400
+        super().__init__(status_code, detail=self.mesage)
+
+
+class UploadTooLargeException(ServerHTTPException):
+    def __init__(self, max_size: int) -> None:
+        self.mesage = f"The uploaded files are larger than {max_size} bytes unpacked"
+
+        status_code = 413
+        super().__init__(status_code, detail=self.mesage)
+
+
+class TooManyFilesException(ServerHTTPException):
+    def __init__(self, max_files: int) -> None:
+        self.mesage = f"At most {max_files} files can be uploaded at once"
+
+        status_code = 413
+        super().__init__(status_code, detail=self.mesage)
@@ -0,0 +1,44 @@
+import sys
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.append(".")
+
+from logger import get_logger
+from api.config import IMPORT_BATCH_SIZE, IMPORT_WORKERS
+from api.db.database import engine
+from api.modules.importer.pipeline import ImportStats, run_import
+from api.modules.ocr.ocr import OcrProfile
+
+logger = get_logger()
+
+
+async def main(args: argparse.Namespace) -> ImportStats:
+    try:
+        return await run_import(
+            args.root, args.user, args.workers, args.profile, args.batch_size
+        )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import all pdfs below a folder, files imported by an earlier"
+        " run are skipped"
+    )
+    parser.add_argument("root", type=Path)
+    parser.add_argument("--user", required=True, help="name of the owning user")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS)
+    parser.add_argument(
+        "--profile",
+        type=OcrProfile,
+        choices=list(OcrProfile),
+        default=OcrProfile.ARCHIVAL,
+    )
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    stats = asyncio.run(main(args))
+    logger.info(f"import of {args.root} done: {stats.report()}")
@@ -0,0 +1,90 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+from typing import Callable
+
+sys.path.append(".")
+from logger import get_logger
+
+logger = get_logger()
+
+
+class DiskCache:
+    """
+    Files on disk, one per key, sharded by the first two characters of the key.
+    The least recently used files are evicted once the cache grows beyond
+    max_bytes. Safe to share between processes, files are only ever replaced
+    atomically.
+    """
+
+    def __init__(self, folder: Path, max_bytes: int, suffix: str) -> None:
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        return Path(self.folder, key[:2], f"{key}{self.suffix}")
+
+    def get(self, key: str) -> Path | None:
+        path = self._path(key)
+        try:
+            # the mtime is the last use, see evict
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return path
+
+    def write(self, key: str, write: Callable[[Path], None]) -> Path:
+        """
+        Store the file write creates at the path it is given under key
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> Path:
+        return self.write(key, lambda tmp: tmp.write_bytes(data))
+
+    def evict(self) -> int:
+        """
+        Delete the least recently used files until the cache fits into max_bytes
+        """
+        entries = []
+        for folder in self.folder.glob("??"):
+            for entry in os.scandir(folder):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(entry[1] for entry in entries)
+        evicted = 0
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+        if evicted:
+            logger.info(f"evicted {evicted} files from {self.folder}")
+
+        return evicted
@@ -0,0 +1,168 @@
+import sys
+import zipfile
+from pathlib import PurePosixPath
+from typing import BinaryIO, Iterator
+
+from fastapi import UploadFile
+
+sys.path.append(".")
+from api.config import BULK_UPLOAD_MAX_FILES, BULK_UPLOAD_MAX_SIZE_MB
+from api.exceptions.file import (
+    FileTooLargeException,
+    InvalidArchiveException,
+    TooManyFilesException,
+    UploadTooLargeException,
+)
+from api.modules.file.file_processor import File, FileProcessor
+from api.modules.file.stream import MAX_UPLOAD_SIZE
+from api.modules.storage.storage import storage
+
+BULK_UPLOAD_MAX_SIZE: int | None = BULK_UPLOAD_MAX_SIZE_MB * 1024 * 1024 or None
+
+
+class SizeBudget:
+    """
+    Bytes the files of one bulk upload may still unpack to, None for no limit
+    """
+
+    def __init__(self, max_size: int | None, max_file_size: int | None) -> None:
+        self.max_size = max_size
+        self.left = max_size
+        self.max_file_size = max_file_size
+
+    def check(self, name: str, size: int, read: int | None = None) -> None:
+        """
+        size is the size of the file so far, read the part of it that is not
+        taken from the budget yet, all of it when None
+        """
+        if self.max_file_size is not None and size > self.max_file_size:
+            raise FileTooLargeException(name, self.max_file_size)
+        if self.left is not None and (size if read is None else read) > self.left:
+            raise UploadTooLargeException(self.max_size)
+
+    def take(self, name: str, size: int, read: int) -> None:
+        self.check(name, size, read)
+        if self.left is not None:
+            self.left -= read
+
+
+class LimitedReader:
+    """
+    Counts the bytes read from source against the budget and stops the upload
+    once a file or all of them get too large. The sizes in the headers of an
+    archive are not trusted, they only reject a file early.
+    """
+
+    def __init__(self, source: BinaryIO, name: str, budget: SizeBudget) -> None:
+        self.source = source
+        self.name = name
+        self.budget = budget
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        self._count(len(data))
+        return data
+
+    def readinto(self, buffer: memoryview) -> int:
+        if hasattr(self.source, "readinto"):
+            read = self.source.readinto(buffer) or 0
+        else:
+            chunk = self.source.read(len(buffer))
+            read = len(chunk)
+            buffer[:read] = chunk
+        self._count(read)
+        return read
+
+    def _count(self, read: int) -> None:
+        self.size += read
+        self.budget.take(self.name, self.size, read)
+
+
+def unpack(
+    uploads: list[UploadFile], skipped: list[str], budget: SizeBudget
+) -> Iterator[File]:
+    """
+    The uploaded pdfs and the pdfs inside uploaded zip archives, one at a time.
+    Archive members are decompressed while they are read, within the budget.
+    The names of all other files are appended to skipped.
+    """
+    for upload in uploads:
+        name = upload.filename or ""
+        if name.lower().endswith(".pdf"):
+            yield File(
+                UploadFile(
+                    LimitedReader(upload.file, name, budget),
+                    size=upload.size,
+                    filename=name,
+                    headers=upload.headers,
+                )
+            )
+            continue
+        if not name.lower().endswith(".zip"):
+            skipped.append(name)
+            continue
+
+        try:
+            archive = zipfile.ZipFile(upload.file)
+        except zipfile.BadZipFile as ex:
+            raise InvalidArchiveException(name, str(ex))
+
+        with archive:
+            for info in archive.infolist():
+                # resource forks of archives created on macos
+                if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                    continue
+                member = PurePosixPath(info.filename).name
+                if not member.lower().endswith(".pdf"):
+                    skipped.append(f"{name}/{info.filename}")
+                    continue
+
+                budget.check(member, info.file_size)
+                try:
+                    fr = archive.open(info)
+                except (zipfile.BadZipFile, RuntimeError) as ex:
+                    # e.g. encrypted
+                    raise InvalidArchiveException(name, str(ex))
+                with fr:
+                    yield File(
+                        UploadFile(
+                            LimitedReader(fr, member, budget),
+                            size=info.file_size,
+                            filename=member,
+                        )
+                    )
+
+
+def store_uploads(
+    uploads: list[UploadFile],
+    max_files: int = BULK_UPLOAD_MAX_FILES,
+    max_size: int | None = BULK_UPLOAD_MAX_SIZE,
+    max_file_size: int | None = MAX_UPLOAD_SIZE,
+) -> tuple[list[FileProcessor], list[str]]:
+    """
+    Store every pdf of the uploads, see unpack. Returns the stored files and
+    the names of the skipped ones. Nothing stays stored if any file fails.
+    """
+    stored: list[FileProcessor] = []
+    skipped: list[str] = []
+    budget = SizeBudget(max_size, max_file_size)
+    try:
+        for file in unpack(uploads, skipped, budget):
+            if len(stored) == max_files:
+                raise TooManyFilesException(max_files)
+            stored.append(FileProcessor(file))
+    except zipfile.BadZipFile as ex:
+        # a corrupt member, noticed while it is read
+        discard(stored)
+        raise InvalidArchiveException(None, str(ex))
+    except BaseException:
+        discard(stored)
+        raise
+
+    return stored, skipped
+
+
+def discard(stored: list[FileProcessor]) -> None:
+    for file_processor in stored:
+        storage.delete(file_processor.id)
@@ -1,28 +1,167 @@
-from io import BytesIO
-from pathlib import Path
-import tempfile
-from pdf2image import convert_from_path
 import os
-from pypdf import PdfWriter, PageObject
+import sys
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import BinaryIO
+
 import fitz
-from PIL import Image
 
+sys.path.append(".")
+from api.config import (
+    COMPRESS_DPI,
+    COMPRESS_JPEG_QUALITY,
+    COMPRESS_WORKERS,
+    COMPRESS_PARALLEL_MIN_PAGES,
+)
 
-def compress_pdf(input_path: Path, output_path: Path):
+# width and height in points, width and height in pixels, jpeg
+RenderedPage = tuple[float, float, int, int, bytes]
+
+
+class JpegPdfWriter:
     """
-    removes all ocr data
+    Writes a pdf of one full page jpeg per page straight to a file. Pages are
+    written as soon as they are added, only their object offsets are kept.
     """
-    images: list[Image.Image] = convert_from_path(
-        input_path, thread_count=1, fmt="jpeg", jpegopt={"optimize": "progressive"}
-    )
 
-    images[0].save(
-        output_path, "PDF", resolution=100.0, save_all=True, append_images=images[1:]
+    def __init__(self, fw: BinaryIO) -> None:
+        self.fw = fw
+        # byte offset of every object, 1 catalog and 2 page tree are written last
+        self.offsets: list[int] = [0, 0]
+        self.pages: list[int] = []
+        self._start = fw.tell()
+        self.fw.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write_object(self, body: bytes, stream: bytes | None = None) -> int:
+        self.offsets.append(self.fw.tell() - self._start)
+        number = len(self.offsets)
+        self._write_at(number, body, stream)
+        return number
+
+    def _write_at(self, number: int, body: bytes, stream: bytes | None = None) -> None:
+        self.fw.write(b"%d 0 obj\n" % number + body)
+        if stream is not None:
+            self.fw.write(b"\nstream\n" + stream + b"\nendstream")
+        self.fw.write(b"\nendobj\n")
+
+    def add_page(
+        self,
+        width: float,
+        height: float,
+        pixel_width: int,
+        pixel_height: int,
+        jpeg: bytes,
+    ) -> None:
+        image = self._write_object(
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d"
+            b" /ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode"
+            b" /Length %d >>" % (pixel_width, pixel_height, len(jpeg)),
+            jpeg,
+        )
+        content = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (width, height)
+        contents = self._write_object(b"<< /Length %d >>" % len(content), content)
+        self.pages.append(
+            self._write_object(
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f]"
+                b" /Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+                % (width, height, image, contents)
+            )
+        )
+
+    def close(self) -> None:
+        self.offsets[0] = self.fw.tell() - self._start
+        self._write_at(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self.offsets[1] = self.fw.tell() - self._start
+        kids = b" ".join(b"%d 0 R" % page for page in self.pages)
+        self._write_at(
+            2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages))
+        )
+
+        xref = self.fw.tell() - self._start
+        self.fw.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.offsets) + 1))
+        for offset in self.offsets:
+            self.fw.write(b"%010d 00000 n \n" % offset)
+        self.fw.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(self.offsets) + 1, xref)
+        )
+
+
+def render_page(
+    document: fitz.Document, page_no: int, dpi: int, quality: int
+) -> RenderedPage:
+    page = document.load_page(page_no)
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+    # the page is drawn in its visible orientation
+    rect = page.rect
+    return (
+        rect.width,
+        rect.height,
+        pixmap.width,
+        pixmap.height,
+        pixmap.tobytes("jpeg", jpg_quality=quality),
     )
 
 
-# def generate_thumbnail(input_path: Path, output_path: Path):
-#     images: list[Image.Image] = convert_from_path(input_path, first_page=0, last_page=0, fmt=)
+# the document of a pool process, opened once by _open_document
+_document: fitz.Document | None = None
+
+
+def _open_document(path: Path) -> None:
+    global _document
+    _document = fitz.open(path)
+
+
+def _render_page(page_no: int, dpi: int, quality: int) -> RenderedPage:
+    return render_page(_document, page_no, dpi, quality)
+
+
+def compress_pdf(
+    input_path: Path,
+    output_path: Path,
+    dpi: int = COMPRESS_DPI,
+    quality: int = COMPRESS_JPEG_QUALITY,
+    max_workers: int = COMPRESS_WORKERS,
+):
+    """
+    removes all ocr data
+
+    Every page is rendered to a jpeg and written to the output right away.
+    Large documents are rendered in a process pool, at most two pages per
+    worker are in flight, so the memory use does not grow with the pages.
+    """
+    with fitz.open(input_path) as document:
+        page_count = len(document)
+
+        with open(output_path, "wb") as fw:
+            writer = JpegPdfWriter(fw)
+
+            if page_count < COMPRESS_PARALLEL_MIN_PAGES or max_workers <= 1:
+                for page_no in range(page_count):
+                    writer.add_page(*render_page(document, page_no, dpi, quality))
+                writer.close()
+                return
+
+            window = 2 * max_workers
+            # spawn, forking a threaded server process can deadlock the children
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_open_document,
+                initargs=(input_path,),
+            ) as executor:
+                pending = deque()
+                for page_no in range(page_count):
+                    pending.append(executor.submit(_render_page, page_no, dpi, quality))
+                    if len(pending) >= window:
+                        writer.add_page(*pending.popleft().result())
+
+                while pending:
+                    writer.add_page(*pending.popleft().result())
+
+            writer.close()
 
 
 def compress_pdf_fitz(input_path, output_path, zoom_x=1.0, zoom_y=1.0, rotation=0):
@@ -56,6 +195,46 @@ def compress_pdf_fitz(input_path, output_path, zoom_x=1.0, zoom_y=1.0, rotation=
     # input_pdf.close()
 
 
+# already lossy or bilevel, a jpeg would not be smaller or look worse
+SKIP_IMAGE_FILTERS = {"DCTDecode", "JPXDecode", "JBIG2Decode", "CCITTFaxDecode"}
+
+
+def recompress_images(input_path: Path, output_path: Path, quality: int = 75) -> int:
+    """
+    Replace every losslessly stored color or gray image by a jpeg, if that is
+    smaller. The text layer and the page content are kept.
+    Returns the number of replaced images.
+    """
+    replaced = 0
+    with fitz.open(input_path) as pdf:
+        done: set[int] = set()
+        for page in pdf:
+            for xref, smask, _, _, bpc, *_, image_filter, _ in page.get_images(
+                full=True
+            ):
+                if xref in done:
+                    continue
+                done.add(xref)
+
+                if smask or bpc == 1 or image_filter in SKIP_IMAGE_FILTERS:
+                    continue
+
+                pixmap = fitz.Pixmap(pdf, xref)
+                if pixmap.colorspace is None or pixmap.colorspace.n not in (1, 3):
+                    pixmap = fitz.Pixmap(fitz.csRGB, pixmap)
+                if pixmap.alpha:
+                    continue
+
+                jpeg = pixmap.tobytes("jpeg", jpg_quality=quality)
+                if len(jpeg) < len(pdf.xref_stream_raw(xref)):
+                    page.replace_image(xref, stream=jpeg)
+                    replaced += 1
+
+        pdf.save(output_path, garbage=4, deflate=True)
+
+    return replaced
+
+
 def get_file_size_mb(file_path) -> float:
     size_bytes = os.path.getsize(file_path)
     size_mb = size_bytes / 1024 / 1024
@@ -1,14 +1,17 @@
-import os
-from pathlib import Path
-import shutil
 import uuid
+from pathlib import Path
+from typing import Self
 from fastapi import UploadFile
 from fastapi import File as FastApiFile
-from api.config import BASE_FILE_DIR
-from api.modules.ocr import ocr
+from api.modules.file.stream import replacing
+from api.modules.ocr.classify import pages_needing_ocr
+from api.modules.ocr.extract import ExtractedText, extract
+from api.modules.ocr.ocr import OcrProfile, writes_pdf
+from api.modules.ocr.parallel import ocr_pdf_parallel
+from api.modules.storage.base import OCR, ORIGINAL
+from api.modules.storage.storage import storage
 from logger.logger import get_logger
 
-
 logger = get_logger()
 
 
@@ -24,7 +27,7 @@ class File(UploadFile):
         self.id = id if id is not None else uuid.uuid4()
 
     def is_pdf(self) -> bool:
-        self.filename.endswith(".pdf")
+        return self.filename.lower().endswith(".pdf")
 
     def update_filename(self, filename: str | None) -> None:
         if filename is None:
@@ -43,30 +46,129 @@ class FileProcessor:
     def __init__(self, file: File, delete_file: bool = False) -> None:
         self.file: File = file
         self.delete_file: bool = delete_file
-
-        self.folder_path: Path = Path(BASE_FILE_DIR, str(self.file.id))
-
-        self.path: Path = Path(self.folder_path, "original.pdf")
-        self.ocr_path: Path = Path(self.folder_path, "ocr.pdf")
-
-        os.mkdir(self.folder_path)
-        with self.path.open("wb") as fw:
-            fw.write(self.file.file.read())
-
-        self.file_text: list[str] = ocr.extract_text_from_pdf(self.path)
+        self._set_paths(self.file.id)
+
+        # hash while writing, so duplicate uploads are detected without a second read
+        try:
+            self.sha256: str = storage.save(self.id, ORIGINAL, self.file.file).sha256
+        except Exception:
+            storage.delete(self.id)
+            raise
+
+        self._extracted: ExtractedText | None = None
+
+    @classmethod
+    def load(cls, id: uuid.UUID) -> Self:
+        """
+        Open an already stored file, e.g. from a background worker
+        """
+        file_processor = cls.__new__(cls)
+        file_processor.file = None
+        file_processor.delete_file = False
+        file_processor.sha256 = None
+        file_processor._set_paths(id)
+        file_processor._extracted = None
+        # local copies to work on, only needed for remote storages
+        storage.fetch(id, ORIGINAL)
+        storage.fetch(id, OCR)
+
+        return file_processor
+
+    def _set_paths(self, id: uuid.UUID) -> None:
+        self.id = id
+        self.folder_path: Path = storage.folder(id)
+
+        self.path: Path = Path(self.folder_path, ORIGINAL)
+        self.ocr_path: Path = Path(self.folder_path, OCR)
+
+    @property
+    def extracted(self) -> ExtractedText:
+        # extracted on first use, duplicate uploads never need the text
+        if self._extracted is None:
+            self._extracted = extract(self.path)
+
+        return self._extracted
+
+    @property
+    def file_text(self) -> list[str]:
+        return self.extracted.pages
 
     def __del__(self):
         if self.delete_file:
-            shutil.rmtree(self.folder_path.absolute())
-
-    def has_text(self) -> bool:
-        return self.file_text is not None or len(self.file_text) != 0
-
-    def ocr(self, force: bool = False, skip_text: bool = True) -> None:
-        if not force and not skip_text and self.has_text():
+            storage.delete(self.id)
+
+    def link_from(self, id: uuid.UUID) -> None:
+        """
+        Reuse the stored files of an identical upload instead of keeping a copy
+        """
+        storage.copy(id, self.id, ORIGINAL)
+        if storage.exists(id, OCR):
+            storage.copy(id, self.id, OCR)
+        else:
             self.ocr_path = self.path
-            return
 
-        logger.info("ocring document")
-        ocr.ocr_pdf(self.path, self.ocr_path, skip_text=skip_text, force=force)
-        self.file_text = ocr.extract_text_from_pdf(self.ocr_path)
+    def has_text(self) -> bool:
+        return self.extracted.has_text()
+
+    def pages_needing_ocr(self) -> list[int]:
+        return pages_needing_ocr(self.path, self.file_text)
+
+    def ocr(
+        self,
+        force: bool = False,
+        skip_text: bool = True,
+        profile: OcrProfile = OcrProfile.ARCHIVAL,
+    ) -> list[int] | None:
+        """
+        Returns the 0 based numbers of the ocred pages, None for all of them
+        """
+        pages = None
+        if not force:
+            pages = self.pages_needing_ocr()
+            if not pages:
+                # born digital, the original is used as it is
+                self.ocr_path = self.path
+                return pages
+
+            # the selected pages have no usable text layer, rasterizing them
+            # loses nothing, all other pages are passed through
+            force, skip_text = True, False
+
+        logger.info(
+            f"ocring {'all' if pages is None else len(pages)} pages ({profile})"
+        )
+        if writes_pdf(profile):
+            # a linked duplicate shares ocr.pdf, it is replaced, never written
+            # in place
+            with replacing(self.ocr_path) as output:
+                ocr_pdf_parallel(
+                    self.path,
+                    output,
+                    skip_text=skip_text,
+                    force=force,
+                    pages=pages,
+                    profile=profile,
+                )
+            storage.store(self.id, OCR)
+            self._extracted = extract(self.ocr_path)
+            return pages
+
+        # no ocr pdf, the ocred text replaces the text of the original pages
+        text = ocr_pdf_parallel(
+            self.path,
+            self.ocr_path,
+            skip_text=skip_text,
+            force=force,
+            pages=pages,
+            profile=profile,
+        )
+        self.ocr_path = self.path
+        original = self.extracted
+        self._extracted = ExtractedText(
+            original.path,
+            original.mtime_ns,
+            original.size,
+            original.mode,
+            pages=[text.get(i, page) for i, page in enumerate(original.pages)],
+        )
+        return pages
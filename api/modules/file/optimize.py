@@ -0,0 +1,68 @@
+import os
+import sys
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+sys.path.append(".")
+from logger import get_logger
+from api.config import OPTIMIZE_JPEG_QUALITY, OPTIMIZE_MIN_GAIN
+from api.modules.file.compress import compress_pdf_fitz, recompress_images
+from api.modules.ocr.extract import forget
+
+logger = get_logger()
+
+
+@dataclass
+class OptimizeResult:
+    # None if the source was kept
+    method: str | None
+    original_size: int
+    size: int
+
+    @property
+    def gain(self) -> float:
+        return 1 - self.size / self.original_size if self.original_size else 0.0
+
+
+def optimize_pdf(
+    source: Path,
+    target: Path,
+    quality: int = OPTIMIZE_JPEG_QUALITY,
+    min_gain: float = OPTIMIZE_MIN_GAIN,
+) -> OptimizeResult:
+    """
+    Write source optimized to target, with whichever method gives the smallest
+    file: rewriting it with garbage collection and deflate, or additionally
+    recompressing its images as jpegs. target is replaced atomically, and not
+    at all if no method gains at least min_gain.
+    """
+    original_size = os.path.getsize(source)
+    candidates: dict[str, Path] = {}
+    suffix = uuid.uuid4().hex
+
+    try:
+        candidates["deflate"] = target.with_suffix(f".deflate.{suffix}.tmp")
+        compress_pdf_fitz(source, candidates["deflate"])
+
+        candidates["images"] = target.with_suffix(f".images.{suffix}.tmp")
+        if not recompress_images(source, candidates["images"], quality):
+            # nothing recompressed, the same as deflate
+            del candidates["images"]
+
+        method, path = min(candidates.items(), key=lambda c: os.path.getsize(c[1]))
+        result = OptimizeResult(method, original_size, os.path.getsize(path))
+        if result.gain < min_gain:
+            logger.info(f"kept {source}, {method} would only gain {result.gain:.1%}")
+            return OptimizeResult(None, original_size, original_size)
+
+        forget(target)
+        # readers see either the old or the new file, never a partial one
+        os.replace(path, target)
+        logger.info(f"optimized {source} with {method}, gained {result.gain:.1%}")
+
+        return result
+    finally:
+        for path in candidates.values():
+            path.unlink(missing_ok=True)
+        target.with_suffix(f".images.{suffix}.tmp").unlink(missing_ok=True)
@@ -1,12 +1,12 @@
-import os
-import shutil
 import sys
 from pathlib import Path
 from typing import Self
 
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import UUID
 
+from api.db.database import DB
 from api.db.models.users import User
 from api.exceptions.file import (
     InvalidFileFormatException,
@@ -15,56 +15,80 @@ from api.exceptions.file import (
 
 sys.path.append(".")
 from api.db.models.files import Files as FilesDB, FileText as FileTextDB
-from api.config import BASE_FILE_DIR
-from api.modules.ocr.ocr import ocr_pdf, extract_text_from_pdf
+from api.modules.file.stream import link_file, replacing
+from api.modules.ocr.classify import pages_needing_ocr
+from api.modules.ocr.extract import extract, forget
+from api.modules.ocr.parallel import ocr_pdf_parallel
+from api.modules.storage.base import OCR, ORIGINAL
+from api.modules.storage.storage import storage
 
 
 class PDFFile:
-    path: Path
-    file: UploadFile
     db_file: FilesDB
+    _file: UploadFile = None
     _bytes: bytes = None
     _ocr_path: Path = None
 
-    def __init__(self, file: UploadFile, filedb: FilesDB) -> None:
-        self.path: Path = Path(BASE_FILE_DIR, str(filedb.id), "original.pdf")
-        self._ocr_path: Path = Path(BASE_FILE_DIR, str(filedb.id), "ocr.pdf")
-        self.file: UploadFile = file
+    def __init__(self, file: UploadFile | None, filedb: FilesDB) -> None:
+        self._ocr_path: Path = storage.path(filedb.id, OCR)
+        self._file: UploadFile | None = file
         self.db_file = filedb
 
     @classmethod
-    def new(cls, user: User, file: UploadFile) -> Self:
+    async def new(
+        cls, user: User, file: UploadFile, db: DB, commit: bool = True
+    ) -> Self:
         if not PDFFile.is_pdf_file(file):
             raise InvalidFileFormatException(file, "musst be a pdf!")
 
-        db_file = FilesDB.new(user, file.filename)
+        db_file = await FilesDB.new(user, file.filename, db, commit=commit)
 
         file = PDFFile(file, db_file)
 
         return file
 
     @classmethod
-    def load(cls, user: User, file_id: UUID) -> Self:
-        return PDFFile.load_with_db(FilesDB.get_with_text(user, file_id))
+    async def load(cls, user: User, file_id: UUID, db: DB) -> Self:
+        return PDFFile.load_with_db(await FilesDB.get_with_text(user, file_id, db))
 
     @classmethod
     def load_with_db(cls, filedb: FilesDB) -> Self:
-        raw_file = Path(BASE_FILE_DIR, str(filedb.id), "original.pdf").read_bytes()
-        file = UploadFile(raw_file, filename=filedb.filename)
+        # the stored file is only opened once it is accessed, see PDFFile.file
+        return cls(None, filedb)
 
-        return cls(file, filedb)
+    def fetch(self, name: str) -> Path | None:
+        """
+        The local copy of a stored file, None if there is none. Downloads it
+        from a remote storage, call it in a thread from the event loop.
+        """
+        return storage.fetch(self.db_file.id, name)
 
     @property
-    def ocr_path(self) -> Path | None:
-        if self._ocr_path.exists():
-            return self._ocr_path
+    def path(self) -> Path:
+        # fetched from the storage, if it is not local, on first use
+        path = self.fetch(ORIGINAL)
+
+        return path if path is not None else storage.path(self.db_file.id, ORIGINAL)
+
+    @property
+    def file(self) -> UploadFile:
+        if self._file is None:
+            self._file = UploadFile(
+                storage.open(self.db_file.id, ORIGINAL),
+                filename=self.db_file.filename,
+            )
+
+        return self._file
 
-        return None
+    @property
+    def ocr_path(self) -> Path | None:
+        return self.fetch(OCR)
 
     @property
     def bytes(self) -> bytes:
-        if len(self._bytes) == 0:
-            self._bytes = self.path.read_bytes()
+        if self._bytes is None:
+            with storage.open(self.db_file.id, ORIGINAL) as fr:
+                self._bytes = fr.read()
 
         return self._bytes
 
@@ -77,35 +101,46 @@ class PDFFile:
         return file.filename.lower().endswith(".pdf")
 
     def save(self):
-        if not self.path.exists():
-            os.mkdir(self.path.parent)
-
-        with self.path.open("wb") as fw:
-            fw.write(self.file.file.read())
+        storage.save(self.db_file.id, ORIGINAL, self.file.file, with_hash=False)
 
     def delete(self):
-        os.remove(self.path)
+        forget(self.path)
+        storage.delete(self.db_file.id)
 
-    def ocr(self, force: bool = False):
+    def ocr(self, force: bool = False, skip_text: bool = True):
+        """
+        force ocrs every page again, ocrmypdf only allows it with skip_text off
+        """
         if force is False and self.ocr_path is not None:
             return self._ocr_path
 
-        if self.original_has_ocr() and force is False:
-            ocr_pdf(self.path, self._ocr_path, skip_text=True, force=False)
-            return
-
-        ocr_pdf(self.path, self._ocr_path, skip_text=False, force=True)
+        path = self.path
+        # ocr.pdf can be a hard link shared with duplicates, it is replaced,
+        # never written in place
+        if force:
+            with replacing(self._ocr_path) as output:
+                ocr_pdf_parallel(path, output, skip_text=skip_text, force=True)
+        # only pages without a usable text layer are ocred, see FileProcessor.ocr
+        elif pages := pages_needing_ocr(path, extract(path).pages):
+            with replacing(self._ocr_path) as output:
+                ocr_pdf_parallel(path, output, skip_text=False, force=True, pages=pages)
+        else:
+            link_file(path, self._ocr_path)
+
+        storage.store(self.db_file.id, OCR)
 
     def original_has_ocr(self) -> bool:
-        file_text = extract_text_from_pdf(self.path)
-
-        return file_text is not None or len(file_text) != 0
+        return extract(self.path).has_text()
 
-    def write_text_to_db(self, user: User):
+    def ocr_text(self) -> list[str]:
         if self.ocr_path is None:
             raise InvalidFileOcrStatusException(self.file)
 
-        text: list[str] = extract_text_from_pdf(self._ocr_path)
+        return extract(self._ocr_path).pages
+
+    async def write_text_to_db(self, user: User, db: DB):
+        # fetching and extracting block
+        text: list[str] = await run_in_threadpool(self.ocr_text)
 
-        ft: FileTextDB = FileTextDB.get_by_file_id(self.db_file.id, user)
-        ft.update_file_text(text)
+        ft: FileTextDB = await FileTextDB.get_by_file_id(self.db_file.id, user, db)
+        await ft.update_file_text(text, db)
@@ -0,0 +1,115 @@
+import sys
+import hashlib
+import threading
+from enum import StrEnum
+from io import BytesIO
+from pathlib import Path
+
+import fitz
+from PIL import Image
+
+sys.path.append(".")
+from api.config import (
+    PREVIEW_QUALITY,
+    PREVIEW_CACHE_DIR,
+    PREVIEW_CACHE_SIZE_MB,
+)
+from api.exceptions.file import PageNotFoundException
+from api.modules.cache.disk import DiskCache
+from api.modules.file.stream import hash_file
+
+# the cache directory is scanned for eviction every this many new previews
+EVICT_EVERY = 100
+
+
+class PreviewFormat(StrEnum):
+    WEBP = "webp"
+    JPEG = "jpeg"
+
+    @property
+    def media_type(self) -> str:
+        return f"image/{self}"
+
+
+preview_cache = DiskCache(PREVIEW_CACHE_DIR, PREVIEW_CACHE_SIZE_MB * 1024 * 1024, "")
+_puts = 0
+_puts_lock = threading.Lock()
+
+
+def content_hash(path: Path, sha256: str | None) -> str:
+    # files uploaded before the hashes were stored are hashed on demand
+    return sha256 if sha256 is not None else hash_file(path)
+
+
+def preview_key(
+    sha256: str,
+    page_no: int,
+    width: int,
+    format: PreviewFormat,
+    quality: int = PREVIEW_QUALITY,
+) -> str:
+    """
+    Content address of a preview, the hash of the pdf and the render parameters.
+    Identical uploads share their previews.
+    """
+    params = f"{sha256}:{page_no}:{width}:{format}:{quality}"
+    return hashlib.sha256(params.encode()).hexdigest()
+
+
+def render_preview(
+    path: Path,
+    page_no: int,
+    width: int,
+    format: PreviewFormat,
+    quality: int = PREVIEW_QUALITY,
+) -> bytes:
+    """
+    The 0 based page page_no scaled to width pixels
+    """
+    with fitz.open(path) as document:
+        if not 0 <= page_no < len(document):
+            raise PageNotFoundException(page_no + 1, len(document))
+
+        page = document.load_page(page_no)
+        zoom = width / page.rect.width
+        pixmap = page.get_pixmap(
+            matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False
+        )
+
+    image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    buffer = BytesIO()
+    image.save(buffer, format=format.upper(), quality=quality)
+
+    return buffer.getvalue()
+
+
+def get_preview(
+    path: Path,
+    key: str,
+    page_no: int,
+    width: int,
+    format: PreviewFormat,
+    quality: int = PREVIEW_QUALITY,
+) -> bytes:
+    """
+    The cached preview with key, see preview_key. Rendered and cached if missing.
+    """
+    cached = preview_cache.get(key)
+    if cached is not None:
+        try:
+            return cached.read_bytes()
+        except FileNotFoundError:
+            # evicted by another process in the meantime
+            pass
+
+    preview = render_preview(path, page_no, width, format, quality)
+    preview_cache.put_bytes(key, preview)
+
+    global _puts
+    with _puts_lock:
+        _puts += 1
+        evict = _puts % EVICT_EVERY == 0
+    if evict:
+        preview_cache.evict()
+
+    return preview
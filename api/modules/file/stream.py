@@ -0,0 +1,179 @@
+import os
+import sys
+import uuid
+import errno
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+sys.path.append(".")
+from api.config import UPLOAD_CHUNK_SIZE, MAX_UPLOAD_SIZE_MB
+from api.exceptions.file import FileTooLargeException
+
+MAX_UPLOAD_SIZE: int | None = MAX_UPLOAD_SIZE_MB * 1024 * 1024 or None
+
+
+@dataclass
+class SpoolResult:
+    path: Path
+    size: int
+    sha256: str | None = None
+
+
+def spool_to_disk(
+    source: BinaryIO,
+    target: Path,
+    with_hash: bool = True,
+    max_size: int | None = MAX_UPLOAD_SIZE,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SpoolResult:
+    """
+    Copy a (uploaded) file object to target with a fixed size buffer, hashing
+    and checking the size on the fly. Without hashing, file objects backed by
+    a real file are copied in the kernel via copy_file_range/sendfile.
+    """
+    sha256 = hashlib.sha256() if with_hash else None
+    try:
+        with target.open("wb") as fw:
+            size = None
+            if sha256 is None:
+                size = _copy_in_kernel(source, fw, max_size)
+            if size is None:
+                size = _copy_buffered(source, fw, sha256, max_size, chunk_size)
+
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+
+    return SpoolResult(target, size, sha256.hexdigest() if sha256 is not None else None)
+
+
+def hash_file(path: Path, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    sha256 = hashlib.sha256()
+    buffer = memoryview(bytearray(chunk_size))
+
+    with path.open("rb") as fr:
+        while read := fr.readinto(buffer):
+            sha256.update(buffer[:read])
+
+    return sha256.hexdigest()
+
+
+def link_file(source: Path, target: Path) -> None:
+    """
+    Hard link source to target, replacing target atomically
+    """
+    # a name of its own, concurrent links to the same target must not share it
+    tmp = Path(target.parent, f".{target.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        try:
+            os.link(source, tmp)
+        except OSError:
+            # e.g. another filesystem
+            shutil.copyfile(source, tmp)
+
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def replacing(target: Path) -> Iterator[Path]:
+    """
+    A new file next to target to write to, it replaces target once the block
+    is done. Writing target in place would change every hard link of it, see
+    link_file.
+    """
+    fd, tmp = tempfile.mkstemp(
+        dir=target.parent, prefix=f".{target.name}.", suffix=".tmp"
+    )
+    os.close(fd)
+    tmp = Path(tmp)
+    try:
+        yield tmp
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _copy_buffered(
+    source: BinaryIO,
+    target: BinaryIO,
+    sha256: "hashlib._Hash | None",
+    max_size: int | None,
+    chunk_size: int,
+) -> int:
+    size = 0
+    buffer = memoryview(bytearray(chunk_size))
+
+    while read := _read_into(source, buffer):
+        size += read
+        if max_size is not None and size > max_size:
+            raise FileTooLargeException(getattr(source, "name", None), max_size)
+
+        if sha256 is not None:
+            sha256.update(buffer[:read])
+        target.write(buffer[:read])
+
+    return size
+
+
+def _read_into(source: BinaryIO, buffer: memoryview) -> int:
+    if hasattr(source, "readinto"):
+        return source.readinto(buffer) or 0
+
+    chunk = source.read(len(buffer))
+    buffer[: len(chunk)] = chunk
+    return len(chunk)
+
+
+def _copy_in_kernel(
+    source: BinaryIO, target: BinaryIO, max_size: int | None
+) -> int | None:
+    """
+    Returns None if the source is no real file or the kernel refuses the copy
+    """
+    # SpooledTemporaryFile only has a fileno once it is rolled over to disk
+    if getattr(source, "_rolled", True) is False:
+        return None
+    try:
+        source_fd = source.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+    offset = source.tell()
+    size = os.fstat(source_fd).st_size - offset
+    if max_size is not None and size > max_size:
+        raise FileTooLargeException(getattr(source, "name", None), max_size)
+
+    target.flush()
+    target_fd = target.fileno()
+    copied = 0
+    try:
+        while copied < size:
+            if hasattr(os, "copy_file_range"):
+                sent = os.copy_file_range(
+                    source_fd, target_fd, size - copied, offset + copied
+                )
+            else:
+                sent = os.sendfile(target_fd, source_fd, offset + copied, size - copied)
+            if sent == 0:
+                break
+            copied += sent
+    except OSError as ex:
+        if copied == 0 and ex.errno in (
+            errno.EXDEV,
+            errno.ENOSYS,
+            errno.EINVAL,
+            errno.EOPNOTSUPP,
+        ):
+            return None
+        raise
+
+    source.seek(offset + copied)
+    return copied
@@ -0,0 +1,464 @@
+import os
+import sys
+import time
+import uuid
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+from uuid import UUID
+
+sys.path.append(".")
+from logger import get_logger
+from api.config import (
+    IMPORT_BATCH_SIZE,
+    IMPORT_QUEUE_SIZE,
+    IMPORT_REPORT_INTERVAL,
+    IMPORT_WORKERS,
+    OCR_CORE_BUDGET,
+)
+from api.db.database import DB, SessionLocal
+from api.db.models.content import ContentHash
+from api.db.models.files import Files as FilesDB, FileText
+from api.db.models.imports import ImportCheckpoint
+from api.db.models.jobs import JobKind, OcrJob
+from api.db.models.users import User
+from api.modules.file.file_processor import FileProcessor
+from api.modules.file.stream import hash_file
+from api.modules.language.languages import Languages
+from api.modules.ocr.ocr import OcrProfile, writes_pdf
+from api.modules.ocr.parallel import set_core_budget
+from api.modules.storage.base import ORIGINAL
+from api.modules.storage.storage import storage
+
+logger = get_logger()
+
+# files.filename
+MAX_FILENAME_LENGTH = 255
+
+
+@dataclass
+class Processed:
+    text: list[str]
+    language: Languages
+    page_configs: list[str] | None
+    ocr_pages: int
+    # by stage
+    seconds: dict[str, float]
+
+
+@dataclass
+class Candidate:
+    """
+    A pdf found below the import root, on its way through the pipeline
+    """
+
+    path: Path
+    size: int
+    mtime_ns: int
+    sha256: str | None = None
+    id: UUID | None = None
+    # a stored file with the same bytes, its files and text are reused
+    duplicate_of: UUID | None = None
+    processed: Processed | None = None
+
+    @property
+    def filename(self) -> str:
+        name = self.path.name
+        if len(name) > MAX_FILENAME_LENGTH:
+            name = name[: MAX_FILENAME_LENGTH - 4] + ".pdf"
+
+        return name
+
+
+@dataclass
+class ImportStats:
+    found: int = 0
+    # imported by an earlier run
+    skipped: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    bytes: int = 0
+    pages: int = 0
+    ocr_pages: int = 0
+    # summed over all workers, by stage
+    seconds: dict[str, float] = field(default_factory=dict)
+    start: float = field(default_factory=time.perf_counter)
+
+    def add_seconds(self, stage: str, seconds: float) -> None:
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    @property
+    def docs_per_second(self) -> float:
+        return (self.imported + self.duplicates) / self.elapsed
+
+    def report(self) -> str:
+        stages = ", ".join(f"{s} {t:.1f}s" for s, t in self.seconds.items())
+        return (
+            f"{self.imported} imported, {self.duplicates} duplicates,"
+            f" {self.skipped} skipped, {self.failed} failed of {self.found} found"
+            f" in {self.elapsed:.0f}s: {self.docs_per_second:.2f} docs/s,"
+            f" {self.bytes / 1024 / 1024 / self.elapsed:.1f} MB/s,"
+            f" {self.pages} pages ({self.ocr_pages} ocred); busy: {stages}"
+        )
+
+
+def import_file(path: Path, id: UUID, profile: OcrProfile) -> Processed:
+    """
+    Copy path into the storage, extract its text and ocr the pages without,
+    runs in a pool process
+    """
+    seconds = {}
+    start = time.perf_counter()
+
+    def lap(stage: str) -> None:
+        nonlocal start
+        now = time.perf_counter()
+        seconds[stage] = now - start
+        start = now
+
+    try:
+        with path.open("rb") as fr:
+            # not hashed again, copied in the kernel
+            storage.save(id, ORIGINAL, fr, with_hash=False)
+        lap("copy")
+
+        file_processor = FileProcessor.load(id)
+        file_processor.extracted
+        lap("extract")
+
+        pages = file_processor.ocr(profile=profile)
+        lap("ocr")
+
+        text = file_processor.file_text
+        language, page_configs = FileText.detect_languages(text)
+        lap("language")
+    except BaseException:
+        storage.delete(id)
+        raise
+
+    ocr_pages = len(text) if pages is None else len(pages)
+    return Processed(text, language, page_configs, ocr_pages, seconds)
+
+
+def _list_folder(folder: Path) -> tuple[list[Path], list[tuple[Path, int, int]]]:
+    """
+    The sub folders and the pdfs with their size and mtime in folder
+    """
+    folders, pdfs = [], []
+    with os.scandir(folder) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            try:
+                # symlinks are not followed, they could form loops
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(Path(entry.path))
+                elif entry.is_file() and entry.name.lower().endswith(".pdf"):
+                    stat = entry.stat()
+                    pdfs.append((Path(entry.path), stat.st_size, stat.st_mtime_ns))
+            except OSError as ex:
+                logger.warning(f"skipping {entry.path}: {ex}")
+
+    return folders, pdfs
+
+
+async def _batches(queue: asyncio.Queue, size: int) -> AsyncIterator[list]:
+    """
+    What is waiting in queue, at least one and at most size items at a time,
+    until the None sent by the producer
+    """
+    while (item := await queue.get()) is not None:
+        batch = [item]
+        while len(batch) < size and not queue.empty():
+            item = queue.get_nowait()
+            if item is None:
+                yield batch
+                return
+            batch.append(item)
+
+        yield batch
+
+
+async def _fan_out(
+    source: asyncio.Queue,
+    target: asyncio.Queue,
+    process: Callable[[Candidate], Awaitable[Candidate | None]],
+    workers: int,
+) -> None:
+    """
+    Process the candidates of source concurrently, the results go to target
+    """
+
+    async def work() -> None:
+        while (candidate := await source.get()) is not None:
+            result = await process(candidate)
+            if result is not None:
+                await target.put(result)
+        # stops the other workers too
+        await source.put(None)
+
+    async with asyncio.TaskGroup() as group:
+        for _ in range(workers):
+            group.create_task(work())
+
+    await target.put(None)
+
+
+class Importer:
+    """
+    Imports all pdfs below root for user. The files pass through bounded
+    queues: walk -> skip imported -> hash -> dedupe -> copy, extract and ocr
+    -> db. The cpu heavy stage runs in a pool of workers processes, the db is
+    written in batches, each with its checkpoints.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        user: User,
+        workers: int = IMPORT_WORKERS,
+        profile: OcrProfile = OcrProfile.ARCHIVAL,
+        queue_size: int = IMPORT_QUEUE_SIZE,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        report_interval: float = IMPORT_REPORT_INTERVAL,
+    ) -> None:
+        self.root = root.resolve()
+        self.user = user
+        self.workers = workers
+        self.profile = profile
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.report_interval = report_interval
+        self.stats = ImportStats()
+
+        # sha256 of the files of this run, and their ids
+        self._hashes: dict[str, UUID] = {}
+        self._failed: set[UUID] = set()
+        # duplicates of files of this run, written once those are
+        self._deferred: list[Candidate] = []
+
+    async def run(self) -> ImportStats:
+        found, new, hashed, unique, processed = (
+            asyncio.Queue(self.queue_size) for _ in range(5)
+        )
+
+        # spawn, so that no db connection is shared with the pool
+        context = multiprocessing.get_context("spawn")
+        # shared by all workers, like the ocr worker pool
+        core_budget = context.BoundedSemaphore(OCR_CORE_BUDGET)
+        pool = ProcessPoolExecutor(
+            self.workers,
+            mp_context=context,
+            initializer=set_core_budget,
+            initargs=(core_budget,),
+        )
+
+        async def process(candidate: Candidate) -> Candidate | None:
+            return await self._process(pool, candidate)
+
+        reporter = asyncio.create_task(self._report())
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(self._walk(found))
+                group.create_task(self._skip_imported(found, new))
+                group.create_task(_fan_out(new, hashed, self._hash, self.workers))
+                group.create_task(self._dedupe(hashed, unique, processed))
+                group.create_task(_fan_out(unique, processed, process, self.workers))
+                group.create_task(self._write(processed))
+
+            await self._write_deferred()
+        finally:
+            reporter.cancel()
+            pool.shutdown(cancel_futures=True)
+
+        return self.stats
+
+    async def _walk(self, found: asyncio.Queue) -> None:
+        folders = [self.root]
+        while folders:
+            # only the listing blocks, one folder at a time
+            subfolders, pdfs = await asyncio.to_thread(_list_folder, folders.pop())
+            folders.extend(reversed(subfolders))
+            for path, size, mtime_ns in pdfs:
+                await found.put(Candidate(path, size, mtime_ns))
+
+        await found.put(None)
+
+    async def _skip_imported(self, found: asyncio.Queue, new: asyncio.Queue) -> None:
+        async with SessionLocal() as db:
+            async for batch in _batches(found, self.batch_size):
+                imported = await ImportCheckpoint.imported(
+                    self.user.id,
+                    [(str(c.path), c.size, c.mtime_ns) for c in batch],
+                    db,
+                )
+                self.stats.found += len(batch)
+                self.stats.skipped += len(imported)
+                for candidate in batch:
+                    if str(candidate.path) not in imported:
+                        await new.put(candidate)
+
+        await new.put(None)
+
+    async def _hash(self, candidate: Candidate) -> Candidate | None:
+        start = time.perf_counter()
+        try:
+            candidate.sha256 = await asyncio.to_thread(hash_file, candidate.path)
+        except OSError as ex:
+            logger.error(f"reading {candidate.path} failed: {ex}")
+            self.stats.failed += 1
+            return None
+
+        self.stats.add_seconds("hash", time.perf_counter() - start)
+        return candidate
+
+    async def _dedupe(
+        self, hashed: asyncio.Queue, unique: asyncio.Queue, processed: asyncio.Queue
+    ) -> None:
+        async with SessionLocal() as db:
+            async for batch in _batches(hashed, self.batch_size):
+                known = await ContentHash.get_many(
+                    self.user, [c.sha256 for c in batch], db
+                )
+                for candidate in batch:
+                    candidate.id = uuid.uuid4()
+                    if candidate.sha256 in known:
+                        # nothing to process, written right away
+                        candidate.duplicate_of = known[candidate.sha256]
+                        await processed.put(candidate)
+                    elif candidate.sha256 in self._hashes:
+                        candidate.duplicate_of = self._hashes[candidate.sha256]
+                        self._deferred.append(candidate)
+                    else:
+                        self._hashes[candidate.sha256] = candidate.id
+                        await unique.put(candidate)
+
+        await unique.put(None)
+
+    async def _process(
+        self, pool: ProcessPoolExecutor, candidate: Candidate
+    ) -> Candidate | None:
+        loop = asyncio.get_running_loop()
+        try:
+            candidate.processed = await loop.run_in_executor(
+                pool, import_file, candidate.path, candidate.id, self.profile
+            )
+        except BrokenProcessPool:
+            raise
+        except Exception as ex:
+            logger.error(f"importing {candidate.path} failed: {ex}")
+            self.stats.failed += 1
+            self._failed.add(candidate.id)
+            return None
+
+        for stage, seconds in candidate.processed.seconds.items():
+            self.stats.add_seconds(stage, seconds)
+        return candidate
+
+    async def _write(self, processed: asyncio.Queue) -> None:
+        async with SessionLocal() as db:
+            async for batch in _batches(processed, self.batch_size):
+                await self._write_batch(batch, db)
+
+    async def _write_deferred(self) -> None:
+        deferred = []
+        for candidate in self._deferred:
+            if candidate.duplicate_of in self._failed:
+                # imported with the next run
+                self.stats.failed += 1
+            else:
+                deferred.append(candidate)
+
+        async with SessionLocal() as db:
+            for i in range(0, len(deferred), self.batch_size):
+                await self._write_batch(deferred[i : i + self.batch_size], db)
+
+    async def _write_batch(self, batch: list[Candidate], db: DB) -> None:
+        """
+        The files, their texts and checkpoints in one transaction
+        """
+        start = time.perf_counter()
+        duplicates = [c for c in batch if c.duplicate_of is not None]
+        originals = [c for c in batch if c.duplicate_of is None]
+
+        try:
+            await asyncio.to_thread(_link_duplicates, duplicates)
+
+            await FilesDB.bulk_new(
+                self.user,
+                [(c.id, c.filename, c.sha256, c.duplicate_of) for c in batch],
+                db,
+                texts={
+                    c.id: (
+                        c.processed.text,
+                        c.processed.language,
+                        c.processed.page_configs,
+                    )
+                    for c in originals
+                },
+                commit=False,
+            )
+            # like the ocr worker, see api/modules/jobs/worker.py
+            if writes_pdf(self.profile):
+                await ContentHash.register_many(
+                    self.user, [(c.sha256, c.id) for c in originals], db, commit=False
+                )
+                await OcrJob.enqueue_many(
+                    [c.id for c in originals],
+                    self.user,
+                    db,
+                    kind=JobKind.OPTIMIZE,
+                    commit=False,
+                )
+            await ImportCheckpoint.add_many(
+                self.user.id,
+                [(str(c.path), c.size, c.mtime_ns, c.sha256, c.id) for c in batch],
+                db,
+            )
+        except BaseException:
+            await db.rollback()
+            await asyncio.to_thread(_discard, batch)
+            raise
+
+        self.stats.imported += len(originals)
+        self.stats.duplicates += len(duplicates)
+        self.stats.bytes += sum(c.size for c in batch)
+        self.stats.pages += sum(len(c.processed.text) for c in originals)
+        self.stats.ocr_pages += sum(c.processed.ocr_pages for c in originals)
+        self.stats.add_seconds("db", time.perf_counter() - start)
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logger.info(self.stats.report())
+
+
+def _link_duplicates(duplicates: list[Candidate]) -> None:
+    for candidate in duplicates:
+        FileProcessor.load(candidate.id).link_from(candidate.duplicate_of)
+
+
+def _discard(batch: list[Candidate]) -> None:
+    for candidate in batch:
+        storage.delete(candidate.id)
+
+
+async def run_import(
+    root: Path,
+    username: str,
+    workers: int = IMPORT_WORKERS,
+    profile: OcrProfile = OcrProfile.ARCHIVAL,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> ImportStats:
+    async with SessionLocal() as db:
+        user = await User.get_user_by_username(username, db)
+
+    importer = Importer(root, user, workers, profile, batch_size=batch_size)
+    return await importer.run()
@@ -0,0 +1,237 @@
+import os
+import sys
+import time
+import asyncio
+import signal
+import socket
+import multiprocessing
+from multiprocessing.connection import wait
+from multiprocessing.synchronize import Event
+
+sys.path.append(".")
+from logger import get_logger
+from api.config import (
+    OCR_WORKERS,
+    OCR_JOB_POLL_INTERVAL,
+    OCR_JOB_TIMEOUT,
+    OCR_JOB_REQUEUE_INTERVAL,
+    OCR_CORE_BUDGET,
+    PREVIEW_EAGER_SIZES,
+    PREVIEW_FORMAT,
+    PREVIEW_SIZES,
+)
+from api.db.database import DB, SessionLocal, engine
+from api.db.models.content import ContentHash
+from api.db.models.files import Files as FilesDB
+from api.db.models.jobs import JobKind, OcrJob
+from api.db.models.users import User
+from api.modules.file.file_processor import FileProcessor
+from api.modules.file.optimize import optimize_pdf
+from api.modules.file.preview import (
+    PreviewFormat,
+    content_hash,
+    get_preview,
+    preview_key,
+)
+from api.modules.ocr.ocr import writes_pdf
+from api.modules.ocr.parallel import release_held, set_core_budget
+from api.modules.storage.base import OCR
+from api.modules.storage.storage import storage
+
+logger = get_logger()
+
+
+async def process_job(job: OcrJob, db: DB) -> None:
+    if job.kind == JobKind.OPTIMIZE:
+        await process_optimize_job(job, db)
+    elif job.kind == JobKind.PREVIEW:
+        await process_preview_job(job, db)
+    else:
+        await process_ocr_job(job, db)
+
+
+async def process_ocr_job(job: OcrJob, db: DB) -> None:
+    user = await User.get_user_by_id(job.user_id, db)
+    db_file: FilesDB = await FilesDB.get_with_text(user, job.file_id, db)
+
+    # nothing else runs on the loop of a worker, blocking here is fine
+    file_processor = FileProcessor.load(db_file.id)
+    start = time.perf_counter()
+    # ocrmypdf does not allow force_ocr and skip_text at the same time
+    pages = file_processor.ocr(
+        force=job.force_ocr, skip_text=not job.force_ocr, profile=job.profile
+    )
+    job.ocr_seconds = time.perf_counter() - start
+    job.ocr_pages = len(file_processor.file_text) if pages is None else len(pages)
+    logger.info(
+        f"job {job.id} ({job.profile}) ocred {job.ocr_pages} pages"
+        f" in {job.ocr_seconds:.1f}s"
+    )
+
+    await db_file.file_text.update_file_text(file_processor.file_text, db)
+
+    # duplicates reuse the stored files, only complete results are shared
+    if db_file.sha256 is not None and writes_pdf(job.profile):
+        await ContentHash.register(user, db_file.sha256, db_file.id, db)
+
+    # the text is searchable now, the file is made smaller later, off peak
+    if writes_pdf(job.profile):
+        await OcrJob.enqueue(db_file.id, user, db, kind=JobKind.OPTIMIZE)
+
+
+async def process_optimize_job(job: OcrJob, db: DB) -> None:
+    file_processor = FileProcessor.load(job.file_id)
+    # born digital files have no ocr pdf, their optimized copy becomes it
+    source = file_processor.ocr_path
+    if not source.exists():
+        source = file_processor.path
+
+    result = optimize_pdf(source, file_processor.ocr_path)
+    if result.method is not None:
+        storage.store(job.file_id, OCR)
+
+
+async def process_preview_job(job: OcrJob, db: DB) -> None:
+    user = await User.get_user_by_id(job.user_id, db)
+    db_file: FilesDB = await FilesDB.get_without_text(user, job.file_id, db)
+
+    # previews show the file as uploaded
+    path = FileProcessor.load(db_file.id).path
+    sha256 = content_hash(path, db_file.sha256)
+    format = PreviewFormat(PREVIEW_FORMAT)
+    for size in PREVIEW_EAGER_SIZES:
+        width = PREVIEW_SIZES[size]
+        get_preview(path, preview_key(sha256, 0, width, format), 0, width, format)
+
+
+async def _work(name: str, poll_interval: float, stop: Event) -> None:
+    while not stop.is_set():
+        async with SessionLocal() as db:
+            job = await OcrJob.claim(name, db)
+            if job is None:
+                # not stop.wait, a worker killed while waiting on the event
+                # would block stop.set in the pool parent forever
+                await asyncio.sleep(poll_interval)
+                continue
+
+            logger.info(f"worker {name} processing job {job.id} for file {job.file_id}")
+            try:
+                await process_job(job, db)
+            except Exception as ex:
+                logger.exception(f"job {job.id} failed: {ex}")
+                # a rollback expires all loaded objects
+                await db.rollback()
+                await db.refresh(job)
+                await job.fail(str(ex), name, db)
+                continue
+
+            await job.finish(name, db)
+
+    await engine.dispose()
+
+
+def work(name: str, poll_interval: float, stop: Event, core_budget, held_cores) -> None:
+    # the pool parent handles the signals and sets the stop event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    set_core_budget(core_budget, held_cores)
+    logger.info(f"ocr worker {name} started")
+
+    asyncio.run(_work(name, poll_interval, stop))
+
+    logger.info(f"ocr worker {name} stopped")
+
+
+async def requeue_stale_jobs(
+    timeout: int = OCR_JOB_TIMEOUT,
+    worker: str | None = None,
+    alive: list[str] | None = None,
+) -> tuple[int, int]:
+    """
+    The jobs of the alive workers get a heartbeat first, however long they run
+    """
+    async with SessionLocal() as db:
+        if alive:
+            await OcrJob.heartbeat(alive, db)
+        requeued, failed = await OcrJob.requeue_stale(timeout, db, worker)
+
+    # the connections are bound to this event loop
+    await engine.dispose()
+
+    if requeued or failed:
+        logger.info(f"requeued {requeued} stale jobs, {failed} failed for good")
+    return requeued, failed
+
+
+def run_pool(
+    workers: int = OCR_WORKERS,
+    poll_interval: float = OCR_JOB_POLL_INTERVAL,
+    requeue_interval: float = OCR_JOB_REQUEUE_INTERVAL,
+) -> None:
+    # spawn, so that no db connection of the parent is shared with the workers
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    # shared by all workers, so concurrent jobs do not oversubscribe the cores
+    core_budget = context.BoundedSemaphore(OCR_CORE_BUDGET)
+    # the cores each worker holds, a dead worker can not give them back
+    held_cores = [context.Value("i", 0, lock=False) for _ in range(workers)]
+
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    names = [f"{prefix}-{i}" for i in range(workers)]
+
+    def start_worker(i: int) -> multiprocessing.Process:
+        process = context.Process(
+            target=work,
+            args=(names[i], poll_interval, stop, core_budget, held_cores[i]),
+            name=f"ocr-worker-{i}",
+        )
+        process.start()
+        return process
+
+    stopping = False
+
+    def shutdown(signum, frame):
+        # stop is set by the loop below, the handler may interrupt the main
+        # thread while it holds the lock of the event
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    asyncio.run(requeue_stale_jobs())
+    processes = [start_worker(i) for i in range(workers)]
+    logger.info(f"started {workers} ocr workers")
+
+    next_requeue = time.monotonic() + requeue_interval
+    while True:
+        # wakes up when a worker exits, the timeout bounds the shutdown delay
+        wait(
+            [process.sentinel for process in processes],
+            timeout=max(0, min(poll_interval, next_requeue - time.monotonic())),
+        )
+        if stopping:
+            logger.info("stopping ocr workers")
+            stop.set()
+            break
+
+        for i, process in enumerate(processes):
+            if process.is_alive():
+                continue
+            logger.warning(
+                f"ocr worker {names[i]} died with exit code {process.exitcode},"
+                " restarting it"
+            )
+            cores = release_held(core_budget, held_cores[i])
+            if cores:
+                logger.warning(f"released {cores} cores held by {names[i]}")
+            # its job is not coming back, no need to wait for the timeout
+            asyncio.run(requeue_stale_jobs(worker=names[i]))
+            processes[i] = start_worker(i)
+
+        if time.monotonic() >= next_requeue:
+            asyncio.run(requeue_stale_jobs(alive=names))
+            next_requeue = time.monotonic() + requeue_interval
+
+    for process in processes:
+        process.join()
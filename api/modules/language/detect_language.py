@@ -1,23 +1,109 @@
 from typing import TypedDict
-import warnings
-from charset_normalizer import detect
+
 from api.modules.language.languages import Languages
+from api.modules.language.ngram import count_ngrams, get_identifier, normalize
+
+# characters looked at for a whole document, spread over its pages
+SAMPLE_CHARS = 4096
+# characters looked at per page by detect_page_languages
+PAGE_SAMPLE_CHARS = 1024
+# pages are sampled in chunks of at least this many characters
+MIN_CHUNK_CHARS = 256
+# pages with less n-grams are not trusted and get the document language
+MIN_PAGE_NGRAMS = 40
+# less likely languages are not trusted either, short ids, numbers and
+# abbreviations look like any language, e.g. "Invoice No. 2024-001 EUR"
+MIN_CONFIDENCE = 0.75
+
+DEFAULT_LANGUAGE = Languages.ENGLISH
 
 
 class Detected(TypedDict):
-    language: str
+    language: Languages
     confidence: float
-    encoding: str
 
 
-def detect_language(text: bytes | str | list[str]) -> Languages:
+def _pages(text: bytes | str | list[str]) -> list[str]:
+    if isinstance(text, bytes):
+        text = text.decode(errors="ignore")
     if isinstance(text, str):
-        text = text.encode()
-    elif isinstance(text, list):
-        text = " ".join(text)
-        if isinstance(text, str):
-            text = text.encode()
+        return [text]
+    return text
+
+
+def _cut(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    # do not end in the middle of a word
+    return text[:max_chars].rsplit(" ", 1)[0]
+
+
+def sample_text(pages: list[str], max_chars: int = SAMPLE_CHARS) -> str:
+    """
+    At most max_chars characters taken from the start of evenly spread pages
+    """
+    pages = [page for page in pages if page and not page.isspace()]
+    if sum(len(page) for page in pages) <= max_chars:
+        return " ".join(pages)
+
+    count = max(1, min(len(pages), max_chars // MIN_CHUNK_CHARS))
+    step = len(pages) / count
+    chunk = max_chars // count
+
+    return " ".join(_cut(pages[int(i * step)], chunk) for i in range(count))
+
+
+def _trusted(language: Languages | None, confidence: float) -> Detected:
+    # a wrong language stems the words wrong, the default at least is expected
+    if language is None or confidence < MIN_CONFIDENCE:
+        return Detected(language=DEFAULT_LANGUAGE, confidence=0.0)
+    return Detected(language=language, confidence=confidence)
+
+
+def detect_language_confidence(text: bytes | str | list[str]) -> Detected:
+    identifier = get_identifier()
+    sample = normalize(sample_text(_pages(text)))
+    if not sample:
+        return Detected(language=DEFAULT_LANGUAGE, confidence=0.0)
+
+    counts = count_ngrams(sample)
+    language, confidence = identifier.best(
+        identifier.score(counts), sum(counts.values())
+    )
+
+    return _trusted(language, confidence)
+
+
+def detect_language(text: bytes | str | list[str]) -> Languages:
+    return detect_language_confidence(text)["language"]
+
+
+def detect_page_languages(pages: list[str]) -> tuple[Detected, list[Detected]]:
+    """
+    Language of the whole document and of every page.
+
+    Every page is sampled and scored once, the document score is the sum of the
+    page scores. Pages with too little text get the document language.
+    """
+    identifier = get_identifier()
+    if not pages:
+        return Detected(language=DEFAULT_LANGUAGE, confidence=0.0), []
+
+    page_counts = [
+        count_ngrams(normalize(_cut(page or "", PAGE_SAMPLE_CHARS))) for page in pages
+    ]
+    page_scores = [identifier.score(counts) for counts in page_counts]
+    evidence = [sum(counts.values()) for counts in page_counts]
+
+    document_scores = [sum(scores) for scores in zip(*page_scores)]
+    document = _trusted(*identifier.best(document_scores, sum(evidence)))
 
-    detected: Detected = detect(text)
+    detected = []
+    for scores, counts in zip(page_scores, evidence):
+        language, confidence = identifier.best(scores, counts)
+        if language is None or counts < MIN_PAGE_NGRAMS or confidence < MIN_CONFIDENCE:
+            detected.append(document)
+        else:
+            detected.append(Detected(language=language, confidence=confidence))
 
-    return Languages(detected["language"].lower())
+    return document, detected
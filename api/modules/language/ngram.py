@@ -0,0 +1,132 @@
+import math
+from collections import Counter
+from functools import cache
+from pathlib import Path
+
+from api.modules.language.languages import Languages
+
+# one sample text per language, named by the language code
+PROFILE_DIR = Path(__file__).parent / "profiles"
+NGRAM_SIZES = (1, 2, 3)
+# add alpha smoothing for n-grams a language never produced
+ALPHA = 0.5
+# the per n-gram log likelihoods are scaled to this many n-grams before they are
+# turned into probabilities, so the confidence does not just grow with the text length
+CONFIDENCE_EVIDENCE = 12
+
+
+def normalize(text: str) -> str:
+    """
+    Lower case letters, everything else becomes a single space
+    """
+    return " ".join(
+        "".join(char if char.isalpha() else " " for char in text.lower()).split()
+    )
+
+
+def count_ngrams(text: str) -> Counter[str]:
+    """
+    Character 1-3 grams of the words of a normalized text, words are padded
+    with spaces so the grams see word starts and ends
+    """
+    counts: Counter[str] = Counter()
+    for word in text.split():
+        padded = f" {word} "
+        for n in NGRAM_SIZES:
+            counts.update(padded[i : i + n] for i in range(len(padded) - n + 1))
+
+    counts.pop(" ", None)
+    return counts
+
+
+class LanguageIdentifier:
+    """
+    Naive bayes over character n-grams, one profile per language in PROFILE_DIR
+    """
+
+    def __init__(self, profiles: list[tuple[Languages, str]]) -> None:
+        # Languages compare by name and code and can not be dict keys,
+        # everything below is indexed like this list
+        self.languages: list[Languages] = [language for language, _ in profiles]
+
+        counts = [count_ngrams(normalize(text)) for _, text in profiles]
+        vocabulary: set[str] = set().union(*counts)
+
+        # totals and vocabulary size per n-gram length
+        vocabulary_size = Counter(len(gram) for gram in vocabulary)
+        totals = [
+            Counter(
+                {
+                    n: sum(c for g, c in grams.items() if len(g) == n)
+                    for n in NGRAM_SIZES
+                }
+            )
+            for grams in counts
+        ]
+
+        def log_prob(i: int, gram: str) -> float:
+            n = len(gram)
+            return math.log(
+                (counts[i][gram] + ALPHA)
+                / (totals[i][n] + ALPHA * (vocabulary_size[n] + 1))
+            )
+
+        languages = range(len(self.languages))
+        # gram -> log probability in every language
+        self._log_probs: dict[str, tuple[float, ...]] = {
+            gram: tuple(log_prob(i, gram) for i in languages) for gram in vocabulary
+        }
+        # log probability of an unknown gram, per gram length
+        self._unseen: dict[int, tuple[float, ...]] = {
+            n: tuple(
+                math.log(ALPHA / (totals[i][n] + ALPHA * (vocabulary_size[n] + 1)))
+                for i in languages
+            )
+            for n in NGRAM_SIZES
+        }
+
+    @classmethod
+    def from_profile_dir(cls, profile_dir: Path = PROFILE_DIR) -> "LanguageIdentifier":
+        profiles = []
+        for language in Languages:
+            path = profile_dir / f"{language.code()}.txt"
+            if path.exists():
+                profiles.append((language, path.read_text(encoding="utf-8")))
+
+        return cls(profiles)
+
+    def score(self, counts: Counter[str]) -> list[float]:
+        """
+        Log likelihood of the n-grams per language. Scores of several texts
+        can be summed to get the score of all of them together.
+        """
+        scores = [0.0] * len(self.languages)
+        for gram, count in counts.items():
+            log_probs = self._log_probs.get(gram) or self._unseen[len(gram)]
+            for i, log_prob in enumerate(log_probs):
+                scores[i] += count * log_prob
+
+        return scores
+
+    def best(
+        self, scores: list[float], evidence: int
+    ) -> tuple[Languages | None, float]:
+        """
+        Most likely language and its probability among all languages, None
+        without any n-grams
+        """
+        if evidence == 0:
+            return None, 0.0
+
+        scale = CONFIDENCE_EVIDENCE / evidence
+        top = max(scores)
+        weights = [math.exp((score - top) * scale) for score in scores]
+        index = scores.index(top)
+
+        return self.languages[index], weights[index] / sum(weights)
+
+
+@cache
+def get_identifier() -> LanguageIdentifier:
+    # built once per process on first use
+    return LanguageIdentifier.from_profile_dir()
@@ -0,0 +1,93 @@
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import fitz
+
+sys.path.append(".")
+from api.config import OCR_PAGE_MIN_CHARS, OCR_PAGE_MIN_IMAGE_COVERAGE
+
+
+@dataclass
+class PageClass:
+    page_no: int
+    # printable characters of the text layer, unmappable glyphs are not counted
+    chars: int
+    # share of the page covered by images, overlapping images count twice
+    image_coverage: float
+    has_fonts: bool
+
+    @property
+    def needs_ocr(self) -> bool:
+        if self.chars >= OCR_PAGE_MIN_CHARS:
+            # born digital or ocred before
+            return False
+
+        # a scan, maybe with a few stamped words, or text drawn with fonts
+        # that can not be mapped to characters
+        return self.image_coverage >= OCR_PAGE_MIN_IMAGE_COVERAGE or (
+            self.has_fonts and self.chars == 0
+        )
+
+
+def count_chars(text: str) -> int:
+    return sum(1 for char in text if not char.isspace() and char != "\ufffd")
+
+
+def image_coverage(page: fitz.Page) -> float:
+    area = abs(page.rect)
+    if not area:
+        return 0.0
+
+    covered = sum(
+        abs(fitz.Rect(image["bbox"]) & page.rect) for image in page.get_image_info()
+    )
+    return min(covered / area, 1.0)
+
+
+def classify_pages(path: Path, text: list[str] | None = None) -> list[PageClass]:
+    """
+    Decide per page whether it needs ocr, from the text layer, the area covered
+    by images and the fonts of the page. Nothing is rendered, so this is cheap
+    compared to the ocr itself.
+
+    text, the already extracted text of every page, saves extracting it again.
+    """
+    classes = []
+    with fitz.open(path) as document:
+        for page in document:
+            page_text = text[page.number] if text is not None else page.get_text()
+            classes.append(
+                PageClass(
+                    page_no=page.number,
+                    chars=count_chars(page_text or ""),
+                    image_coverage=image_coverage(page),
+                    has_fonts=len(page.get_fonts()) > 0,
+                )
+            )
+
+    return classes
+
+
+def pages_needing_ocr(path: Path, text: list[str] | None = None) -> list[int]:
+    """
+    0 based numbers of the pages that need ocr
+    """
+    return [page.page_no for page in classify_pages(path, text) if page.needs_ocr]
+
+
+def page_selection(pages: list[int]) -> str:
+    """
+    0 based page numbers as the 1 based page ranges of ocrmypdf, e.g. "1-3,7"
+    """
+    ranges = []
+    for page in sorted(set(pages)):
+        if ranges and ranges[-1][1] == page - 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+
+    return ",".join(
+        f"{start + 1}" if start == end else f"{start + 1}-{end + 1}"
+        for start, end in ranges
+    )
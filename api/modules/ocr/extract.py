@@ -0,0 +1,162 @@
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from enum import StrEnum
+from pathlib import Path
+
+import fitz
+
+sys.path.append(".")
+from logger import get_logger
+from api.config import (
+    EXTRACT_WORKERS,
+    EXTRACT_SHARD_PAGES,
+    EXTRACT_PARALLEL_MIN_PAGES,
+    EXTRACT_CACHE_SIZE,
+    EXTRACT_CACHE_TTL,
+)
+from api.modules.cache.ttl import TTLCache
+
+logger = get_logger()
+
+# (x0, y0, x1, y1, text, block_no, block_type), see fitz Page.get_text("blocks")
+Block = tuple[float, float, float, float, str, int, int]
+# (x0, y0, x1, y1, word, block_no, line_no, word_no), see Page.get_text("words")
+Word = tuple[float, float, float, float, str, int, int, int]
+
+
+class TextMode(StrEnum):
+    TEXT = "text"
+    # text plus the positions of the text blocks / words, e.g. for highlighting
+    BLOCKS = "blocks"
+    WORDS = "words"
+
+
+@dataclass
+class ExtractedText:
+    path: Path
+    mtime_ns: int
+    size: int
+    mode: TextMode
+    # one entry per page
+    pages: list[str] = field(default_factory=list)
+    blocks: list[list[Block]] | None = None
+    words: list[list[Word]] | None = None
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    def has_text(self) -> bool:
+        return any(page and not page.isspace() for page in self.pages)
+
+    def covers(self, mode: TextMode) -> bool:
+        return mode == TextMode.TEXT or mode == self.mode
+
+
+# key: (path, mtime_ns, size), a rewritten file gets a new entry
+_cache: TTLCache[tuple[str, int, int], ExtractedText] = TTLCache(
+    EXTRACT_CACHE_SIZE, EXTRACT_CACHE_TTL
+)
+
+
+def _extract_pages(
+    document: fitz.Document, pages: range, mode: TextMode
+) -> tuple[list[str], list[list[Block]], list[list[Word]]]:
+    text, blocks, words = [], [], []
+    for page_no in pages:
+        page = document.load_page(page_no)
+        # parse the page once, every output is read from the same text page
+        textpage = page.get_textpage()
+        text.append(page.get_text(textpage=textpage))
+        if mode == TextMode.BLOCKS:
+            blocks.append(page.get_text("blocks", textpage=textpage))
+        elif mode == TextMode.WORDS:
+            words.append(page.get_text("words", textpage=textpage))
+
+    return text, blocks, words
+
+
+def _extract_range(path: Path, pages: range, mode: TextMode):
+    # runs in a pool process, every process opens the document once
+    with fitz.open(path) as document:
+        return _extract_pages(document, pages, mode)
+
+
+def _shards(page_count: int, shard_pages: int) -> list[range]:
+    return [
+        range(start, min(start + shard_pages, page_count))
+        for start in range(0, page_count, shard_pages)
+    ]
+
+
+def extract(
+    path: Path,
+    mode: TextMode = TextMode.TEXT,
+    max_workers: int = EXTRACT_WORKERS,
+    use_cache: bool = True,
+) -> ExtractedText:
+    """
+    Text of every page of a pdf. The document is opened once, large documents
+    are split into page ranges that are extracted in a process pool.
+
+    Results are cached in process by path, mtime and size, so the same file is
+    only parsed once no matter how often its text is asked for.
+    """
+    path = Path(path)
+    stat = path.stat()
+    key = (str(path.absolute()), stat.st_mtime_ns, stat.st_size)
+
+    if use_cache:
+        cached = _cache.get(key)
+        if cached is not None and cached.covers(mode):
+            return cached
+
+    result = ExtractedText(path, stat.st_mtime_ns, stat.st_size, mode)
+    if mode == TextMode.BLOCKS:
+        result.blocks = []
+    elif mode == TextMode.WORDS:
+        result.words = []
+
+    with fitz.open(path) as document:
+        page_count = len(document)
+
+        if page_count < EXTRACT_PARALLEL_MIN_PAGES or max_workers <= 1:
+            parts = [_extract_pages(document, range(page_count), mode)]
+        else:
+            shards = _shards(page_count, EXTRACT_SHARD_PAGES)
+            logger.info(f"extracting {page_count} pages in {len(shards)} shards")
+            # spawn, forking a threaded server process can deadlock the children
+            with ProcessPoolExecutor(
+                max_workers=min(max_workers, len(shards)),
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                parts = list(
+                    executor.map(
+                        _extract_range,
+                        [path] * len(shards),
+                        shards,
+                        [mode] * len(shards),
+                    )
+                )
+
+    for text, blocks, words in parts:
+        result.pages.extend(text)
+        if result.blocks is not None:
+            result.blocks.extend(blocks)
+        if result.words is not None:
+            result.words.extend(words)
+
+    if use_cache:
+        _cache.set(key, result)
+
+    return result
+
+
+def forget(path: Path) -> None:
+    """
+    Drop the cached results of a file, e.g. before it is deleted
+    """
+    path = str(Path(path).absolute())
+    _cache.pop_where(lambda key, _: key[0] == path)
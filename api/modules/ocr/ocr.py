@@ -1,40 +1,130 @@
+import os
+import json
+from enum import StrEnum
 from pathlib import Path
 
 # import subprocess
 # import tempfile
-# import os
 import ocrmypdf
-import fitz
 
+from api.modules.ocr.classify import page_selection
+from api.modules.ocr.extract import extract
 
-def ocr_pdf(input_pdf: Path, output_pdf: Path, skip_text: bool, force=False) -> None:
-    # Run ocrmypdf to perform OCR
-    ocrmypdf.ocr(
-        input_pdf,
-        output_pdf,
-        language=["deu", "eng"],
+
+class OcrProfile(StrEnum):
+    # cleaned, rotated and optimized pdf with a text layer
+    ARCHIVAL = "archival"
+    # only the text, no pdf is written, several times faster
+    FAST_TEXT = "fast-text"
+
+
+OCR_LANGUAGES = ["deu", "eng"]
+
+# passed to ocrmypdf, see also ocr_settings
+OCR_PROFILES: dict[OcrProfile, dict] = {
+    OcrProfile.ARCHIVAL: dict(
+        language=OCR_LANGUAGES,
         use_threads=True,
-        force_ocr=force,
+        progress_bar=False,
         jbig2_lossy=False,
         jbig2_threshold=0.85,  # if two symbols are 85% similar, they will be compressed together.
-        optimize=3,
+        # lossless only, the heavy optimization is deferred, see
+        # api/modules/file/optimize.py
+        optimize=1,
         clean=True,
         clean_final=True,
         # remove_background=True,  # NotImplementedError: --remove-background is temporarily not implemented
         output_type="pdf",
         rotate_pages=True,
+    ),
+    OcrProfile.FAST_TEXT: dict(
+        language=OCR_LANGUAGES,
+        use_threads=True,
+        progress_bar=False,
+        optimize=0,
+        output_type="none",
+    ),
+}
+
+
+def writes_pdf(profile: OcrProfile) -> bool:
+    return OCR_PROFILES[profile]["output_type"] != "none"
+
+
+def ocr_settings(
+    skip_text: bool, force: bool, profile: OcrProfile = OcrProfile.ARCHIVAL
+) -> str:
+    """
+    Everything besides the input that decides how a page is ocred, e.g. as
+    part of the page cache key
+    """
+    return json.dumps(
+        dict(
+            OCR_PROFILES[profile],
+            ocrmypdf=ocrmypdf.__version__,
+            skip_text=skip_text,
+            force_ocr=force,
+        ),
+        sort_keys=True,
+    )
+
+
+def ocr_pdf(
+    input_pdf: Path,
+    output_pdf: Path,
+    skip_text: bool,
+    force=False,
+    jobs: int = None,
+    pages: list[int] | None = None,
+    profile: OcrProfile = OcrProfile.ARCHIVAL,
+    sidecar: Path | None = None,
+) -> None:
+    # pages, 0 based numbers of the only pages to ocr, the others are passed through
+    # sidecar, text file the ocred text is written to, see read_sidecar
+    if not writes_pdf(profile):
+        # ocrmypdf insists on this output if none is written
+        output_pdf = os.devnull
+
+    # Run ocrmypdf to perform OCR
+    ocrmypdf.ocr(
+        input_pdf,
+        output_pdf,
+        jobs=jobs,
+        force_ocr=force,
         skip_text=skip_text,
+        pages=page_selection(pages) if pages is not None else None,
+        sidecar=sidecar,
+        **OCR_PROFILES[profile],
     )
 
 
-def extract_text_from_pdf(pdf_path: Path) -> list[str]:
-    # Use PyMuPDF to extract text from each page of the PDF
-    pdf_document = fitz.open(pdf_path)
-    text_pages = []
+def read_sidecar(
+    sidecar: Path, page_count: int, pages: list[int] | None = None
+) -> dict[int, str]:
+    """
+    Text of every ocred page in a sidecar file of ocr_pdf.
+
+    The pages are separated by form feeds, every run of pages that were not
+    ocred is replaced by a single "[OCR skipped on page(s) ...]" entry.
+    """
+    ocred = set(range(page_count) if pages is None else pages)
+    chunks = iter(sidecar.read_text(encoding="utf-8").split("\f"))
+
+    text = {}
+    page_no = 0
+    while page_no < page_count:
+        chunk = next(chunks, "")
+        if page_no in ocred:
+            text[page_no] = chunk
+            page_no += 1
+            continue
 
-    for page_num in range(len(pdf_document)):
-        page = pdf_document.load_page(page_num)
-        page_text = page.get_text()
-        text_pages.append(page_text)
+        while page_no < page_count and page_no not in ocred:
+            page_no += 1
 
-    return text_pages
+    return text
+
+
+def extract_text_from_pdf(pdf_path: Path) -> list[str]:
+    # see api/modules/ocr/extract.py, the result is cached per file
+    return extract(pdf_path).pages
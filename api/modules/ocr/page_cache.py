@@ -0,0 +1,56 @@
+import sys
+import hashlib
+from pathlib import Path
+
+import fitz
+import pikepdf
+
+sys.path.append(".")
+from api.config import OCR_PAGE_CACHE_DIR, OCR_PAGE_CACHE_SIZE_MB
+from api.modules.cache.disk import DiskCache
+
+
+def page_keys(path: Path, pages: list[int], settings: str) -> dict[int, str]:
+    """
+    Cache key of every page in pages: a hash of what the page is rendered from,
+    its content stream, images, forms and fonts, and of the ocr settings.
+    Nothing is rendered, the raw (still compressed) streams are hashed.
+    """
+    keys = {}
+    with fitz.open(path) as document:
+        for page_no in pages:
+            page = document.load_page(page_no)
+            digest = hashlib.sha256(settings.encode())
+            digest.update(f"{tuple(page.rect)} {page.rotation}".encode())
+            digest.update(page.read_contents())
+
+            xrefs = [image[0] for image in page.get_images(full=True)]
+            xrefs += [xobject[0] for xobject in page.get_xobjects()]
+            xrefs += [font[0] for font in page.get_fonts(full=True)]
+            for xref in xrefs:
+                if xref > 0 and document.xref_is_stream(xref):
+                    digest.update(document.xref_stream_raw(xref))
+
+            keys[page_no] = digest.hexdigest()
+
+    return keys
+
+
+class PageCache(DiskCache):
+    """
+    Ocred pages on disk, one single page pdf per key, see DiskCache
+    """
+
+    def __init__(self, folder: Path, max_bytes: int) -> None:
+        super().__init__(folder, max_bytes, ".pdf")
+
+    def put(self, key: str, page: pikepdf.Page) -> None:
+        def write(tmp: Path) -> None:
+            with pikepdf.new() as single:
+                single.pages.append(page)
+                single.save(tmp)
+
+        self.write(key, write)
+
+
+page_cache = PageCache(OCR_PAGE_CACHE_DIR, OCR_PAGE_CACHE_SIZE_MB * 1024 * 1024)
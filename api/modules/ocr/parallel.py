@@ -0,0 +1,308 @@
+import sys
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from contextlib import ExitStack
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import pikepdf
+
+sys.path.append(".")
+from logger import get_logger
+from api.config import (
+    OCR_CORE_BUDGET,
+    OCR_JOB_CORES,
+    OCR_SHARD_PAGES,
+    OCR_SHARD_MIN_PAGES,
+)
+from api.modules.ocr.ocr import (
+    OcrProfile,
+    ocr_pdf,
+    ocr_settings,
+    read_sidecar,
+    writes_pdf,
+)
+from api.modules.ocr.page_cache import page_cache, page_keys
+
+logger = get_logger()
+
+
+class HeldCores:
+    """
+    A semaphore shared between processes that counts the tokens this process
+    holds in held, a shared int. When the process dies, its pool gives them
+    back with release_held.
+    """
+
+    def __init__(self, semaphore, held) -> None:
+        self.semaphore = semaphore
+        self.held = held
+        # the shards of a job release their cores from another thread
+        self._lock = threading.Lock()
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self.semaphore.acquire(blocking):
+            return False
+        # killed in between, a core is lost rather than given out twice
+        with self._lock:
+            self.held.value += 1
+        return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.held.value -= 1
+        self.semaphore.release()
+
+
+# one token per core. The worker pool replaces it with a semaphore shared
+# between all worker processes, see set_core_budget
+_core_budget = threading.BoundedSemaphore(OCR_CORE_BUDGET)
+
+
+def set_core_budget(semaphore, held=None) -> None:
+    """
+    held, a shared int, e.g. multiprocessing.Value("i", lock=False), to count
+    the tokens of this process in, see HeldCores
+    """
+    global _core_budget
+    _core_budget = semaphore if held is None else HeldCores(semaphore, held)
+
+
+def release_held(semaphore, held) -> int:
+    """
+    Gives the tokens of a dead process back to semaphore, returns how many
+    """
+    cores, held.value = held.value, 0
+    for _ in range(cores):
+        semaphore.release()
+
+    return cores
+
+
+def page_ranges(page_count: int, shard_pages: int = OCR_SHARD_PAGES) -> list[range]:
+    return [
+        range(start, min(start + shard_pages, page_count))
+        for start in range(0, page_count, shard_pages)
+    ]
+
+
+def split_pdf(input_pdf: Path, ranges: list[range], folder: Path) -> list[Path]:
+    shards = []
+    with pikepdf.open(input_pdf) as pdf:
+        for i, pages in enumerate(ranges):
+            shard_path = Path(folder, f"shard_{i}.pdf")
+            with pikepdf.new() as shard:
+                shard.pages.extend(pdf.pages[pages.start : pages.stop])
+                shard.save(shard_path)
+            shards.append(shard_path)
+
+    return shards
+
+
+def stitch_pdf(input_pdf: Path, shards: list[Path], output_pdf: Path) -> None:
+    # pikepdf copies the pages lazily, all sources must stay open until saved
+    with ExitStack() as stack:
+        original = stack.enter_context(pikepdf.open(input_pdf))
+        output = stack.enter_context(pikepdf.new())
+        output.docinfo = output.copy_foreign(original.docinfo)
+
+        for shard_path in shards:
+            shard = stack.enter_context(pikepdf.open(shard_path))
+            output.pages.extend(shard.pages)
+
+        output.save(output_pdf)
+
+
+def ocr_pdf_parallel(
+    input_pdf: Path,
+    output_pdf: Path,
+    skip_text: bool,
+    force: bool = False,
+    max_workers: int = OCR_JOB_CORES,
+    pages: list[int] | None = None,
+    use_cache: bool = True,
+    profile: OcrProfile = OcrProfile.ARCHIVAL,
+) -> dict[int, str] | None:
+    """
+    Split the pdf into page ranges, ocr them in a process pool and stitch the
+    results back together. Every running shard holds one core of the global budget.
+
+    pages, 0 based numbers of the only pages to ocr, see api/modules/ocr/classify.py.
+    All other pages are copied as they are.
+
+    Profiles that write no pdf, see api/modules/ocr/ocr.py, leave output_pdf
+    alone and return the text of the ocred pages instead.
+    """
+    pdf_output = writes_pdf(profile)
+    if use_cache and page_cache.enabled and pdf_output:
+        ocr_pdf_cached(
+            input_pdf, output_pdf, skip_text, force, max_workers, pages, profile
+        )
+        return None
+
+    with pikepdf.open(input_pdf) as pdf:
+        page_count = len(pdf.pages)
+
+    ocr_count = page_count if pages is None else len(pages)
+    if ocr_count == 0:
+        if not pdf_output:
+            return {}
+        shutil.copyfile(input_pdf, output_pdf)
+        return None
+
+    with tempfile.TemporaryDirectory(prefix="ocr_") as folder:
+        if ocr_count < OCR_SHARD_MIN_PAGES or max_workers <= 1:
+            sidecar = None if pdf_output else Path(folder, "ocr.txt")
+
+            # wait for one core, then take as many free ones as the job may use
+            _core_budget.acquire()
+            cores = 1
+            while cores < min(max_workers, ocr_count) and _core_budget.acquire(False):
+                cores += 1
+
+            try:
+                ocr_pdf(
+                    input_pdf,
+                    output_pdf,
+                    skip_text=skip_text,
+                    force=force,
+                    jobs=cores,
+                    pages=pages,
+                    profile=profile,
+                    sidecar=sidecar,
+                )
+            finally:
+                for _ in range(cores):
+                    _core_budget.release()
+
+            return None if pdf_output else read_sidecar(sidecar, page_count, pages)
+
+        ranges = page_ranges(page_count)
+        logger.info(f"ocring {ocr_count} of {page_count} pages in {len(ranges)} shards")
+
+        shards = split_pdf(input_pdf, ranges, Path(folder))
+        outputs = [Path(folder, f"ocr_{i}.pdf") for i in range(len(shards))]
+        sidecars = [
+            None if pdf_output else Path(folder, f"ocr_{i}.txt")
+            for i in range(len(shards))
+        ]
+        shard_pages: list[list[int] | None] = [None] * len(shards)
+
+        pool_size = min(max_workers, len(shards))
+        # spawn, forking a threaded server process can deadlock the children
+        with ProcessPoolExecutor(
+            max_workers=pool_size,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures: list[Future] = []
+            running: set[Future] = set()
+            for i, shard_range in enumerate(ranges):
+                if pages is not None:
+                    shard_pages[i] = [
+                        p - shard_range.start for p in pages if p in shard_range
+                    ]
+                    if not shard_pages[i]:
+                        # nothing to ocr, the shard is stitched in as it is
+                        outputs[i] = shards[i]
+                        sidecars[i] = None
+                        continue
+
+                # only as many shards as the pool runs at once hold a core,
+                # queued shards would keep them from other jobs
+                if len(running) >= pool_size:
+                    _, running = wait(running, return_when=FIRST_COMPLETED)
+                _core_budget.acquire()
+                future = executor.submit(
+                    ocr_pdf,
+                    shards[i],
+                    outputs[i],
+                    skip_text,
+                    force,
+                    1,
+                    shard_pages[i],
+                    profile,
+                    sidecars[i],
+                )
+                future.add_done_callback(lambda _: _core_budget.release())
+                futures.append(future)
+                running.add(future)
+
+            for future in futures:
+                future.result()
+
+        if pdf_output:
+            stitch_pdf(input_pdf, outputs, output_pdf)
+            return None
+
+        text = {}
+        for shard_range, sidecar, local_pages in zip(ranges, sidecars, shard_pages):
+            if sidecar is None:
+                continue
+            shard_text = read_sidecar(sidecar, len(shard_range), local_pages)
+            text.update({shard_range.start + p: t for p, t in shard_text.items()})
+
+        return text
+
+
+def ocr_pdf_cached(
+    input_pdf: Path,
+    output_pdf: Path,
+    skip_text: bool,
+    force: bool = False,
+    max_workers: int = OCR_JOB_CORES,
+    pages: list[int] | None = None,
+    profile: OcrProfile = OcrProfile.ARCHIVAL,
+) -> None:
+    """
+    ocr_pdf_parallel, but pages whose content was ocred with the same settings
+    before are taken from the page cache. Only the other pages are ocred, and
+    stored in the cache afterwards. Only for profiles that write a pdf.
+    """
+    with pikepdf.open(input_pdf) as pdf:
+        page_count = len(pdf.pages)
+
+    if pages is None:
+        pages = list(range(page_count))
+
+    keys = page_keys(input_pdf, pages, ocr_settings(skip_text, force, profile))
+
+    with ExitStack() as stack:
+        output = stack.enter_context(pikepdf.open(input_pdf))
+
+        misses = []
+        for page_no in pages:
+            cached = page_cache.get(keys[page_no])
+            if cached is None:
+                misses.append(page_no)
+                continue
+            # opened right away, an eviction can not remove an open file
+            cached_pdf = stack.enter_context(pikepdf.open(cached))
+            output.pages[page_no] = cached_pdf.pages[0]
+
+        logger.info(f"{len(pages) - len(misses)} of {len(pages)} pages ocr cached")
+
+        if misses:
+            folder = stack.enter_context(tempfile.TemporaryDirectory(prefix="ocr_"))
+            ocred_path = Path(folder, "ocr.pdf")
+            ocr_pdf_parallel(
+                input_pdf,
+                ocred_path,
+                skip_text,
+                force,
+                max_workers,
+                pages=misses,
+                use_cache=False,
+                profile=profile,
+            )
+
+            ocred = stack.enter_context(pikepdf.open(ocred_path))
+            for page_no in misses:
+                page_cache.put(keys[page_no], ocred.pages[page_no])
+                output.pages[page_no] = ocred.pages[page_no]
+
+        output.save(output_pdf)
+
+    if misses:
+        page_cache.evict()
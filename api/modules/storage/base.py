@@ -0,0 +1,99 @@
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Iterator
+from uuid import UUID
+
+sys.path.append(".")
+from api.modules.file.stream import SpoolResult, spool_to_disk
+
+ORIGINAL = "original.pdf"
+OCR = "ocr.pdf"
+# every file stored for a document
+FILE_NAMES = (ORIGINAL, OCR)
+
+
+def shard(id: UUID | str) -> Path:
+    """
+    The relative folder of a document, ab/cd/<id> for an id starting with abcd.
+    Keeps every directory small, no matter how many documents are stored.
+    """
+    id = UUID(str(id))
+    return Path(id.hex[:2], id.hex[2:4], str(id))
+
+
+class Storage(ABC):
+    """
+    The stored files of the documents, by document id and file name.
+    Ocr and rendering need real files, every backend therefore has a local
+    folder per document that stored files are fetched into and new files are
+    written to before they are stored.
+    """
+
+    @abstractmethod
+    def folder(self, id: UUID) -> Path:
+        """
+        The local folder of the files of id
+        """
+
+    def path(self, id: UUID, name: str) -> Path:
+        return Path(self.folder(id), name)
+
+    @abstractmethod
+    def fetch(self, id: UUID, name: str) -> Path | None:
+        """
+        The local path of a stored file, None if it is not stored
+        """
+
+    @abstractmethod
+    def store(self, id: UUID, name: str) -> None:
+        """
+        Store the local file path(id, name)
+        """
+
+    @abstractmethod
+    def exists(self, id: UUID, name: str) -> bool: ...
+
+    @abstractmethod
+    def open(self, id: UUID, name: str) -> BinaryIO:
+        """
+        Stream a stored file without fetching it
+        """
+
+    @abstractmethod
+    def put(self, id: UUID, name: str, source: BinaryIO) -> None:
+        """
+        Stream source into the storage without keeping a local copy
+        """
+
+    @abstractmethod
+    def copy(self, source_id: UUID, target_id: UUID, name: str) -> None:
+        """
+        Store the file name of source_id for target_id too, e.g. for duplicates
+        """
+
+    @abstractmethod
+    def delete(self, id: UUID) -> None:
+        """
+        Delete all files of id
+        """
+
+    @abstractmethod
+    def ids(self) -> Iterator[UUID]:
+        """
+        The ids of all stored documents
+        """
+
+    def save(
+        self, id: UUID, name: str, source: BinaryIO, with_hash: bool = True
+    ) -> SpoolResult:
+        """
+        Write source to the local folder of id, see spool_to_disk, and store it
+        """
+        path = self.path(id, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        result = spool_to_disk(source, path, with_hash=with_hash)
+        self.store(id, name)
+
+        return result
@@ -0,0 +1,106 @@
+import os
+import sys
+import shutil
+import uuid
+from pathlib import Path
+from string import hexdigits
+from typing import BinaryIO, Iterator
+from uuid import UUID
+
+sys.path.append(".")
+from api.modules.file.stream import link_file, spool_to_disk
+from api.modules.storage.base import Storage, shard
+
+
+def _is_shard(name: str) -> bool:
+    return len(name) == 2 and all(c in hexdigits for c in name)
+
+
+def _as_id(name: str) -> UUID | None:
+    try:
+        return UUID(name)
+    except ValueError:
+        return None
+
+
+class LocalStorage(Storage):
+    """
+    Files below base, in the sharded folders base/ab/cd/<id>.
+    With legacy_fallback, folders of the flat layout base/<id> are used as
+    long as they exist.
+    """
+
+    def __init__(self, base: Path, legacy_fallback: bool = True) -> None:
+        self.base = base
+        self.legacy_fallback = legacy_fallback
+
+    def legacy_folder(self, id: UUID) -> Path:
+        return Path(self.base, str(id))
+
+    def folder(self, id: UUID) -> Path:
+        if self.legacy_fallback:
+            legacy = self.legacy_folder(id)
+            if legacy.is_dir():
+                return legacy
+
+        return Path(self.base, shard(id))
+
+    def fetch(self, id: UUID, name: str) -> Path | None:
+        path = self.path(id, name)
+
+        return path if path.exists() else None
+
+    def store(self, id: UUID, name: str) -> None:
+        # the local folder is the storage
+        pass
+
+    def exists(self, id: UUID, name: str) -> bool:
+        return self.path(id, name).exists()
+
+    def open(self, id: UUID, name: str) -> BinaryIO:
+        return self.path(id, name).open("rb")
+
+    def put(self, id: UUID, name: str, source: BinaryIO) -> None:
+        path = self.path(id, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # unique, concurrent puts of the same file must not share it
+        tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            spool_to_disk(source, tmp, with_hash=False, max_size=None)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def copy(self, source_id: UUID, target_id: UUID, name: str) -> None:
+        target = self.path(target_id, name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        link_file(self.path(source_id, name), target)
+
+    def delete(self, id: UUID) -> None:
+        shutil.rmtree(self.folder(id), ignore_errors=True)
+
+    def ids(self) -> Iterator[UUID]:
+        # anything else below base, like the .cache folder, is skipped
+        for first in os.scandir(self.base):
+            if not first.is_dir() or not _is_shard(first.name):
+                continue
+            for second in os.scandir(first.path):
+                if not second.is_dir() or not _is_shard(second.name):
+                    continue
+                for folder in os.scandir(second.path):
+                    id = _as_id(folder.name)
+                    if id is not None and folder.is_dir():
+                        yield id
+
+        yield from self.legacy_ids()
+
+    def legacy_ids(self) -> Iterator[UUID]:
+        """
+        The ids of the documents still stored in the flat layout
+        """
+        for entry in os.scandir(self.base):
+            id = _as_id(entry.name)
+            if id is not None and entry.is_dir():
+                yield id
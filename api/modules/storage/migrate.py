@@ -0,0 +1,99 @@
+"""
+Move the stored files to the sharded layout or between storage backends
+
+    python -m api.modules.storage.migrate                 # BASE_FILE_DIR/<id> to ab/cd/<id>
+    python -m api.modules.storage.migrate --to s3         # local files into the bucket
+    python -m api.modules.storage.migrate --to s3 --delete
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.append(".")
+from logger import get_logger
+from api.modules.storage.base import FILE_NAMES, Storage, shard
+from api.modules.storage.local import LocalStorage
+from api.modules.storage.storage import get_storage
+
+logger = get_logger()
+
+
+def shard_legacy_folders(storage: LocalStorage, dry_run: bool = False) -> int:
+    """
+    Move the folders of the flat layout into the sharded one. Every folder is
+    renamed at once, the api keeps working meanwhile, see LocalStorage.folder.
+    """
+    moved = 0
+    # listed up front, the directory changes while the folders are moved
+    for id in list(storage.legacy_ids()):
+        source = storage.legacy_folder(id)
+        target = Path(storage.base, shard(id))
+        if target.exists():
+            logger.warning(f"not moving {source}, {target} already exists")
+            continue
+
+        if not dry_run:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.rename(source, target)
+        moved += 1
+        if moved % 1000 == 0:
+            logger.info(f"moved {moved} folders")
+
+    return moved
+
+
+def copy_files(
+    source: Storage, target: Storage, delete: bool = False, dry_run: bool = False
+) -> int:
+    """
+    Stream every file of source to target. Files target already has are
+    skipped, an interrupted copy can simply be restarted.
+    """
+    copied = 0
+    for id in source.ids():
+        for name in FILE_NAMES:
+            if not source.exists(id, name) or target.exists(id, name):
+                continue
+
+            if not dry_run:
+                with source.open(id, name) as fr:
+                    target.put(id, name, fr)
+            copied += 1
+            if copied % 1000 == 0:
+                logger.info(f"copied {copied} files")
+
+        if delete and not dry_run:
+            source.delete(id)
+
+    return copied
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--from", dest="source", choices=["local", "s3"], default="local"
+    )
+    parser.add_argument("--to", dest="target", choices=["local", "s3"], default="local")
+    parser.add_argument(
+        "--delete", action="store_true", help="delete the files from the source"
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.source == args.target == "local":
+        moved = shard_legacy_folders(get_storage("local"), args.dry_run)
+        action = "would move" if args.dry_run else "moved"
+        logger.info(f"{action} {moved} folders into the sharded layout")
+        return
+
+    copied = copy_files(
+        get_storage(args.source), get_storage(args.target), args.delete, args.dry_run
+    )
+    action = "would copy" if args.dry_run else "copied"
+    logger.info(f"{action} {copied} files from {args.source} to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
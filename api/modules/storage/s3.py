@@ -0,0 +1,273 @@
+import os
+import sys
+import time
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Iterator
+from uuid import UUID
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    # only needed with STORAGE_BACKEND=s3
+    boto3 = None
+
+sys.path.append(".")
+from logger import get_logger
+from api.modules.file.stream import link_file
+from api.modules.storage.base import Storage, shard
+
+logger = get_logger()
+
+# the local copies are scanned for eviction every this many downloads
+EVICT_EVERY = 100
+# local copies used more recently are kept, a job or a response may still be
+# about to read them by their path
+EVICT_MIN_IDLE = 3600
+
+
+def _not_found(ex: "ClientError") -> bool:
+    return ex.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+
+def _etag_path(path: Path) -> Path:
+    # the etag of the object a local copy was downloaded from or uploaded to
+    return path.with_name(f".{path.name}.etag")
+
+
+def _hidden(name: str) -> bool:
+    # etags and the temporary files of downloads and writes in progress
+    return name.startswith(".") or name.endswith(".tmp")
+
+
+class S3Storage(Storage):
+    """
+    Files as objects in an s3 compatible bucket, under prefix/ab/cd/<id>/<name>.
+    Local copies are kept below cache_dir, the least recently used are evicted
+    once they take more than cache_max_bytes. Other nodes can replace an
+    object, a local copy is only used while its etag matches the object's.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str,
+        cache_dir: Path,
+        cache_max_bytes: int,
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        access_key_id: str | None = None,
+        secret_access_key: str | None = None,
+    ) -> None:
+        if boto3 is None:
+            raise RuntimeError("The s3 storage backend needs boto3, pip install boto3")
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        # boto3 clients are thread safe, sessions are not
+        self.client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+        )
+        self._downloads = 0
+        self._downloads_lock = threading.Lock()
+
+    def key(self, id: UUID, name: str) -> str:
+        return f"{self.prefix}{shard(id).as_posix()}/{name}"
+
+    def folder(self, id: UUID) -> Path:
+        return Path(self.cache_dir, shard(id))
+
+    def _etag(self, id: UUID, name: str) -> str | None:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.key(id, name))
+        except ClientError as ex:
+            if _not_found(ex):
+                return None
+            raise
+
+        return head["ETag"]
+
+    def _is_current(self, path: Path, etag: str) -> bool:
+        try:
+            return _etag_path(path).read_text() == etag
+        except FileNotFoundError:
+            return False
+
+    def _set_etag(self, path: Path, etag: str | None) -> None:
+        if etag is None:
+            _etag_path(path).unlink(missing_ok=True)
+        else:
+            _etag_path(path).write_text(etag)
+
+    def fetch(self, id: UUID, name: str) -> Path | None:
+        path = self.path(id, name)
+        etag = self._etag(id, name)
+        if etag is None:
+            return None
+
+        if self._is_current(path, etag):
+            try:
+                # the mtime is the last use, see evict
+                os.utime(path)
+                return path
+            except FileNotFoundError:
+                pass
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            # replaced after the head, the copy is newer than its etag and is
+            # downloaded again next time
+            self.client.download_file(self.bucket, self.key(id, name), str(tmp))
+            os.replace(tmp, path)
+        except ClientError as ex:
+            if _not_found(ex):
+                return None
+            raise
+        finally:
+            tmp.unlink(missing_ok=True)
+        self._set_etag(path, etag)
+
+        with self._downloads_lock:
+            self._downloads += 1
+            evict = self._downloads % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+        return path
+
+    def store(self, id: UUID, name: str) -> None:
+        path = self.path(id, name)
+        # multipart for large files, read from disk in chunks
+        self.client.upload_file(str(path), self.bucket, self.key(id, name))
+        self._set_etag(path, self._etag(id, name))
+
+    def exists(self, id: UUID, name: str) -> bool:
+        if self.path(id, name).exists():
+            return True
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(id, name))
+        except ClientError as ex:
+            if _not_found(ex):
+                return False
+            raise
+
+        return True
+
+    def open(self, id: UUID, name: str) -> BinaryIO:
+        path = self.path(id, name)
+        etag = self._etag(id, name)
+        if etag is not None and self._is_current(path, etag):
+            try:
+                return path.open("rb")
+            except FileNotFoundError:
+                pass
+
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=self.key(id, name)
+            )
+        except ClientError as ex:
+            if _not_found(ex):
+                raise FileNotFoundError(self.key(id, name)) from ex
+            raise
+
+        return response["Body"]
+
+    def put(self, id: UUID, name: str, source: BinaryIO) -> None:
+        self.client.upload_fileobj(source, self.bucket, self.key(id, name))
+
+    def copy(self, source_id: UUID, target_id: UUID, name: str) -> None:
+        # copied within the bucket, nothing is transferred
+        self.client.copy(
+            {"Bucket": self.bucket, "Key": self.key(source_id, name)},
+            self.bucket,
+            self.key(target_id, name),
+        )
+
+        source = self.path(source_id, name)
+        etag = self._etag(source_id, name)
+        if etag is not None and self._is_current(source, etag):
+            target = self.path(target_id, name)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            link_file(source, target)
+            # a multipart copy gets an etag of its own
+            self._set_etag(target, self._etag(target_id, name))
+
+    def delete(self, id: UUID) -> None:
+        prefix = f"{self.prefix}{shard(id).as_posix()}/"
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            objects = [{"Key": object["Key"]} for object in page.get("Contents", [])]
+            if objects:
+                self.client.delete_objects(
+                    Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True}
+                )
+
+        shutil.rmtree(self.folder(id), ignore_errors=True)
+
+    def ids(self) -> Iterator[UUID]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        last = None
+        # keys are listed in order, the files of a document follow each other
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for object in page.get("Contents", []):
+                parts = object["Key"][len(self.prefix) :].split("/")
+                if len(parts) != 4:
+                    continue
+                try:
+                    id = UUID(parts[2])
+                except ValueError:
+                    continue
+                if id != last:
+                    last = id
+                    yield id
+
+    def evict(self, min_idle: float = EVICT_MIN_IDLE) -> int:
+        """
+        Delete the least recently used local copies until they fit into
+        cache_max_bytes. They are still stored in the bucket. Copies used in
+        the last min_idle seconds and files being written are kept, the cache
+        can be larger until then.
+        """
+        entries = []
+        for folder, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if _hidden(name):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        evicted = 0
+        used = time.time() - min_idle
+        for mtime, entry_size, path in sorted(entries):
+            if size <= self.cache_max_bytes or mtime > used:
+                break
+            # the etag first, without it the copy is not used anymore
+            _etag_path(Path(path)).unlink(missing_ok=True)
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+        if evicted:
+            logger.info(f"evicted {evicted} local copies from {self.cache_dir}")
+
+        return evicted
@@ -0,0 +1,41 @@
+import sys
+
+sys.path.append(".")
+from api.config import (
+    BASE_FILE_DIR,
+    STORAGE_BACKEND,
+    STORAGE_LEGACY_FALLBACK,
+    STORAGE_CACHE_DIR,
+    STORAGE_CACHE_SIZE_MB,
+    S3_BUCKET,
+    S3_PREFIX,
+    S3_ENDPOINT_URL,
+    S3_REGION,
+    S3_ACCESS_KEY_ID,
+    S3_SECRET_ACCESS_KEY,
+)
+from api.modules.storage.base import Storage
+from api.modules.storage.local import LocalStorage
+from api.modules.storage.s3 import S3Storage
+
+
+def get_storage(backend: str = STORAGE_BACKEND) -> Storage:
+    if backend == "local":
+        return LocalStorage(BASE_FILE_DIR, STORAGE_LEGACY_FALLBACK)
+
+    if backend == "s3":
+        return S3Storage(
+            S3_BUCKET,
+            S3_PREFIX,
+            STORAGE_CACHE_DIR,
+            STORAGE_CACHE_SIZE_MB * 1024 * 1024,
+            S3_ENDPOINT_URL,
+            S3_REGION,
+            S3_ACCESS_KEY_ID,
+            S3_SECRET_ACCESS_KEY,
+        )
+
+    raise ValueError(f"Unknown storage backend {backend}, use local or s3")
+
+
+storage: Storage = get_storage()
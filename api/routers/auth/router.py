@@ -4,6 +4,7 @@ sys.path.append(".")
 from fastapi import APIRouter, status, Depends
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 
+from api.db.database import DB, get_db
 from api.db.models.users import User
 from logger import get_logger
 from api.exceptions.base import ServerHTTPException
@@ -15,9 +16,10 @@ router = APIRouter(prefix="/oauth", tags=["oauth"])
 
 @router.get("/token", response_model = TokenResponse)
 async def get_token(
-    credentials: HTTPBasicCredentials = Depends(security)
+    credentials: HTTPBasicCredentials = Depends(security),
+    db: DB = Depends(get_db)
 ):
-    user: User = User.get_user_by_username(credentials.username)
+    user: User = await User.get_user_by_username(credentials.username, db)
 
     if user.verify_password(credentials.password):
         return TokenResponse(token = user.generate_token())
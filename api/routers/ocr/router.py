@@ -1,13 +1,15 @@
 import time
 from fastapi import APIRouter, Depends, File as FastApiFile, UploadFile
-from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 
 from api.auth import validate_token
 from api.db.models.users import User
 from api.exceptions.file import InvalidFileFormatException
 from api.modules.file.file_processor import File, FileProcessor
 from api.modules.file.pdffile import PDFFile
-
+from api.modules.storage.storage import storage
+from api.routers.responses import RangeFileResponse
 
 router = APIRouter(prefix="/ocr", tags=["OCR"])
 
@@ -17,29 +19,37 @@ FILE_RETURN_HEADERS = {
 }
 
 
-@router.post("/ocr_file")
+@router.post("/ocr_file", response_class=RangeFileResponse)
 async def ocr(
     upload_file: UploadFile = FastApiFile(...),
     force: bool = False,
     user: User = Depends(validate_token),
-) -> StreamingResponse:
+) -> RangeFileResponse:
     if not PDFFile.is_pdf_file(upload_file):
         raise InvalidFileFormatException(upload_file, "musst be a pdf!")
 
     file = File(upload_file)
 
-    file_processor = FileProcessor(file)
-    start = time.process_time()
-    file_processor.ocr(force)
-    durration = time.process_time() - start
-
-    return StreamingResponse(
-        open(file_processor.ocr_path, "rb"),
+    # stores the upload, the files have no row and are deleted once sent
+    file_processor = await run_in_threadpool(FileProcessor, file)
+    try:
+        start = time.process_time()
+        # ocrmypdf does not allow force_ocr and skip_text at the same time
+        await run_in_threadpool(file_processor.ocr, force, skip_text=not force)
+        durration = time.process_time() - start
+        has_text = await run_in_threadpool(file_processor.has_text)
+    except BaseException:
+        await run_in_threadpool(storage.delete, file_processor.id)
+        raise
+
+    return RangeFileResponse(
+        file_processor.ocr_path,
         media_type="application/pdf",
+        filename=file.filename,
+        content_disposition_type="inline",
         headers={
             "processing-time-seconds": f"{durration:0.4}",
-            "file-has-ocr": str(file_processor.file_has_text),
-            "Content-Disposition": f'inline; filename="{file.upload_file.filename}"',
-            "content-type": "application/octet-stream",
+            "file-has-ocr": str(has_text),
         },
+        background=BackgroundTask(storage.delete, file_processor.id),
     )
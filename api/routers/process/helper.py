@@ -1,7 +1,29 @@
 import os
+import base64
+import binascii
+import datetime
+from uuid import UUID
+
+from api.exceptions.db import InvalidCursorException
 
 
 def get_file_size_mb(file_path) -> float:
     size_bytes = os.path.getsize(file_path)
     size_mb = size_bytes / 1024 / 1024
     return float("{:.2f}".format(size_mb))
+
+
+def encode_cursor(created_on: datetime.datetime, id: UUID) -> str:
+    key = f"{created_on.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> tuple[datetime.datetime, UUID] | None:
+    if cursor is None:
+        return None
+
+    try:
+        created_on, id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.datetime.fromisoformat(created_on), UUID(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorException(cursor, e)
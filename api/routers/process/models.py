@@ -1,18 +1,21 @@
 import sys
+import datetime
+from enum import StrEnum
 from pathlib import Path
 from typing import Self
 from uuid import UUID
 
 from pydantic import BaseModel, Field
+from sqlalchemy import Row
 
 from api.db.models.files import Files
 from api.modules.language.languages import Languages
-
+from api.modules.ocr.ocr import OcrProfile
 
 sys.path.append(".")
 
 from api.modules.file.pdffile import PDFFile
-from api.routers.process.helper import get_file_size_mb
+from api.routers.process.helper import get_file_size_mb, encode_cursor
 
 
 class FileUploadResponse(BaseModel):
@@ -59,25 +62,95 @@ class FileOcrResponse(BaseModel):
 class FileResponse(BaseModel):
     id: UUID
     file_name: str
+    created_on: datetime.datetime | None = None
+    cursor: str | None = Field(
+        None, description="Pass as cursor to continue the listing after this file"
+    )
 
-    def from_files(cls, orm: Files) -> "FileResponse":
-        obj: FileResponse = cls()
-        obj.id = orm.id
-        obj.file_name = orm.filename
+    @classmethod
+    def from_files(cls, orm: Files) -> Self:
+        return cls(id=orm.id, file_name=orm.filename, created_on=orm.created_on)
+
+    @classmethod
+    def from_row(cls, row: Row) -> Self:
+        return cls(
+            id=row.id,
+            file_name=row.filename,
+            created_on=row.created_on,
+            cursor=encode_cursor(row.created_on, row.id),
+        )
 
 
 class FileTextResponse(FileResponse):
+    file_language: Languages | None = None
+    file_text: list[str] | None
+
+    @classmethod
+    def from_files(cls, orm: Files) -> Self:
+        return cls(
+            id=orm.id,
+            file_name=orm.filename,
+            created_on=orm.created_on,
+            file_language=orm.file_text.file_language,
+            file_text=orm.file_text.file_text,
+        )
+
+    @classmethod
+    def from_row(cls, row: Row) -> Self:
+        return cls(
+            id=row.id,
+            file_name=row.filename,
+            created_on=row.created_on,
+            cursor=encode_cursor(row.created_on, row.id),
+            file_language=row.file_language,
+            file_text=row.file_text,
+        )
+
+
+class FileSearchResponse(BaseModel):
+    id: UUID
+    file_name: str
     file_language: Languages
-    file_text: list[str]
+    rank: float
+    headline: str = Field(description="Matches highlighted with <b></b>")
+
+    @classmethod
+    def from_row(cls, row: Row) -> Self:
+        return cls(
+            id=row.file_id,
+            file_name=row.filename,
+            file_language=row.file_language,
+            rank=row.rank,
+            headline=row.headline,
+        )
+
+
+class PageSearchResponse(BaseModel):
+    id: UUID
+    file_name: str
+    page_no: int = Field(description="Page number starting at 1")
+    rank: float
+    headline: str = Field(description="Matches highlighted with <b></b>")
 
     @classmethod
-    def from_files(cls, orm: Files) -> "FileTextResponse":
-        obj: FileTextResponse = cls()
+    def from_row(cls, row: Row) -> Self:
+        return cls(
+            id=row.file_id,
+            file_name=row.filename,
+            page_no=row.page_no,
+            rank=row.rank,
+            headline=row.headline,
+        )
+
 
-        obj.id = orm.id
-        obj.file_name = orm.filename
-        obj.file_language = orm.file_text.file_language
-        obj.file_text = orm.file_text.file_text
+class ListFormat(StrEnum):
+    JSON = "json"
+    NDJSON = "ndjson"
+
+
+class FileVersion(StrEnum):
+    ORIGINAL = "original"
+    OCR = "ocr"
 
 
 class FileUploadRequest(BaseModel):
@@ -85,6 +158,11 @@ class FileUploadRequest(BaseModel):
     force_ocr: bool = Field(
         False, description="If set to False and OCR is detected donot overwrite it."
     )
+    ocr_profile: OcrProfile = Field(
+        OcrProfile.ARCHIVAL,
+        description="archival writes an optimized pdf with a text layer, "
+        "fast-text only extracts the text",
+    )
     language: Languages | None = Field(
         None,
         description="Set a language for this document. If None is given auto detect it",
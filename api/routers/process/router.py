@@ -4,24 +4,58 @@ import time
 from pathlib import Path
 from typing import Self
 from uuid import UUID
-from fastapi import APIRouter, Depends, File as FastFile, UploadFile, BackgroundTasks
+from fastapi import (
+    APIRouter,
+    Depends,
+    File as FastFile,
+    UploadFile,
+    BackgroundTasks,
+    Header,
+    Query,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 
-from api.db.models.files import FileText
+from api.db.models.files import FilePage, FileText
+from api.modules.language.detect_language import detect_language
 from api.modules.language.languages import Languages
 from api.routers.process.models import (
     FileOcrResponse,
     FileResponse,
+    FileSearchResponse,
     FileTextResponse,
     FileUploadRequest,
     FileUploadResponse,
+    FileVersion,
+    ListFormat,
+    PageSearchResponse,
 )
-
+from api.routers.process.helper import decode_cursor
+from api.routers.responses import RangeFileResponse, etag_matches
 
 sys.path.append(".")
 from api.auth import validate_token
+from api.config import (
+    FILE_LIST_MAX_LIMIT,
+    SEARCH_MAX_LIMIT,
+    PREVIEW_FORMAT,
+    PREVIEW_MAX_AGE,
+    PREVIEW_SIZES,
+)
+from api.db.database import DB, SessionLocal, get_db
+from api.db.models.jobs import JobKind, OcrJob
 from api.db.models.users import User
 from api.modules.file.pdffile import PDFFile, FilesDB
+from api.modules.storage.base import OCR, ORIGINAL
+from api.modules.file.preview import (
+    PreviewFormat,
+    content_hash,
+    get_preview,
+    preview_key,
+)
+from api.exceptions.base import ServerHTTPException
 from api.exceptions.file import InvalidFileFormatException
 
 router = APIRouter(prefix="/files", tags=["Files"])
@@ -32,6 +66,7 @@ async def upload_file(
     file_upload_request: FileUploadRequest = Depends(FileUploadRequest),
     file_data: UploadFile = FastFile(...),
     user: User = Depends(validate_token),
+    db: DB = Depends(get_db),
 ) -> FileUploadResponse:
     if not PDFFile.is_pdf_file(file_data):
         raise InvalidFileFormatException(file_data, "musst be a pdf!")
@@ -41,8 +76,10 @@ async def upload_file(
             file_upload_request.filename += ".pdf"
         file_data.filename = file_upload_request.filename
 
-    file = PDFFile.new(user, file_data)
-    file.save()
+    # committed together with the job, a rejected upload leaves no row behind
+    file = await PDFFile.new(user, file_data, db, commit=False)
+    await run_in_threadpool(file.save)
+    await OcrJob.enqueue(file.db_file.id, user, db, kind=JobKind.PREVIEW)
 
     return FileUploadResponse.from_pdffile(file)
 
@@ -53,10 +90,10 @@ async def upload_file(
     description="Upload the file, then process in the background",
 )
 async def async_upload_file(
-    background_task: BackgroundTasks,
     file_upload_request: FileUploadRequest = Depends(FileUploadRequest),
     file_data: UploadFile = FastFile(...),
     user: User = Depends(validate_token),
+    db: DB = Depends(get_db),
 ) -> FileUploadResponse:
     if not PDFFile.is_pdf_file(file_data):
         raise InvalidFileFormatException(file_data, "musst be a pdf!")
@@ -66,11 +103,18 @@ async def async_upload_file(
             file_upload_request.filename += ".pdf"
         file_data.filename = file_upload_request.filename
 
-    file = PDFFile.new(user, file_data)
-    file.save()
-
-    background_task.add_task(
-        ocr_file(file.db_file.id, file_upload_request.force_ocr, user)
+    # committed together with the job
+    file = await PDFFile.new(user, file_data, db, commit=False)
+    await run_in_threadpool(file.save)
+
+    # processed by the ocr worker pool, the request session is closed by then
+    await OcrJob.enqueue(file.db_file.id, user, db, kind=JobKind.PREVIEW, commit=False)
+    await OcrJob.enqueue(
+        file.db_file.id,
+        user,
+        db,
+        file_upload_request.force_ocr,
+        file_upload_request.ocr_profile,
     )
 
     return FileUploadResponse.from_pdffile(file)
@@ -78,15 +122,19 @@ async def async_upload_file(
 
 @router.post("/ocr", response_model=FileOcrResponse)
 async def ocr_file(
-    id: UUID, force: bool = False, user: User = Depends(validate_token)
+    id: UUID,
+    force: bool = False,
+    user: User = Depends(validate_token),
+    db: DB = Depends(get_db),
 ) -> FileOcrResponse:
     process_start = time.time()
-    file = PDFFile.load(user, id)
+    file = await PDFFile.load(user, id, db)
 
     ocr_start = time.time()
-    file.ocr(force)
+    # ocrmypdf does not allow force_ocr and skip_text at the same time
+    await run_in_threadpool(file.ocr, force, skip_text=not force)
     full_text_start = time.time()
-    file.write_text_to_db(user)
+    await file.write_text_to_db(user, db)
     process_end = time.time()
 
     return FileOcrResponse.from_pdffile(
@@ -98,48 +146,252 @@ async def ocr_file(
 
 
 @router.get("/get", response_model=FileResponse)
-async def get_file(id: UUID, user: User = Depends(validate_token)) -> FileResponse:
-    file: FilesDB = FilesDB.get_without_text(user, id)
+async def get_file(
+    id: UUID, user: User = Depends(validate_token), db: DB = Depends(get_db)
+) -> FileResponse:
+    file: FilesDB = await FilesDB.get_without_text(user, id, db)
 
     return FileResponse.from_files(file)
 
 
 @router.get("/get_with_text", response_model=FileTextResponse)
 async def get_file_with_text(
-    id: UUID, user: User = Depends(validate_token)
+    id: UUID, user: User = Depends(validate_token), db: DB = Depends(get_db)
 ) -> FileResponse:
-    file: FilesDB = FilesDB.get_with_text(user, id)
+    file: FilesDB = await FilesDB.get_with_text(user, id, db)
 
     return FileTextResponse.from_files(file)
 
 
-@router.get("/get_all", response_model=list[FileResponse])
-async def get_all(user: User = Depends(validate_token)) -> list[UUID]:
-    files: list[FilesDB] = FilesDB.list_all_without_text(user)
+async def _fetch(pdf: PDFFile, name: str) -> Path:
+    # downloads from a remote storage, off the event loop
+    path = await run_in_threadpool(pdf.fetch, name)
+    if path is None:
+        raise ServerHTTPException(
+            status.HTTP_404_NOT_FOUND, "The file is missing on disk"
+        )
 
-    ret = list()
-    for file in files:
-        ret.append(FileResponse.from_files(file))
+    return path
 
-    return ret
+
+@router.get(
+    "/preview",
+    response_class=Response,
+    responses={200: {"content": {"image/webp": {}, "image/jpeg": {}}}},
+)
+async def get_file_preview(
+    id: UUID,
+    page: int = Query(1, ge=1),
+    size: str = Query("thumbnail", description=f"One of {', '.join(PREVIEW_SIZES)}"),
+    format: PreviewFormat = PreviewFormat(PREVIEW_FORMAT),
+    if_none_match: str | None = Header(None),
+    user: User = Depends(validate_token),
+    db: DB = Depends(get_db),
+) -> Response:
+    if size not in PREVIEW_SIZES:
+        raise ServerHTTPException(
+            status.HTTP_400_BAD_REQUEST, f"size must be one of {list(PREVIEW_SIZES)}"
+        )
+
+    file: FilesDB = await FilesDB.get_without_text(user, id, db)
+    if file is None:
+        raise ServerHTTPException(
+            status.HTTP_404_NOT_FOUND, "No file found with the id"
+        )
+
+    # previews show the file as uploaded, it never changes. Its stored hash is
+    # the etag, a 304 does not touch the storage
+    pdf = PDFFile.load_with_db(file)
+    path = None
+    if file.sha256 is None:
+        path = await _fetch(pdf, ORIGINAL)
+    sha256 = await run_in_threadpool(content_hash, path, file.sha256)
+    width = PREVIEW_SIZES[size]
+    key = preview_key(sha256, page - 1, width, format)
+
+    headers = {
+        "ETag": f'"{key}"',
+        "Cache-Control": f"private, max-age={PREVIEW_MAX_AGE}, immutable",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if path is None:
+        path = await _fetch(pdf, ORIGINAL)
+    preview = await run_in_threadpool(get_preview, path, key, page - 1, width, format)
+
+    return Response(preview, media_type=format.media_type, headers=headers)
+
+
+@router.get(
+    "/download",
+    response_class=RangeFileResponse,
+    responses={
+        200: {"content": {"application/pdf": {}}},
+        206: {"description": "The requested range of the pdf"},
+        304: {"description": "The pdf did not change since the given ETag"},
+        416: {"description": "The requested range lies outside of the pdf"},
+    },
+)
+async def download_file(
+    id: UUID,
+    version: FileVersion = FileVersion.OCR,
+    user: User = Depends(validate_token),
+    db: DB = Depends(get_db),
+) -> RangeFileResponse:
+    """
+    The pdf as uploaded or with its ocr layer. Supports Range requests, so
+    viewers can load pages lazily, and If-None-Match.
+    """
+    file: FilesDB = await FilesDB.get_without_text(user, id, db)
+    if file is None:
+        raise ServerHTTPException(
+            status.HTTP_404_NOT_FOUND, "No file found with the id"
+        )
+
+    pdf = PDFFile.load_with_db(file)
+    headers = {"Cache-Control": "private, no-cache"}
+    if version == FileVersion.ORIGINAL:
+        path = await _fetch(pdf, ORIGINAL)
+        # the original never changes, its hash is a stronger etag than the mtime
+        if file.sha256 is not None:
+            headers["ETag"] = f'"{file.sha256}"'
+    else:
+        path = await run_in_threadpool(pdf.fetch, OCR)
+        if path is None:
+            # born digital and fast-text files, and duplicates of them, have
+            # no ocr pdf of their own, the original is their processed version
+            if not await FileText.has_text(file.id, user, db):
+                raise ServerHTTPException(
+                    status.HTTP_404_NOT_FOUND, "The file has not been ocred yet"
+                )
+            path = await _fetch(pdf, ORIGINAL)
+
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise ServerHTTPException(
+            status.HTTP_404_NOT_FOUND, "The file is missing on disk"
+        )
+
+    return RangeFileResponse(
+        path,
+        headers=headers,
+        media_type="application/pdf",
+        filename=file.filename,
+        stat_result=stat_result,
+        content_disposition_type="inline",
+    )
 
 
-@router.get("/get_all_with_text", response_model=list[FileTextResponse])
-async def get_all_files_with_text(user: User = Depends(validate_token)) -> FileResponse:
-    files: list[FilesDB] = FilesDB.list_all_with_text(user)
+def _stream_files(
+    user: User,
+    limit: int,
+    cursor: str | None,
+    format: ListFormat,
+    with_text: bool,
+) -> StreamingResponse:
+    after = decode_cursor(cursor)
+    model = FileTextResponse if with_text else FileResponse
+
+    async def body():
+        # the request session is closed before the body is sent
+        async with SessionLocal() as db:
+            first = True
+            if format == ListFormat.JSON:
+                yield "["
+            async for row in FilesDB.stream_page(user, db, limit, after, with_text):
+                item = model.from_row(row).model_dump_json()
+                if format == ListFormat.NDJSON:
+                    yield item + "\n"
+                else:
+                    yield item if first else "," + item
+                first = False
+            if format == ListFormat.JSON:
+                yield "]"
+
+    media_type = (
+        "application/x-ndjson" if format == ListFormat.NDJSON else "application/json"
+    )
+    return StreamingResponse(body(), media_type=media_type)
 
-    ret = list()
-    for file in files:
-        ret.append(FileTextResponse.from_files(file))
 
-    return ret
+@router.get(
+    "/get_all",
+    response_model=list[FileResponse],
+    description="Page through the files ordered by upload time",
+)
+async def get_all(
+    limit: int = Query(100, ge=1, le=FILE_LIST_MAX_LIMIT),
+    cursor: str | None = Query(None, description="cursor of the last file seen"),
+    format: ListFormat = ListFormat.JSON,
+    user: User = Depends(validate_token),
+) -> StreamingResponse:
+    return _stream_files(user, limit, cursor, format, with_text=False)
 
 
-@router.get("/full_text_search", response_model=list[UUID])
+@router.get(
+    "/get_all_with_text",
+    response_model=list[FileTextResponse],
+    description="Page through the files and their text ordered by upload time",
+)
+async def get_all_files_with_text(
+    limit: int = Query(100, ge=1, le=FILE_LIST_MAX_LIMIT),
+    cursor: str | None = Query(None, description="cursor of the last file seen"),
+    format: ListFormat = ListFormat.JSON,
+    user: User = Depends(validate_token),
+) -> StreamingResponse:
+    return _stream_files(user, limit, cursor, format, with_text=True)
+
+
+@router.get(
+    "/full_text_search",
+    response_model=list[UUID],
+    description="Ids of the matching files, best match first",
+)
 async def get_file_full_text_search(
-    text: str, user: User = Depends(validate_token)
+    text: str,
+    limit: int = Query(100, ge=1, le=SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    user: User = Depends(validate_token),
+    db: DB = Depends(get_db),
 ) -> list[UUID]:
-    return FilesDB.find_by_text(user, text)
+    return await FilesDB.find_by_text(user, text, db, limit, offset)
+
+
+@router.get(
+    "/search",
+    response_model=list[FileSearchResponse],
+    description="Ranked search with highlighted snippets, "
+    + "accepts web search syntax like 'quoted phrases', or and -excluded",
+)
+async def search_files(
+    text: str,
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    user: User = Depends(validate_token),
+    db: DB = Depends(get_db),
+) -> list[FileSearchResponse]:
+    rows = await FileText.search(user, text, db, limit, offset)
+
+    return [FileSearchResponse.from_row(row) for row in rows]
+
+
+@router.get(
+    "/search_pages",
+    response_model=list[PageSearchResponse],
+    description="Like /search, but returns the matching pages",
+)
+async def search_pages(
+    text: str,
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    user: User = Depends(validate_token),
+    db: DB = Depends(get_db),
+) -> list[PageSearchResponse]:
+    rows = await FilePage.search(user, text, db, limit, offset)
+
+    return [PageSearchResponse.from_row(row) for row in rows]
 
 
 # @router.put("/update")
@@ -152,9 +404,11 @@ async def get_file_full_text_search(
 
 
 @router.get("/detect_language", response_model=str)
-async def detect_file_language(id: UUID, user: User = Depends(validate_token)) -> str:
-    file: FilesDB = FilesDB.get_with_text(user, id)
-    return FileText.detect_language(file.file_text.file_text).code()
+async def detect_file_language(
+    id: UUID, user: User = Depends(validate_token), db: DB = Depends(get_db)
+) -> str:
+    file: FilesDB = await FilesDB.get_with_text(user, id, db)
+    return detect_language(file.file_text.file_text).code()
 
 
 @router.post("/set_language", response_model=Languages)
@@ -1,13 +1,65 @@
+import datetime
 from pathlib import Path
+from typing import Self
 from uuid import UUID
 from pydantic import BaseModel, Field
 
+from api.db.models.jobs import JobKind, JobStatus, OcrJob
 from api.modules.language.languages import Languages
+from api.modules.ocr.ocr import OcrProfile
 
 
 class FileUploadResponse(BaseModel):
     id: UUID
     path: Path
+    job_id: UUID | None = Field(None, description="Id of the queued ocr job")
+    status: JobStatus
+    duplicate_of: UUID | None = Field(
+        None, description="Identical file whose ocr result was reused"
+    )
+
+
+class BulkUploadFile(FileUploadResponse):
+    filename: str
+
+
+class BulkUploadResponse(BaseModel):
+    files: list[BulkUploadFile]
+    skipped: list[str] = Field(
+        [], description="Uploaded files and archive members that are no pdfs"
+    )
+
+
+class JobResponse(BaseModel):
+    id: UUID
+    file_id: UUID
+    kind: JobKind
+    status: JobStatus
+    profile: OcrProfile
+    attempts: int
+    error: str | None = None
+    ocr_pages: int | None = Field(None, description="Number of ocred pages")
+    ocr_seconds: float | None = Field(None, description="Time spent on the ocr")
+    created_on: datetime.datetime
+    started_on: datetime.datetime | None = None
+    finished_on: datetime.datetime | None = None
+
+    @staticmethod
+    def from_job(job: OcrJob) -> Self:
+        return JobResponse(
+            id=job.id,
+            file_id=job.file_id,
+            kind=job.kind,
+            status=job.status,
+            profile=job.profile,
+            attempts=job.attempts,
+            error=job.error,
+            ocr_pages=job.ocr_pages,
+            ocr_seconds=job.ocr_seconds,
+            created_on=job.created_on,
+            started_on=job.started_on,
+            finished_on=job.finished_on,
+        )
 
 
 class FileUploadRequest(BaseModel):
@@ -15,6 +67,11 @@ class FileUploadRequest(BaseModel):
         None, desription="Filename to overwrite the current one"
     )
     force_ocr: bool = Field(False, description="redo all ocr")
+    ocr_profile: OcrProfile = Field(
+        OcrProfile.ARCHIVAL,
+        description="archival writes an optimized pdf with a text layer, "
+        "fast-text only extracts the text",
+    )
     skip_text: bool = Field(
         False, description="If set to False and OCR is detected donot overwrite it."
     )
@@ -23,3 +80,12 @@ class FileUploadRequest(BaseModel):
         title="file language",
         description="Set a language for this document. If None is given auto detect it",
     )
+
+
+class BulkUploadRequest(BaseModel):
+    force_ocr: bool = Field(False, description="redo all ocr")
+    ocr_profile: OcrProfile = Field(
+        OcrProfile.ARCHIVAL,
+        description="archival writes an optimized pdf with a text layer, "
+        "fast-text only extracts the text",
+    )
@@ -4,23 +4,39 @@ import time
 from pathlib import Path
 from typing import Self
 from uuid import UUID
-from fastapi import APIRouter, Depends, File as FastApiFile, UploadFile, BackgroundTasks
+from fastapi import (
+    APIRouter,
+    Depends,
+    File as FastApiFile,
+    UploadFile,
+    BackgroundTasks,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
 from api.db.models.files import FileText
 from api.modules.language.languages import Languages
 from api.routers.process_v2.models import (
+    BulkUploadFile,
+    BulkUploadRequest,
+    BulkUploadResponse,
     FileUploadRequest,
     FileUploadResponse,
+    JobResponse,
 )
 
-
 sys.path.append(".")
 from api.auth import validate_token
+from api.db.database import DB, get_db
+from api.db.models.content import ContentHash
+from api.db.models.jobs import JobKind, JobStatus, OcrJob
 from api.db.models.users import User
+from api.modules.file.bulk import discard, store_uploads
 from api.modules.file.file_processor import File, FileProcessor
 from api.modules.file.pdffile import PDFFile, FilesDB
 from api.exceptions.file import InvalidFileFormatException
+from api.exceptions.base import ServerHTTPException
 
 router = APIRouter(prefix="/v2/process", tags=["Process V2"])
 
@@ -30,20 +46,143 @@ async def upload_file(
     file_upload_request: FileUploadRequest = Depends(),
     file: File = Depends(File.get_file),
     user: User = Depends(validate_token),
+    db: DB = Depends(get_db),
 ) -> FileUploadResponse:
     if not file.is_pdf():
         raise InvalidFileFormatException(file, "musst be a pdf!")
 
     file.update_filename(file_upload_request.filename)
 
-    db_file = FilesDB.new(user, file.filename, file.id)
-
-    file_processor = FileProcessor(file)
-    file_processor.ocr()
-
-    db_file.file_text.update_file_text(file_processor.file_text)
-
-    return FileUploadResponse(id=file.id, path=file_processor.path)
+    # disk io, keep it off the event loop
+    file_processor = await run_in_threadpool(FileProcessor, file)
+
+    # identical bytes were processed before, reuse their ocr result
+    duplicate = await ContentHash.get(user, file_processor.sha256, db)
+    if duplicate is not None and not file_upload_request.force_ocr:
+        await run_in_threadpool(file_processor.link_from, duplicate.file_id)
+        await FilesDB.new(
+            user,
+            file.filename,
+            db,
+            file.id,
+            file_processor.sha256,
+            copy_text_from=duplicate.file_id,
+        )
+
+        return FileUploadResponse(
+            id=file.id,
+            path=file_processor.path,
+            status=JobStatus.DONE,
+            duplicate_of=duplicate.file_id,
+        )
+
+    # file, text row and job are committed together
+    db_file = await FilesDB.new(
+        user, file.filename, db, file.id, file_processor.sha256, commit=False
+    )
+    # the ocr itself is done by the worker pool, see api/worker.py
+    await OcrJob.enqueue(db_file.id, user, db, kind=JobKind.PREVIEW, commit=False)
+    job = await OcrJob.enqueue(
+        db_file.id,
+        user,
+        db,
+        file_upload_request.force_ocr,
+        file_upload_request.ocr_profile,
+    )
+
+    return FileUploadResponse(
+        id=file.id, path=file_processor.path, job_id=job.id, status=job.status
+    )
+
+
+@router.post(
+    "/bulk_upload",
+    response_model=BulkUploadResponse,
+    description="Upload many pdfs or zip archives of pdfs, each pdf gets an ocr job",
+)
+async def bulk_upload(
+    bulk_upload_request: BulkUploadRequest = Depends(),
+    files: list[UploadFile] = FastApiFile(...),
+    user: User = Depends(validate_token),
+    db: DB = Depends(get_db),
+) -> BulkUploadResponse:
+    # disk io, keep it off the event loop
+    stored, skipped = await run_in_threadpool(store_uploads, files)
+
+    try:
+        duplicates = {}
+        if not bulk_upload_request.force_ocr:
+            duplicates = await ContentHash.get_many(
+                user, [f.sha256 for f in stored], db
+            )
+        for file_processor in stored:
+            if file_processor.sha256 in duplicates:
+                await run_in_threadpool(
+                    file_processor.link_from, duplicates[file_processor.sha256]
+                )
+
+        # all files, text rows and jobs are committed together
+        await FilesDB.bulk_new(
+            user,
+            [
+                (f.id, f.file.filename, f.sha256, duplicates.get(f.sha256))
+                for f in stored
+            ],
+            db,
+            commit=False,
+        )
+        new = [f.id for f in stored if f.sha256 not in duplicates]
+        await OcrJob.enqueue_many(new, user, db, kind=JobKind.PREVIEW, commit=False)
+        job_ids = await OcrJob.enqueue_many(
+            new,
+            user,
+            db,
+            bulk_upload_request.force_ocr,
+            bulk_upload_request.ocr_profile,
+        )
+    except BaseException:
+        await run_in_threadpool(discard, stored)
+        raise
+
+    jobs = dict(zip(new, job_ids))
+    return BulkUploadResponse(
+        files=[
+            BulkUploadFile(
+                id=f.id,
+                filename=f.file.filename,
+                path=f.path,
+                job_id=jobs.get(f.id),
+                status=JobStatus.QUEUED if f.id in jobs else JobStatus.DONE,
+                duplicate_of=duplicates.get(f.sha256),
+            )
+            for f in stored
+        ],
+        skipped=skipped,
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: UUID, user: User = Depends(validate_token), db: DB = Depends(get_db)
+) -> JobResponse:
+    job = await OcrJob.get(job_id, user, db)
+    if job is None:
+        raise ServerHTTPException(status.HTTP_404_NOT_FOUND, "No job found with the id")
+
+    return JobResponse.from_job(job)
+
+
+@router.get("/status", response_model=JobResponse)
+async def get_file_status(
+    file_id: UUID, user: User = Depends(validate_token), db: DB = Depends(get_db)
+) -> JobResponse:
+    job = await OcrJob.get_latest_by_file_id(file_id, user, db)
+    if job is None:
+        raise ServerHTTPException(
+            status.HTTP_404_NOT_FOUND, "No job found for the file"
+        )
+
+    return JobResponse.from_job(job)
 
 
 # @router.post(
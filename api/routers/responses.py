@@ -0,0 +1,181 @@
+import os
+import re
+import stat
+
+import anyio
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+# a single range, "bytes=0-1023", "bytes=1024-" or the last bytes "bytes=-512"
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# headers a 304 repeats, see RFC 9110 15.4.5
+NOT_MODIFIED_HEADERS = {
+    "cache-control",
+    "content-location",
+    "date",
+    "etag",
+    "expires",
+    "last-modified",
+    "vary",
+}
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether the If-None-Match header lists etag, compared weakly
+    """
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in tags
+
+
+def parse_range(range: str, size: int) -> tuple[int, int] | None:
+    """
+    The first and last byte of a Range header for a file of size bytes.
+    None if the whole file should be sent, the header is invalid or lists
+    several ranges, which we do not support. Raises ValueError if the range
+    is not satisfiable.
+    """
+    match = RANGE_PATTERN.match(range.replace(" ", ""))
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # the last bytes of the file
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(range)
+        return max(size - length, 0), size - 1
+
+    first = int(first)
+    last = size - 1 if not last else min(int(last), size - 1)
+    if first >= size:
+        raise ValueError(range)
+    if last < first:
+        return None
+
+    return first, last
+
+
+class RangeFileResponse(FileResponse):
+    """
+    A FileResponse that answers conditional and range requests: 304 if the
+    If-None-Match header matches the etag, 206 with a single range of the file
+    and 416 if that range lies outside of it.
+    The file is sent without copying it into the process if the server
+    supports the zerocopy or pathsend extensions.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.stat_result is None:
+            try:
+                self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            if not stat.S_ISREG(self.stat_result.st_mode):
+                raise RuntimeError(f"File at path {self.path} is not a file.")
+            self.set_stat_headers(self.stat_result)
+
+        request_headers = Headers(scope=scope)
+        etag = self.headers["etag"]
+        self.headers["accept-ranges"] = "bytes"
+
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            headers = [
+                (key, value)
+                for key, value in self.raw_headers
+                if key.decode("latin-1") in NOT_MODIFIED_HEADERS
+            ]
+            await send(
+                {"type": "http.response.start", "status": 304, "headers": headers}
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        size = self.stat_result.st_size
+        first, last = 0, size - 1
+        range = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        # a changed file is sent as a whole, see If-Range
+        if range is not None and (if_range is None or if_range == etag):
+            try:
+                requested = parse_range(range, size)
+            except ValueError:
+                self.status_code = 416
+                self.headers["content-range"] = f"bytes */{size}"
+                self.headers["content-length"] = "0"
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": self.status_code,
+                        "headers": self.raw_headers,
+                    }
+                )
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            if requested is not None:
+                first, last = requested
+                self.status_code = 206
+                self.headers["content-range"] = f"bytes {first}-{last}/{size}"
+                self.headers["content-length"] = str(last - first + 1)
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        await self.send_body(scope, send, first, last - first + 1)
+
+        if self.background is not None:
+            await self.background()
+
+    async def send_body(self, scope: Scope, send: Send, offset: int, count: int):
+        extensions = scope.get("extensions") or {}
+        if scope["method"].upper() == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b""})
+        elif "http.response.zerocopy" in extensions:
+            with open(self.path, "rb") as file:
+                await send(
+                    {
+                        "type": "http.response.zerocopy",
+                        "file": file.fileno(),
+                        "offset": offset,
+                        "count": count,
+                    }
+                )
+        elif (
+            "http.response.pathsend" in extensions and count == self.stat_result.st_size
+        ):
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(offset)
+                while count > 0:
+                    chunk = await file.read(min(self.chunk_size, count))
+                    if not chunk:
+                        # truncated in the meantime, the client sees a short body
+                        break
+                    count -= len(chunk)
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk,
+                            "more_body": count > 0,
+                        }
+                    )
+                if count > 0:
+                    await send({"type": "http.response.body", "body": b""})
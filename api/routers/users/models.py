@@ -18,7 +18,6 @@ class UserResponse(BaseModel):
 
     @staticmethod
     def set_by_user(user: User, message: str = None) -> Self:
-        user = User.get_user_by_id(user.id)
         return UserResponse(
             message = message,
             user = UserResponseElement(
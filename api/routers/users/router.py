@@ -3,6 +3,7 @@ sys.path.append(".")
 
 from fastapi import APIRouter, Form, Depends
 
+from api.db.database import DB, get_db
 from api.db.models.users import User
 from api import validate_token
 from api.routers.users.models import UserResponse, UserRequest, Username, UserPassword
@@ -13,9 +14,10 @@ router = APIRouter(prefix="/user", tags=["user"])
 @router.post("/create", response_model=UserResponse)
 async def create_user(
     name: Username = Depends(Username),
-    password: UserPassword = Depends(UserPassword)
+    password: UserPassword = Depends(UserPassword),
+    db: DB = Depends(get_db)
 ):
-    user: User = User.get_user_by_id(User.new(name.name, password.password))
+    user: User = await User.get_user_by_id(await User.new(name.name, password.password, db), db)
     return UserResponse.set_by_user(user)
 
 
@@ -26,20 +28,22 @@ async def get_user_data(user: User = Depends(validate_token)):
 @router.put("/update_username", response_model=UserResponse)
 async def update_username(
     name: Username = Depends(Username), 
-    user: User = Depends(validate_token)
+    user: User = Depends(validate_token),
+    db: DB = Depends(get_db)
 ):
-    User.update_username_by_id(user.id, name.name)
+    user = await User.update_username_by_id(user.id, name.name, db)
     return UserResponse.set_by_user(user, 'Updated username')
 
 @router.put("/update_password", response_model=UserResponse)
 async def update_password(
     password: UserPassword = Depends(UserPassword), 
-    user: User = Depends(validate_token)
+    user: User = Depends(validate_token),
+    db: DB = Depends(get_db)
 ):
-    User.update_password_by_id(user.id, password.password)
+    user = await User.update_password_by_id(user.id, password.password, db)
     return UserResponse.set_by_user(user, 'Updated password')
 
 @router.delete("/delete", response_model=UserResponse)
-async def delete_user(user: User = Depends(validate_token)):
-    User.delete_by_id(user.id)
+async def delete_user(user: User = Depends(validate_token), db: DB = Depends(get_db)):
+    user = await User.delete_by_id(user.id, db)
     return UserResponse.set_by_user(user)
@@ -0,0 +1,9 @@
+import sys
+
+sys.path.append(".")
+
+from api.modules.jobs.worker import run_pool
+
+
+if __name__ == "__main__":
+    run_pool()
@@ -1,5 +1,8 @@
 #!/bin/bash
 
+# ocr worker pool, processes the jobs queued by the upload endpoints
+python -m api.worker &
+
 gunicorn -k uvicorn.workers.UvicornWorker -b 0.0.0.0:8080 \
     -w 4 \
     --threads 4 \
@@ -0,0 +1,63 @@
+"""
+Compares two reports of run.py, e.g. of the main branch and of a change.
+Exits with 1 when a stage got slower than the threshold.
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+sys.path.append(".")
+
+
+def compare(base: dict, head: dict, threshold: float) -> tuple[list[str], bool]:
+    """
+    Lines of the comparison and whether any stage regressed. Stages are
+    compared by their median, slower by more than threshold, e.g. 0.1 for 10%,
+    is a regression.
+    """
+    lines = []
+    if base["corpus"] != head["corpus"]:
+        lines.append("warning: the reports were made with different corpora")
+    if base["machine"] != head["machine"]:
+        lines.append("warning: the reports were made on different machines")
+
+    regressed = False
+    for name, stage in head["stages"].items():
+        before = base["stages"].get(name)
+        if before is None or "skipped" in before or "skipped" in stage:
+            lines.append(f"{name:24} not compared")
+            continue
+
+        change = stage["median_seconds"] / before["median_seconds"] - 1
+        rss = stage["peak_rss_mb"] - before["peak_rss_mb"]
+        mark = ""
+        if change > threshold:
+            mark = "  slower"
+            regressed = True
+        elif change < -threshold:
+            mark = "  faster"
+        lines.append(
+            f"{name:24} {before['median_seconds']:9.3f}s -> "
+            f"{stage['median_seconds']:9.3f}s {change:+8.1%} "
+            f"{rss:+8.1f} MB rss{mark}"
+        )
+
+    return lines, regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("base", type=Path)
+    parser.add_argument("head", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    base = json.loads(args.base.read_text())
+    head = json.loads(args.head.read_text())
+    print(f"{base['commit']} -> {head['commit']}")
+
+    lines, regressed = compare(base, head, args.threshold)
+    print("\n".join(lines))
+    sys.exit(1 if regressed else 0)
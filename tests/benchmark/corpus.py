@@ -0,0 +1,155 @@
+import re
+import sys
+import random
+from enum import StrEnum
+from pathlib import Path
+from dataclasses import dataclass
+
+import fitz
+
+sys.path.append(".")
+
+PROFILES = Path("api/modules/language/profiles")
+
+# A4 in points, with the margins of a letter
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 56
+FONT_SIZE = 11
+
+
+class Kind(StrEnum):
+    # text layer only, as written by an office suite
+    BORN_DIGITAL = "born-digital"
+    # one image per page, no text layer
+    SCANNED = "scanned"
+    # every third page scanned, e.g. a letter with signed attachments
+    MIXED = "mixed"
+
+
+@dataclass
+class Document:
+    path: Path
+    kind: Kind
+    language: str
+    page_count: int
+
+    @property
+    def size(self) -> int:
+        return self.path.stat().st_size
+
+    @property
+    def scanned_pages(self) -> list[int]:
+        if self.kind == Kind.SCANNED:
+            return list(range(self.page_count))
+        if self.kind == Kind.MIXED:
+            return list(range(2, self.page_count, 3))
+        return []
+
+
+def sentences(language: str) -> list[str]:
+    """
+    Sentences of the language detection profile, real text of the language
+    """
+    text = Path(PROFILES, f"{language}.txt").read_text()
+    return [s for s in re.split(r"(?<=[.!?])\s+", text) if len(s) > 20]
+
+
+def page_text(rng: random.Random, pool: list[str], chars: int = 2400) -> str:
+    """
+    Random sentences, about a page full of them
+    """
+    text = []
+    length = 0
+    while length < chars:
+        sentence = rng.choice(pool)
+        text.append(sentence)
+        length += len(sentence) + 1
+
+    return " ".join(text)
+
+
+def _write_text(page: fitz.Page, text: str) -> None:
+    page.insert_textbox(
+        fitz.Rect(MARGIN, MARGIN, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - MARGIN),
+        text,
+        fontsize=FONT_SIZE,
+        fontname="helv",
+    )
+
+
+def _scan(text: str, dpi: int, rng: random.Random) -> fitz.Pixmap:
+    """
+    The page rendered to a gray image, slightly rotated like a page fed
+    through a scanner
+    """
+    with fitz.open() as document:
+        page = document.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        _write_text(page, text)
+        matrix = fitz.Matrix(dpi / 72, dpi / 72).prerotate(rng.uniform(-0.8, 0.8))
+        return page.get_pixmap(matrix=matrix, colorspace=fitz.csGRAY)
+
+
+def write_document(
+    path: Path,
+    kind: Kind,
+    page_count: int,
+    language: str,
+    seed: str,
+    dpi: int = 150,
+) -> Document:
+    rng = random.Random(seed)
+    pool = sentences(language)
+    document = Document(path, kind, language, page_count)
+    scanned = set(document.scanned_pages)
+
+    with fitz.open() as pdf:
+        for page_no in range(page_count):
+            page = pdf.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            text = page_text(rng, pool)
+            if page_no in scanned:
+                page.insert_image(page.rect, pixmap=_scan(text, dpi, rng))
+            else:
+                _write_text(page, text)
+        # no random /ID or dates, the same seed gives the same bytes
+        pdf.set_metadata({})
+        pdf.save(path, garbage=3, deflate=True, no_new_id=True)
+
+    return document
+
+
+def build_corpus(
+    folder: Path,
+    kinds: list[Kind],
+    page_counts: list[int],
+    documents: int,
+    languages: list[str],
+    seed: int = 0,
+    dpi: int = 150,
+) -> list[Document]:
+    """
+    documents pdfs of every kind and page count. Existing files are kept, so a
+    corpus is generated once and reused by all runs with the same settings.
+    """
+    folder = Path(folder, f"seed-{seed}-dpi-{dpi}")
+    folder.mkdir(parents=True, exist_ok=True)
+
+    corpus = []
+    for kind in kinds:
+        for page_count in page_counts:
+            for i in range(documents):
+                language = languages[i % len(languages)]
+                path = Path(folder, f"{kind}-{page_count}-{i}-{language}.pdf")
+                document = Document(path, kind, language, page_count)
+                if not path.exists():
+                    document = write_document(
+                        path,
+                        kind,
+                        page_count,
+                        language,
+                        # str seeds are hashed the same in every process
+                        seed=f"{seed}-{kind}-{page_count}-{i}",
+                        dpi=dpi,
+                    )
+                corpus.append(document)
+
+    return corpus
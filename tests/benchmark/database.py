@@ -0,0 +1,55 @@
+import sys
+from typing import Iterator
+from contextlib import contextmanager
+
+import psycopg2
+from sqlalchemy.engine import make_url
+
+sys.path.append(".")
+
+
+def _execute(server_uri: str, statement: str) -> None:
+    # CREATE and DROP DATABASE can not run inside a transaction
+    connection = psycopg2.connect(
+        make_url(server_uri)
+        .set(drivername="postgresql", database="postgres")
+        .render_as_string(hide_password=False)
+    )
+    try:
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(statement)
+    finally:
+        connection.close()
+
+
+def database_uri(server_uri: str, name: str) -> str:
+    return make_url(server_uri).set(database=name).render_as_string(hide_password=False)
+
+
+@contextmanager
+def bench_database(server_uri: str, name: str, keep: bool = False) -> Iterator[str]:
+    """
+    A new database on the postgres server of server_uri, dropped afterwards
+    unless keep. The schema is created by migrate_database, which needs the
+    database as DATABASE_URI of api/config.py.
+    """
+    _execute(server_uri, f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+    _execute(server_uri, f'CREATE DATABASE "{name}"')
+    try:
+        yield database_uri(server_uri, name)
+    finally:
+        if not keep:
+            _execute(server_uri, f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+
+
+def migrate_database() -> None:
+    """
+    alembic upgrade head, alembic/env.py takes the url from api/config.py
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", "alembic")
+    command.upgrade(config, "head")
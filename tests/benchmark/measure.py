@@ -0,0 +1,119 @@
+import gc
+import os
+import time
+import resource
+import statistics
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+MB = 1024 * 1024
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def current_rss() -> int:
+    """
+    Resident memory of this process in bytes, the peak so far where /proc is
+    not available
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        # kilobytes on linux, bytes on macos
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler(threading.Thread):
+    """
+    Samples the resident memory while a stage runs, ru_maxrss only knows the
+    peak of the whole process
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self) -> int:
+        self._done.set()
+        self.join()
+        self.peak = max(self.peak, current_rss())
+        return self.peak
+
+
+@dataclass
+class Stage:
+    name: str
+    # documents, or queries for the search
+    items: int = 0
+    pages: int = 0
+    bytes: int = 0
+    seconds: list[float] = field(default_factory=list)
+    peak_rss: int = 0
+    skipped: str | None = None
+
+    def to_dict(self) -> dict:
+        if self.skipped is not None:
+            return {"skipped": self.skipped}
+
+        median = statistics.median(self.seconds)
+        return {
+            "items": self.items,
+            "pages": self.pages,
+            "mb": round(self.bytes / MB, 3),
+            "runs": [round(seconds, 6) for seconds in self.seconds],
+            "median_seconds": round(median, 6),
+            "min_seconds": round(min(self.seconds), 6),
+            "items_per_second": _rate(self.items, median),
+            "pages_per_second": _rate(self.pages, median),
+            "mb_per_second": _rate(self.bytes / MB, median),
+            "peak_rss_mb": round(self.peak_rss / MB, 1),
+        }
+
+
+def _rate(amount: float, seconds: float) -> float | None:
+    if not amount or not seconds:
+        return None
+    return round(amount / seconds, 3)
+
+
+class Recorder:
+    """
+    Timings of the stages of all repeats, in the order they first ran
+    """
+
+    def __init__(self) -> None:
+        self.stages: dict[str, Stage] = {}
+
+    @contextmanager
+    def stage(
+        self, name: str, items: int, pages: int = 0, size: int = 0
+    ) -> Iterator[None]:
+        # garbage of the stage before is not collected on this stage's clock
+        gc.collect()
+        sampler = RssSampler()
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = sampler.stop()
+
+        stage = self.stages.setdefault(name, Stage(name))
+        stage.items, stage.pages, stage.bytes = items, pages, size
+        stage.seconds.append(seconds)
+        stage.peak_rss = max(stage.peak_rss, peak)
+
+    def skip(self, name: str, reason: str) -> None:
+        self.stages[name] = Stage(name, skipped=reason)
+
+    def to_dict(self) -> dict:
+        return {name: stage.to_dict() for name, stage in self.stages.items()}
@@ -0,0 +1,185 @@
+"""
+Benchmark of the ingestion and search hot paths on a synthetic corpus, see
+the README. The report is written as json and compared with compare.py.
+"""
+
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+import platform
+import resource
+import datetime
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.append(".")
+
+from tests.benchmark.corpus import Kind, build_corpus
+from tests.benchmark.database import bench_database, migrate_database
+from tests.benchmark.measure import MB, Recorder
+
+DEFAULT_WORKDIR = Path(tempfile.gettempdir(), "edms-bench")
+
+
+def git_commit() -> str | None:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def configure(args: argparse.Namespace, database_uri: str) -> None:
+    """
+    api/config.py reads the environment on import, so the api is only
+    imported after this
+    """
+    os.environ["DATABASE_URI"] = database_uri
+    os.environ.pop("ASYNC_DATABASE_URI", None)
+    os.environ["BASE_FILE_DIR"] = str(Path(args.workdir, "files"))
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["STORAGE_LEGACY_FALLBACK"] = "false"
+    # every run ocrs the pages again
+    os.environ["OCR_PAGE_CACHE_SIZE_MB"] = "0"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+
+
+async def run_database(stages, processors, recorder: Recorder, terms: list[str]):
+    from api.db.database import engine
+
+    try:
+        await stages.bench_database(processors, recorder, terms)
+    finally:
+        await engine.dispose()
+
+
+def run(args: argparse.Namespace) -> dict:
+    corpus = build_corpus(
+        Path(args.workdir, "corpus"),
+        args.kinds,
+        args.pages,
+        args.docs,
+        args.languages,
+        seed=args.seed,
+        dpi=args.dpi,
+    )
+
+    with bench_database(args.server_uri, args.database, args.keep_db) as uri:
+        configure(args, uri)
+        migrate_database()
+
+        from api.modules.ocr.ocr import OcrProfile
+        from tests.benchmark import stages
+
+        profile = None if args.no_ocr else OcrProfile(args.ocr_profile)
+        recorder = Recorder()
+        for _ in range(args.repeat):
+            processors = stages.bench_files(corpus, recorder, profile)
+            terms = stages.search_terms(
+                processors, args.queries, random.Random(args.seed)
+            )
+            try:
+                asyncio.run(run_database(stages, processors, recorder, terms))
+            finally:
+                stages.cleanup(processors)
+
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    return {
+        "commit": git_commit(),
+        "created_on": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "corpus": {
+            "kinds": [str(kind) for kind in args.kinds],
+            "pages": args.pages,
+            "docs": args.docs,
+            "languages": args.languages,
+            "seed": args.seed,
+            "dpi": args.dpi,
+            "files": len(corpus),
+            "total_pages": sum(document.page_count for document in corpus),
+            "total_mb": round(sum(document.size for document in corpus) / MB, 3),
+        },
+        "repeat": args.repeat,
+        "queries": args.queries,
+        # ocr and large extractions run in process pools, only the biggest
+        # child is known
+        "children_peak_rss_mb": round(children / MB, 1),
+        "stages": recorder.to_dict(),
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"commit {report['commit']}, {report['corpus']['files']} files")
+    for name, stage in report["stages"].items():
+        if "skipped" in stage:
+            print(f"{name:24} skipped: {stage['skipped']}")
+            continue
+        rate = stage["items_per_second"] or 0
+        pages = stage["pages_per_second"] or 0
+        print(
+            f"{name:24} {stage['median_seconds']:9.3f}s {rate:10.1f} items/s"
+            f" {pages:10.1f} pages/s {stage['peak_rss_mb']:8.1f} MB rss"
+        )
+
+
+def comma_list(convert):
+    return lambda value: [convert(part) for part in value.split(",") if part]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--kinds",
+        type=comma_list(Kind),
+        default=list(Kind),
+        help="comma separated, born-digital,scanned,mixed",
+    )
+    parser.add_argument("--pages", type=comma_list(int), default=[1, 8, 64])
+    parser.add_argument("--docs", type=int, default=4, help="per kind and page count")
+    parser.add_argument("--languages", type=comma_list(str), default=["en", "de"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dpi", type=int, default=150, help="of the scanned pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--no-ocr", action="store_true")
+    parser.add_argument("--ocr-profile", default="archival")
+    parser.add_argument(
+        "--server-uri",
+        default=os.environ.get("DATABASE_URI"),
+        help="postgres server the benchmark database is created on",
+    )
+    parser.add_argument("--database", default="edms_bench")
+    parser.add_argument("--keep-db", action="store_true")
+    parser.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR)
+    parser.add_argument("--output", type=Path, default=Path("bench_output.json"))
+    args = parser.parse_args()
+
+    if args.server_uri is None:
+        # the same .env as the api
+        from dotenv import find_dotenv, load_dotenv
+
+        load_dotenv(find_dotenv())
+        args.server_uri = os.environ.get("DATABASE_URI")
+    if args.server_uri is None:
+        parser.error("--server-uri or DATABASE_URI is required")
+
+    report = run(args)
+    args.output.write_text(json.dumps(report, indent=2))
+    print_report(report)
+    print(f"written to {args.output}")
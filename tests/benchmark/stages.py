@@ -0,0 +1,156 @@
+import re
+import sys
+import uuid
+import random
+import shutil
+
+from fastapi import UploadFile
+from sqlalchemy import text as sql
+
+sys.path.append(".")
+
+from api.db.database import Base, SessionLocal
+from api.db.models.files import Files, FileText
+from api.db.models.users import User
+from api.modules.file.file_processor import File, FileProcessor
+from api.modules.language.detect_language import detect_language
+from api.modules.ocr.extract import forget
+from api.modules.ocr.ocr import OcrProfile, extract_text_from_pdf
+from api.modules.storage.storage import storage
+from tests.benchmark.corpus import Document
+from tests.benchmark.measure import Recorder
+
+SEARCH_LIMIT = 20
+
+
+def ocr_missing() -> str | None:
+    """
+    Why the ocr stage can not run here, None when it can
+    """
+    for program in ["tesseract", "gs"]:
+        if shutil.which(program) is None:
+            return f"{program} is not installed"
+    return None
+
+
+def bench_files(
+    corpus: list[Document], recorder: Recorder, ocr_profile: OcrProfile | None
+) -> list[FileProcessor]:
+    """
+    The upload path of the api: store, extract, classify, ocr and detect
+    the language of every document
+    """
+    pages = sum(document.page_count for document in corpus)
+    size = sum(document.size for document in corpus)
+
+    with recorder.stage("store", len(corpus), pages, size):
+        processors = []
+        for document in corpus:
+            with open(document.path, "rb") as fh:
+                upload = UploadFile(fh, filename=document.path.name)
+                processors.append(FileProcessor(File(upload)))
+
+    with recorder.stage("extract_text_from_pdf", len(corpus), pages, size):
+        for processor in processors:
+            # the text is cached by path, every run extracts it again
+            forget(processor.path)
+            extract_text_from_pdf(processor.path)
+
+    with recorder.stage("classify", len(corpus), pages, size):
+        needing_ocr = [
+            (processor, processor.pages_needing_ocr()) for processor in processors
+        ]
+        needing_ocr = [(processor, p) for processor, p in needing_ocr if p]
+
+    missing = ocr_missing()
+    if ocr_profile is None:
+        recorder.skip("ocr", "disabled")
+    elif missing is not None:
+        recorder.skip("ocr", missing)
+    elif not needing_ocr:
+        recorder.skip("ocr", "no scanned pages")
+    else:
+        ocr_pages = sum(len(p) for _, p in needing_ocr)
+        ocr_size = sum(processor.path.stat().st_size for processor, _ in needing_ocr)
+        with recorder.stage("ocr", len(needing_ocr), ocr_pages, ocr_size):
+            for processor, _ in needing_ocr:
+                processor.ocr(profile=ocr_profile)
+
+    with recorder.stage("detect_language", len(corpus), pages):
+        for processor in processors:
+            detect_language(processor.file_text)
+
+    return processors
+
+
+def search_terms(
+    processors: list[FileProcessor], count: int, rng: random.Random
+) -> list[str]:
+    """
+    Words and two word phrases of the documents, the ranking has to look at
+    many hits for the frequent ones
+    """
+    words = sorted(
+        {
+            word.lower()
+            for processor in processors
+            for page in processor.file_text
+            for word in re.findall(r"\w{5,}", page)
+        }
+    )
+    if not words:
+        return []
+
+    terms = []
+    for i in range(count):
+        if i % 3 == 2:
+            terms.append(f'"{rng.choice(words)} {rng.choice(words)}"')
+        else:
+            terms.append(rng.choice(words))
+    return terms
+
+
+async def bench_database(
+    processors: list[FileProcessor], recorder: Recorder, terms: list[str]
+) -> None:
+    """
+    Writes the texts like the ocr worker and searches them, in an empty
+    database on every run
+    """
+    pages = sum(len(processor.file_text) for processor in processors)
+
+    async with SessionLocal() as db:
+        user = User(
+            id=uuid.uuid4(), username=f"bench-{uuid.uuid4()}", password_hash="-"
+        )
+        db.add(user)
+        await db.commit()
+
+        with recorder.stage("insert", len(processors), pages):
+            await Files.bulk_new(
+                user,
+                [
+                    (processor.id, processor.file.filename, processor.sha256, None)
+                    for processor in processors
+                ],
+                db,
+            )
+
+        with recorder.stage("update_file_text", len(processors), pages):
+            for processor in processors:
+                file_text = await FileText.get_by_file_id(processor.id, user, db)
+                await file_text.update_file_text(processor.file_text, db)
+
+        with recorder.stage("find_by_text", len(terms)):
+            for term in terms:
+                await Files.find_by_text(user, term, db, limit=SEARCH_LIMIT)
+
+        tables = ", ".join(f'"{table.name}"' for table in Base.metadata.sorted_tables)
+        await db.execute(sql(f"TRUNCATE {tables} CASCADE"))
+        await db.commit()
+
+
+def cleanup(processors: list[FileProcessor]) -> None:
+    for processor in processors:
+        forget(processor.path)
+        storage.delete(processor.id)
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(".")
+
+from api.modules.storage import storage as configured
+from api.modules.storage.local import LocalStorage
+
+
+@pytest.fixture
+def storage(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> LocalStorage:
+    """
+    A LocalStorage in tmp_path instead of the configured storage, in every
+    module that imported it
+    """
+    original, storage = configured.storage, LocalStorage(tmp_path)
+    for name, module in list(sys.modules.items()):
+        if name.startswith("api.") and getattr(module, "storage", None) is original:
+            monkeypatch.setattr(module, "storage", storage)
+
+    return storage
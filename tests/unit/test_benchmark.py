@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+sys.path.append(".")
+
+from api.modules.ocr.classify import pages_needing_ocr
+from api.modules.ocr.extract import extract
+from tests.benchmark.compare import compare
+from tests.benchmark.corpus import Kind, build_corpus
+from tests.benchmark.measure import Recorder
+
+
+def test_corpus(tmp_path: Path):
+    corpus = build_corpus(tmp_path / "a", list(Kind), [4], 1, ["de"], dpi=50)
+    again = build_corpus(tmp_path / "b", list(Kind), [4], 1, ["de"], dpi=50)
+
+    assert [document.kind for document in corpus] == list(Kind)
+    for document, same in zip(corpus, again):
+        assert document.path.read_bytes() == same.path.read_bytes()
+
+        pages = extract(document.path, use_cache=False).pages
+        assert len(pages) == 4
+        assert pages_needing_ocr(document.path, pages) == document.scanned_pages
+
+    assert corpus[1].scanned_pages == [0, 1, 2, 3]
+    assert corpus[2].scanned_pages == [2]
+
+
+def report(seconds: float) -> dict:
+    recorder = Recorder()
+    with recorder.stage("extract", items=2, pages=10):
+        pass
+    recorder.stages["extract"].seconds = [seconds]
+    recorder.skip("ocr", "tesseract is not installed")
+
+    return {"corpus": {}, "machine": {}, "stages": recorder.to_dict()}
+
+
+def test_compare():
+    stage = report(2.0)["stages"]["extract"]
+    assert stage["items_per_second"] == 1.0
+    assert stage["pages_per_second"] == 5.0
+    assert stage["mb_per_second"] is None
+
+    lines, regressed = compare(report(2.0), report(2.1), threshold=0.1)
+    assert not regressed
+    assert lines[1] == f"{'ocr':24} not compared"
+
+    lines, regressed = compare(report(2.0), report(3.0), threshold=0.1)
+    assert regressed
+    assert lines[0].endswith("slower")
@@ -0,0 +1,81 @@
+import io
+import sys
+import zipfile
+
+import pytest
+from fastapi import UploadFile
+
+sys.path.append(".")
+
+from api.exceptions.file import (
+    FileTooLargeException,
+    InvalidArchiveException,
+    TooManyFilesException,
+    UploadTooLargeException,
+)
+from api.modules.file import bulk
+from api.modules.storage.local import LocalStorage
+
+
+def uploads() -> list[UploadFile]:
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("scans/b.pdf", b"%PDF-b")
+        zf.writestr("scans/", b"")
+        zf.writestr("notes.txt", b"notes")
+        zf.writestr("__MACOSX/scans/._b.pdf", b"fork")
+    archive.seek(0)
+
+    return [
+        UploadFile(io.BytesIO(b"%PDF-a"), filename="a.pdf"),
+        UploadFile(archive, filename="scans.zip"),
+        UploadFile(io.BytesIO(b"doc"), filename="c.doc"),
+    ]
+
+
+def test_store_uploads(storage: LocalStorage):
+    stored, skipped = bulk.store_uploads(uploads())
+
+    assert [f.file.filename for f in stored] == ["a.pdf", "b.pdf"]
+    assert [f.path.read_bytes() for f in stored] == [b"%PDF-a", b"%PDF-b"]
+    assert stored[0].sha256 != stored[1].sha256
+    assert skipped == ["scans.zip/notes.txt", "c.doc"]
+
+
+def test_store_uploads_discards_on_error(storage: LocalStorage):
+    with pytest.raises(TooManyFilesException):
+        bulk.store_uploads(uploads(), max_files=1)
+    assert list(storage.ids()) == []
+
+    broken = UploadFile(io.BytesIO(b"PK no zip"), filename="broken.zip")
+    with pytest.raises(InvalidArchiveException):
+        bulk.store_uploads(uploads() + [broken])
+    assert list(storage.ids()) == []
+
+
+def test_store_uploads_size_limits(storage: LocalStorage):
+    # the header claims a small file, the limit is enforced while unpacking
+    with pytest.raises(UploadTooLargeException):
+        bulk.store_uploads(uploads(), max_size=8)
+    assert list(storage.ids()) == []
+
+    with pytest.raises(FileTooLargeException):
+        bulk.store_uploads(uploads(), max_file_size=4)
+    assert list(storage.ids()) == []
+
+    bomb = io.BytesIO()
+    with zipfile.ZipFile(bomb, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("bomb.pdf", bytes(1024 * 1024))
+    bomb.seek(0)
+    with pytest.raises(UploadTooLargeException):
+        bulk.store_uploads([UploadFile(bomb, filename="bomb.zip")], max_size=64 * 1024)
+
+    stored, _ = bulk.store_uploads(uploads(), max_size=12, max_file_size=6)
+    assert len(stored) == 2
+
+    # like MAX_UPLOAD_SIZE_MB, 0 disables the limit
+    bomb.seek(0)
+    stored, _ = bulk.store_uploads(
+        [UploadFile(bomb, filename="bomb.zip")], max_size=None, max_file_size=None
+    )
+    assert len(stored) == 1
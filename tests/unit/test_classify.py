@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+import fitz
+
+sys.path.append(".")
+
+from api.modules.ocr.classify import classify_pages, page_selection, pages_needing_ocr
+
+TEXT = "This page was typed and saved as a pdf, it has a proper text layer."
+
+
+def scan(page: fitz.Page) -> None:
+    # a grey image over the whole page, like a scanner would produce
+    pixmap = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 200, 280), False)
+    pixmap.set_rect(pixmap.irect, (200,))
+    page.insert_image(page.rect, pixmap=pixmap)
+
+
+def write_mixed_pdf(path: Path) -> Path:
+    with fitz.open() as document:
+        document.new_page().insert_text((72, 72), TEXT)
+        scan(document.new_page())
+        # scanned, with a short stamp on top
+        page = document.new_page()
+        scan(page)
+        page.insert_text((72, 72), "Copy")
+        # empty
+        document.new_page()
+        document.save(path)
+
+    return path
+
+
+def test_classify_pages(tmp_path: Path):
+    classes = classify_pages(write_mixed_pdf(tmp_path / "mixed.pdf"))
+
+    assert [page.needs_ocr for page in classes] == [False, True, True, False]
+    assert classes[0].chars == len(TEXT.replace(" ", ""))
+    assert classes[0].has_fonts and classes[0].image_coverage == 0
+    assert classes[1].image_coverage > 0.9 and classes[1].chars == 0
+
+
+def test_pages_needing_ocr_uses_text(tmp_path: Path):
+    path = write_mixed_pdf(tmp_path / "mixed.pdf")
+
+    # the second page already has an ocr text layer
+    text = [TEXT, TEXT, "", ""]
+    assert pages_needing_ocr(path, text) == [2]
+
+
+def test_page_selection():
+    assert page_selection([0]) == "1"
+    assert page_selection([4, 0, 1, 2, 7, 8]) == "1-3,5,8-9"
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+import fitz
+import pikepdf
+import pytest
+
+sys.path.append(".")
+
+from api.modules.file import compress
+from api.modules.file.compress import compress_pdf
+
+
+def write_pdf(path: Path, pages: int) -> Path:
+    with fitz.open() as document:
+        for i in range(pages):
+            page = document.new_page(width=595, height=842)
+            page.insert_text((72, 72), f"page {i}", fontsize=40)
+        # landscape
+        document[-1].set_rotation(90)
+        document.save(path)
+
+    return path
+
+
+def check_compressed(path: Path, pages: int) -> None:
+    with pikepdf.open(path) as pdf:
+        assert pdf.check() == []
+
+    with fitz.open(path) as document:
+        assert len(document) == pages
+        assert document[0].rect == fitz.Rect(0, 0, 595, 842)
+        assert document[-1].rect == fitz.Rect(0, 0, 842, 595)
+        for page in document:
+            # rasterized, no text layer left
+            assert page.get_text() == ""
+            assert len(page.get_images()) == 1
+
+
+def test_compress_pdf(tmp_path: Path):
+    source = write_pdf(tmp_path / "in.pdf", 3)
+
+    compress_pdf(source, tmp_path / "out.pdf", dpi=50, max_workers=1)
+
+    check_compressed(tmp_path / "out.pdf", 3)
+
+
+def test_compress_pdf_parallel(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(compress, "COMPRESS_PARALLEL_MIN_PAGES", 2)
+    source = write_pdf(tmp_path / "in.pdf", 7)
+
+    compress_pdf(source, tmp_path / "out.pdf", dpi=50, max_workers=2)
+
+    check_compressed(tmp_path / "out.pdf", 7)
@@ -0,0 +1,27 @@
+import sys
+import uuid
+import datetime
+
+import pytest
+
+sys.path.append(".")
+
+from api.exceptions.db import InvalidCursorException
+from api.routers.process.helper import decode_cursor, encode_cursor
+
+
+def test_cursor_roundtrip():
+    created_on = datetime.datetime(2024, 5, 17, 12, 30, 1, 123456)
+    id = uuid.uuid4()
+
+    assert decode_cursor(encode_cursor(created_on, id)) == (created_on, id)
+
+
+def test_no_cursor():
+    assert decode_cursor(None) is None
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "bm90IGEgY3Vyc29y"])
+def test_invalid_cursor(cursor: str):
+    with pytest.raises(InvalidCursorException):
+        decode_cursor(cursor)
@@ -0,0 +1,85 @@
+import io
+import sys
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.append(".")
+
+from api.auth import validate_token
+from api.config import PREVIEW_FORMAT, PREVIEW_SIZES
+from api.db.database import get_db
+from api.db.models.users import User
+from api.modules.file.preview import PreviewFormat, preview_key
+from api.modules.storage.base import OCR, ORIGINAL
+from api.modules.storage.local import LocalStorage
+from api.routers.process import router as process_router
+from api.routers.process.router import FilesDB, FileText
+
+
+def client(files: dict, texts: set, monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    async def get_without_text(user, id, db):
+        return files.get(id)
+
+    async def has_text(id, user, db):
+        return id in texts
+
+    monkeypatch.setattr(FilesDB, "get_without_text", get_without_text)
+    monkeypatch.setattr(FileText, "has_text", has_text)
+
+    app = FastAPI()
+    app.include_router(process_router.router)
+    app.dependency_overrides[validate_token] = lambda: User(id=uuid.uuid4())
+    app.dependency_overrides[get_db] = lambda: None
+
+    return TestClient(app)
+
+
+def test_download_born_digital(storage: LocalStorage, monkeypatch: pytest.MonkeyPatch):
+    born_digital, queued, scanned = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    for id in [born_digital, queued, scanned]:
+        storage.put(id, ORIGINAL, io.BytesIO(b"%PDF original"))
+    storage.put(scanned, OCR, io.BytesIO(b"%PDF ocred"))
+
+    files = {
+        id: FilesDB(id=id, filename="a.pdf", sha256="ab" * 32)
+        for id in [born_digital, queued, scanned]
+    }
+    test_client = client(files, {born_digital, scanned}, monkeypatch)
+
+    def download(id: uuid.UUID, **params):
+        return test_client.get("/files/download", params={"id": str(id), **params})
+
+    # processed without an ocr pdf of its own, the original is its ocr version
+    response = download(born_digital)
+    assert response.status_code == 200
+    assert response.content == b"%PDF original"
+
+    assert download(scanned).content == b"%PDF ocred"
+    assert download(scanned, version="original").content == b"%PDF original"
+    assert download(queued).status_code == 404
+    assert download(uuid.uuid4()).status_code == 404
+
+
+def test_preview_not_modified(storage: LocalStorage, monkeypatch: pytest.MonkeyPatch):
+    id = uuid.uuid4()
+    sha256 = "ab" * 32
+    test_client = client(
+        {id: FilesDB(id=id, filename="a.pdf", sha256=sha256)}, set(), monkeypatch
+    )
+
+    def fetch(id, name):
+        raise AssertionError("the storage is not needed for a 304")
+
+    monkeypatch.setattr(storage, "fetch", fetch)
+    width = PREVIEW_SIZES["thumbnail"]
+    etag = f'"{preview_key(sha256, 0, width, PreviewFormat(PREVIEW_FORMAT))}"'
+
+    response = test_client.get(
+        "/files/preview", params={"id": str(id)}, headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
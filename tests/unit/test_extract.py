@@ -0,0 +1,73 @@
+import os
+import sys
+from pathlib import Path
+
+import fitz
+import pytest
+
+sys.path.append(".")
+
+from api.modules.ocr import extract as extract_module
+from api.modules.ocr.extract import TextMode, extract
+
+
+def write_pdf(path: Path, pages: list[str]) -> Path:
+    with fitz.open() as document:
+        for text in pages:
+            page = document.new_page()
+            page.insert_text((72, 72), text)
+        document.save(path)
+
+    return path
+
+
+def test_extract_text(tmp_path: Path):
+    path = write_pdf(tmp_path / "doc.pdf", ["first page", "", "third page"])
+
+    result = extract(path, use_cache=False)
+
+    assert result.page_count == 3
+    assert result.pages[0].strip() == "first page"
+    assert result.pages[1] == ""
+    assert result.has_text()
+    assert result.blocks is None and result.words is None
+
+
+def test_extract_words(tmp_path: Path):
+    path = write_pdf(tmp_path / "doc.pdf", ["hello world", "again"])
+
+    result = extract(path, TextMode.WORDS, use_cache=False)
+
+    assert [[word[4] for word in words] for words in result.words] == [
+        ["hello", "world"],
+        ["again"],
+    ]
+    x0, y0, x1, y1 = result.words[0][0][:4]
+    assert x0 < x1 and y0 < y1
+
+
+def test_extract_cache(tmp_path: Path):
+    path = write_pdf(tmp_path / "doc.pdf", ["cached"])
+
+    words = extract(path, TextMode.WORDS)
+    # a richer result also answers plain text requests
+    assert extract(path) is words
+    assert extract(path, TextMode.BLOCKS) is not words
+
+    # a rewritten file is extracted again
+    write_pdf(tmp_path / "doc.pdf", ["changed", "pages"])
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert extract(path).pages[0].strip() == "changed"
+
+
+def test_extract_parallel(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    pages = [f"page {i}" for i in range(10)]
+    path = write_pdf(tmp_path / "doc.pdf", pages)
+    monkeypatch.setattr(extract_module, "EXTRACT_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(extract_module, "EXTRACT_SHARD_PAGES", 3)
+
+    result = extract(path, TextMode.BLOCKS, max_workers=2, use_cache=False)
+
+    assert [page.strip() for page in result.pages] == pages
+    assert len(result.blocks) == len(pages)
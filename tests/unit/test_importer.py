@@ -0,0 +1,75 @@
+import os
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.append(".")
+
+from api.modules.importer.pipeline import (
+    Candidate,
+    ImportStats,
+    _batches,
+    _fan_out,
+    _list_folder,
+)
+
+
+def test_list_folder(tmp_path: Path):
+    (tmp_path / "b").mkdir()
+    (tmp_path / "a").mkdir()
+    (tmp_path / "scan.PDF").write_bytes(b"%PDF")
+    (tmp_path / "notes.txt").write_text("notes")
+    os.symlink(tmp_path, tmp_path / "loop")
+
+    folders, pdfs = _list_folder(tmp_path)
+
+    assert folders == [tmp_path / "a", tmp_path / "b"]
+    assert [(path, size) for path, size, _ in pdfs] == [(tmp_path / "scan.PDF", 4)]
+
+
+def test_batches():
+    async def collect() -> list[list[int]]:
+        queue = asyncio.Queue()
+        for item in [1, 2, 3, 4, 5, None]:
+            queue.put_nowait(item)
+
+        return [batch async for batch in _batches(queue, 2)]
+
+    assert asyncio.run(collect()) == [[1, 2], [3, 4], [5]]
+
+
+def test_fan_out():
+    async def run() -> list[str]:
+        source, target = asyncio.Queue(2), asyncio.Queue()
+
+        async def process(candidate: Candidate) -> Candidate | None:
+            await asyncio.sleep(0)
+            # dropped
+            if candidate.size % 2:
+                return None
+            candidate.sha256 = f"hash {candidate.size}"
+            return candidate
+
+        async def produce() -> None:
+            for size in range(10):
+                await source.put(Candidate(Path(f"{size}.pdf"), size, 0))
+            await source.put(None)
+
+        await asyncio.gather(produce(), _fan_out(source, target, process, 3))
+
+        results = []
+        while (candidate := target.get_nowait()) is not None:
+            results.append(candidate.sha256)
+        return results
+
+    assert sorted(asyncio.run(run())) == [f"hash {size}" for size in range(0, 10, 2)]
+
+
+def test_import_stats_report():
+    stats = ImportStats(found=10, skipped=2, imported=6, duplicates=1, failed=1)
+    stats.add_seconds("ocr", 1.5)
+    stats.add_seconds("ocr", 0.5)
+
+    assert stats.seconds == {"ocr": 2.0}
+    assert stats.docs_per_second > 0
+    assert "6 imported, 1 duplicates, 2 skipped, 1 failed of 10 found" in stats.report()
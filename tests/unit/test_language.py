@@ -3,7 +3,12 @@ import sys
 sys.path.append(".")
 
 from api.modules.language.languages import Languages
-from api.modules.language.detect_language import detect_language
+from api.modules.language.detect_language import (
+    detect_language,
+    detect_language_confidence,
+    detect_page_languages,
+    sample_text,
+)
 
 
 def test_languages_eq_and_init():
@@ -31,3 +36,47 @@ def test_detect_languages_en():
 def test_detect_languages_none():
     text = "34".encode()
     assert Languages.ENGLISH == detect_language(text)
+
+
+def test_detect_languages_fr():
+    text = "Veuillez trouver ci-joint la facture du mois dernier."
+    assert Languages.FRENCH == detect_language(text)
+
+
+def test_detect_languages_untrusted():
+    # numbers and short ids match french best, but hardly
+    detected = detect_language_confidence(
+        "Invoice No. 2024-001 Amount 120.00 EUR VAT 19%"
+    )
+
+    assert detected == {"language": Languages.ENGLISH, "confidence": 0.0}
+
+
+def test_detect_language_confidence():
+    detected = detect_language_confidence(
+        "Sehr geehrte Damen und Herren, anbei die Rechnung."
+    )
+
+    assert Languages.GERMAN == detected["language"]
+    assert 0.5 < detected["confidence"] <= 1
+
+
+def test_detect_page_languages():
+    pages = [
+        "Sehr geehrte Damen und Herren, anbei erhalten Sie die Rechnung für März.",
+        "Please find attached the invoice for March and the delivery note.",
+        "12",
+    ]
+    document, detected = detect_page_languages(pages)
+
+    assert [d["language"] for d in detected] == [
+        Languages.GERMAN,
+        Languages.ENGLISH,
+        document["language"],
+    ]
+
+
+def test_sample_text_is_bounded():
+    pages = ["word " * 1000] * 100
+
+    assert len(sample_text(pages, 4096)) <= 4096
@@ -0,0 +1,126 @@
+import sys
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import fitz
+import pytest
+
+sys.path.append(".")
+
+from api.modules.ocr import parallel
+from api.modules.ocr.ocr import OcrProfile, ocr_settings, read_sidecar, writes_pdf
+
+
+def test_read_sidecar(tmp_path: Path):
+    sidecar = tmp_path / "ocr.txt"
+    sidecar.write_text(
+        "[OCR skipped on page(s) 1-2]\fthird\n\f[OCR skipped on page(s) 4]\ffifth"
+    )
+
+    assert read_sidecar(sidecar, 5, [2, 4]) == {2: "third\n", 4: "fifth"}
+
+    sidecar.write_text("one\ftwo")
+    assert read_sidecar(sidecar, 2) == {0: "one", 1: "two"}
+
+
+def test_profiles():
+    assert writes_pdf(OcrProfile.ARCHIVAL)
+    assert not writes_pdf(OcrProfile.FAST_TEXT)
+    assert ocr_settings(False, True, OcrProfile.ARCHIVAL) != ocr_settings(
+        False, True, OcrProfile.FAST_TEXT
+    )
+
+
+def test_fast_text_returns_text(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    def ocr_pdf(input_pdf, output_pdf, skip_text, force, jobs, pages, profile, sidecar):
+        assert profile == OcrProfile.FAST_TEXT
+        sidecar.write_text("[OCR skipped on page(s) 1]\fscanned text")
+
+    monkeypatch.setattr(parallel, "ocr_pdf", ocr_pdf)
+
+    with fitz.open() as document:
+        document.new_page()
+        document.new_page()
+        document.save(tmp_path / "in.pdf")
+
+    text = parallel.ocr_pdf_parallel(
+        tmp_path / "in.pdf",
+        tmp_path / "out.pdf",
+        False,
+        True,
+        pages=[1],
+        profile=OcrProfile.FAST_TEXT,
+    )
+
+    assert text == {1: "scanned text"}
+    assert not (tmp_path / "out.pdf").exists()
+
+
+def test_queued_shards_hold_no_cores(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    budget = threading.BoundedSemaphore(8)
+    held = []
+
+    def ocr_pdf(input_pdf, output_pdf, skip_text, force, jobs, pages, profile, sidecar):
+        held.append(8 - budget._value)
+        time.sleep(0.01)
+        sidecar.write_text("text")
+
+    class Executor(ThreadPoolExecutor):
+        def __init__(self, max_workers, mp_context):
+            super().__init__(max_workers)
+
+    monkeypatch.setattr(parallel, "ocr_pdf", ocr_pdf)
+    monkeypatch.setattr(parallel, "ProcessPoolExecutor", Executor)
+    monkeypatch.setattr(parallel, "_core_budget", budget)
+
+    with fitz.open() as document:
+        for _ in range(48):
+            document.new_page()
+        document.save(tmp_path / "in.pdf")
+
+    text = parallel.ocr_pdf_parallel(
+        tmp_path / "in.pdf",
+        tmp_path / "out.pdf",
+        False,
+        True,
+        max_workers=2,
+        profile=OcrProfile.FAST_TEXT,
+    )
+
+    assert len(text) == 48
+    # 6 shards, but never more tokens than running shards
+    assert len(held) == 6 and max(held) <= 2
+    assert budget._value == 8
+
+
+def hold_cores(semaphore, held, cores: int, ready) -> None:
+    parallel.set_core_budget(semaphore, held)
+    for _ in range(cores):
+        parallel._core_budget.acquire()
+    ready.set()
+    time.sleep(60)
+
+
+def test_cores_of_killed_worker_come_back():
+    context = multiprocessing.get_context("fork")
+    budget = context.BoundedSemaphore(3)
+    held = context.Value("i", 0, lock=False)
+    ready = context.Event()
+
+    worker = context.Process(target=hold_cores, args=(budget, held, 2, ready))
+    worker.start()
+    assert ready.wait(10)
+    worker.kill()
+    worker.join()
+
+    # the dead worker still holds its cores
+    assert held.value == 2
+    assert budget.acquire(False) and not budget.acquire(False)
+    budget.release()
+
+    assert parallel.release_held(budget, held) == 2
+    assert held.value == 0
+    assert all(budget.acquire(False) for _ in range(3))
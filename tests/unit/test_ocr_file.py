@@ -0,0 +1,60 @@
+import sys
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.append(".")
+
+from api.auth import validate_token
+from api.db.models.users import User
+from api.modules.file.file_processor import FileProcessor
+from api.modules.storage.local import LocalStorage
+from api.routers.ocr import router as ocr_router
+
+
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(ocr_router.router)
+    app.dependency_overrides[validate_token] = lambda: User(id=uuid.uuid4())
+
+    return TestClient(app)
+
+
+def test_ocr_file_is_deleted(storage: LocalStorage, monkeypatch: pytest.MonkeyPatch):
+    def ocr(self, force=False, skip_text=True):
+        assert force and not skip_text
+        self.ocr_path.write_bytes(b"%PDF ocred")
+
+    monkeypatch.setattr(FileProcessor, "ocr", ocr)
+    monkeypatch.setattr(FileProcessor, "has_text", lambda self: True)
+
+    response = client().post(
+        "/ocr/ocr_file",
+        params={"force": True},
+        files={"upload_file": ("a.pdf", b"%PDF", "application/pdf")},
+    )
+
+    assert response.status_code == 200
+    assert response.content == b"%PDF ocred"
+    assert response.headers["file-has-ocr"] == "True"
+    # removed once sent, nothing refers to it
+    assert list(storage.ids()) == []
+
+
+def test_failed_ocr_file_is_deleted(
+    storage: LocalStorage, monkeypatch: pytest.MonkeyPatch
+):
+    def ocr(self, force=False, skip_text=True):
+        raise RuntimeError("ocr failed")
+
+    monkeypatch.setattr(FileProcessor, "ocr", ocr)
+
+    with pytest.raises(RuntimeError):
+        client().post(
+            "/ocr/ocr_file",
+            files={"upload_file": ("a.pdf", b"%PDF", "application/pdf")},
+        )
+
+    assert list(storage.ids()) == []
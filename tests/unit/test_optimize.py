@@ -0,0 +1,60 @@
+import os
+import sys
+import random
+from pathlib import Path
+
+import fitz
+
+sys.path.append(".")
+
+from api.db.models.jobs import off_peak
+from api.modules.file.optimize import optimize_pdf
+
+
+def write_scan(path: Path) -> Path:
+    # a noisy "scan", stored losslessly, with a text layer
+    noise = random.Random(0)
+    samples = bytes(
+        min(255, x // 6 + y // 3 + noise.randrange(16))
+        for y in range(560)
+        for x in range(400 * 3)
+    )
+    pixmap = fitz.Pixmap(fitz.csRGB, 400, 560, samples, False)
+
+    with fitz.open() as document:
+        page = document.new_page()
+        page.insert_image(page.rect, pixmap=pixmap)
+        page.insert_text((72, 72), "scanned text", render_mode=3)
+        document.save(path)
+
+    return path
+
+
+def test_optimize_pdf_recompresses_images(tmp_path: Path):
+    source = write_scan(tmp_path / "ocr.pdf")
+    size = os.path.getsize(source)
+
+    result = optimize_pdf(source, source)
+
+    assert result.method == "images"
+    assert result.size == os.path.getsize(source) < size
+    assert list(tmp_path.iterdir()) == [source]
+    with fitz.open(source) as document:
+        assert document[0].get_text().strip() == "scanned text"
+
+
+def test_optimize_pdf_keeps_small_gains(tmp_path: Path):
+    source = write_scan(tmp_path / "original.pdf")
+    target = tmp_path / "ocr.pdf"
+
+    result = optimize_pdf(source, target, min_gain=1.0)
+
+    assert result.method is None
+    assert not target.exists()
+
+
+def test_off_peak():
+    assert off_peak(23, "22-6") and off_peak(5, "22-6")
+    assert not off_peak(6, "22-6") and not off_peak(12, "22-6")
+    assert off_peak(3, "1-4") and not off_peak(4, "1-4")
+    assert off_peak(12, "")
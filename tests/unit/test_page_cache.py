@@ -0,0 +1,100 @@
+import os
+import sys
+import shutil
+from pathlib import Path
+
+import fitz
+import pikepdf
+import pytest
+
+sys.path.append(".")
+
+from api.modules.ocr import parallel
+from api.modules.ocr.ocr import OcrProfile
+from api.modules.ocr.page_cache import PageCache, page_keys
+
+
+def write_pdf(path: Path, pages: list[str]) -> Path:
+    with fitz.open() as document:
+        for text in pages:
+            document.new_page().insert_text((72, 72), text)
+        document.save(path)
+
+    return path
+
+
+def test_page_keys(tmp_path: Path):
+    first = write_pdf(tmp_path / "first.pdf", ["a", "b", "a"])
+    second = write_pdf(tmp_path / "second.pdf", ["b", "c"])
+
+    keys = page_keys(first, [0, 1, 2], "settings")
+    assert keys[0] == keys[2]
+    assert keys[0] != keys[1]
+    assert page_keys(second, [0], "settings")[0] == keys[1]
+    assert page_keys(first, [1], "other settings")[1] != keys[1]
+
+
+def test_page_cache_evicts_least_recently_used(tmp_path: Path):
+    source = write_pdf(tmp_path / "source.pdf", ["a", "b", "c"])
+    cache = PageCache(tmp_path / "cache", max_bytes=1)
+
+    with pikepdf.open(source) as pdf:
+        for key, page in zip(["aa01", "bb02", "cc03"], pdf.pages):
+            cache.put(key, page)
+    size = os.path.getsize(cache.get("aa01"))
+    assert cache.get("dd04") is None
+
+    # keep two pages, bb02 is the least recently used
+    for key, mtime in [("aa01", 3), ("bb02", 1), ("cc03", 2)]:
+        os.utime(cache._path(key), (mtime, mtime))
+    cache.max_bytes = 2 * size + 10
+
+    assert cache.evict() == 1
+    assert cache.get("bb02") is None
+    with pikepdf.open(cache.get("cc03")) as pdf:
+        assert len(pdf.pages) == 1
+
+
+def test_ocr_pdf_cached(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    ocred = []
+
+    def ocr_pdf(input_pdf, output_pdf, skip_text, force, jobs, pages, profile, sidecar):
+        ocred.append(pages)
+        shutil.copyfile(input_pdf, output_pdf)
+
+    monkeypatch.setattr(parallel, "ocr_pdf", ocr_pdf)
+    monkeypatch.setattr(parallel, "page_cache", PageCache(tmp_path / "cache", 2**30))
+
+    first = write_pdf(tmp_path / "first.pdf", ["a", "b", "c"])
+    parallel.ocr_pdf_parallel(first, tmp_path / "out1.pdf", False, True)
+    # b and c did not change
+    second = write_pdf(tmp_path / "second.pdf", ["x", "b", "c"])
+    parallel.ocr_pdf_parallel(second, tmp_path / "out2.pdf", False, True)
+    # other settings
+    parallel.ocr_pdf_parallel(second, tmp_path / "out3.pdf", True, False)
+
+    assert ocred == [[0, 1, 2], [0], [0, 1, 2]]
+    with fitz.open(tmp_path / "out2.pdf") as document:
+        assert [page.get_text().strip() for page in document] == ["x", "b", "c"]
+
+
+def test_ocr_pdf_cached_by_profile(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    profiles = []
+
+    def ocr_pdf(input_pdf, output_pdf, skip_text, force, jobs, pages, profile, sidecar):
+        profiles.append(profile)
+        shutil.copyfile(input_pdf, output_pdf)
+
+    monkeypatch.setattr(parallel, "ocr_pdf", ocr_pdf)
+    monkeypatch.setattr(parallel, "page_cache", PageCache(tmp_path / "cache", 2**30))
+    # as if fast text wrote a pdf too
+    monkeypatch.setattr(parallel, "writes_pdf", lambda profile: True)
+
+    source = write_pdf(tmp_path / "source.pdf", ["a", "b"])
+    for profile in [OcrProfile.ARCHIVAL, OcrProfile.FAST_TEXT, OcrProfile.FAST_TEXT]:
+        parallel.ocr_pdf_parallel(
+            source, tmp_path / "out.pdf", False, True, profile=profile
+        )
+
+    # the pages of one profile are not served for the other
+    assert profiles == [OcrProfile.ARCHIVAL, OcrProfile.FAST_TEXT]
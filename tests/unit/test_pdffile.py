@@ -0,0 +1,36 @@
+import io
+import sys
+import uuid
+
+import pytest
+
+sys.path.append(".")
+
+from api.modules.file import pdffile
+from api.modules.file.pdffile import FilesDB, PDFFile
+from api.modules.storage.base import OCR, ORIGINAL
+from api.modules.storage.local import LocalStorage
+
+
+def test_forced_ocr_replaces_linked_ocr_pdf(
+    storage: LocalStorage, monkeypatch: pytest.MonkeyPatch
+):
+    def ocr_pdf_parallel(input_pdf, output_pdf, skip_text, force, pages=None):
+        # ocrmypdf refuses force together with skip_text
+        assert force and not skip_text
+        output_pdf.write_bytes(b"%PDF ocred again")
+
+    monkeypatch.setattr(pdffile, "ocr_pdf_parallel", ocr_pdf_parallel)
+
+    original, duplicate = uuid.uuid4(), uuid.uuid4()
+    storage.put(original, ORIGINAL, io.BytesIO(b"%PDF"))
+    storage.put(original, OCR, io.BytesIO(b"%PDF ocred"))
+    storage.copy(original, duplicate, ORIGINAL)
+    storage.copy(original, duplicate, OCR)
+
+    file = PDFFile.load_with_db(FilesDB(id=duplicate, filename="a.pdf"))
+    file.ocr(True, skip_text=False)
+
+    assert file.ocr_path.read_bytes() == b"%PDF ocred again"
+    # the file it was linked from keeps its ocr result
+    assert storage.fetch(original, OCR).read_bytes() == b"%PDF ocred"
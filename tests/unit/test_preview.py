@@ -0,0 +1,55 @@
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import fitz
+import pytest
+from PIL import Image
+
+sys.path.append(".")
+
+from api.exceptions.file import PageNotFoundException
+from api.modules.cache.disk import DiskCache
+from api.modules.file import preview
+from api.modules.file.preview import PreviewFormat, get_preview, preview_key
+
+
+def write_pdf(path: Path) -> Path:
+    with fitz.open() as document:
+        document.new_page(width=600, height=800).insert_text((72, 72), "preview")
+        document.save(path)
+
+    return path
+
+
+@pytest.mark.parametrize("format", list(PreviewFormat))
+def test_get_preview(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, format):
+    cache = DiskCache(tmp_path / "cache", 2**20, "")
+    monkeypatch.setattr(preview, "preview_cache", cache)
+    path = write_pdf(tmp_path / "doc.pdf")
+    key = preview_key("sha", 0, 150, format)
+
+    image = Image.open(BytesIO(get_preview(path, key, 0, 150, format)))
+
+    assert image.format == format.upper()
+    assert image.size == (150, 200)
+    assert cache.get(key) is not None
+    # served from the cache, the pdf is not needed any more
+    path.unlink()
+    assert get_preview(path, key, 0, 150, format) == cache.get(key).read_bytes()
+
+
+def test_preview_key():
+    key = preview_key("sha", 0, 256, PreviewFormat.WEBP)
+
+    assert key == preview_key("sha", 0, 256, PreviewFormat.WEBP)
+    assert key != preview_key("sha", 1, 256, PreviewFormat.WEBP)
+    assert key != preview_key("sha", 0, 256, PreviewFormat.JPEG)
+    assert key != preview_key("other", 0, 256, PreviewFormat.WEBP)
+
+
+def test_preview_missing_page(tmp_path: Path):
+    with pytest.raises(PageNotFoundException):
+        preview.render_preview(
+            write_pdf(tmp_path / "doc.pdf"), 1, 150, PreviewFormat.WEBP
+        )
@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+sys.path.append(".")
+
+from api.routers.responses import RangeFileResponse, etag_matches, parse_range
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=90-1000", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=-1000", 100) == (0, 99)
+    # sent as a whole
+    assert parse_range("bytes=0-9,20-29", 100) is None
+    assert parse_range("items=0-9", 100) is None
+    assert parse_range("bytes=9-0", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+    with pytest.raises(ValueError):
+        parse_range("bytes=-0", 100)
+
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"ab"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_range_file_response(tmp_path: Path):
+    path = tmp_path / "file.pdf"
+    path.write_bytes(bytes(range(256)) * 1024)
+
+    app = Starlette(routes=[Route("/", lambda request: RangeFileResponse(path))])
+    client = TestClient(app)
+
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.content == path.read_bytes()
+    etag = response.headers["etag"]
+
+    response = client.get("/", headers={"Range": "bytes=1000-70000"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 1000-70000/{256 * 1024}"
+    assert response.content == path.read_bytes()[1000:70001]
+
+    response = client.get("/", headers={"Range": "bytes=1000-", "If-Range": '"old"'})
+    assert response.status_code == 200
+
+    response = client.get("/", headers={"Range": f"bytes={256 * 1024}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{256 * 1024}"
+
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
@@ -0,0 +1,143 @@
+import io
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.append(".")
+
+from api.modules.storage.base import OCR, ORIGINAL, shard
+from api.modules.storage.local import LocalStorage
+from api.modules.storage.migrate import copy_files, shard_legacy_folders
+
+
+def test_shard():
+    id = uuid.UUID("abcdef01-2345-6789-abcd-ef0123456789")
+    assert shard(id) == Path("ab", "cd", str(id))
+    assert shard(str(id)) == shard(id)
+
+
+def test_local_storage(tmp_path: Path):
+    storage = LocalStorage(tmp_path)
+    id, duplicate = uuid.uuid4(), uuid.uuid4()
+
+    result = storage.save(id, ORIGINAL, io.BytesIO(b"%PDF-1.7"))
+    assert result.size == 8 and result.sha256 is not None
+    assert storage.fetch(id, ORIGINAL) == Path(tmp_path, shard(id), ORIGINAL)
+    assert storage.fetch(id, OCR) is None
+
+    storage.copy(id, duplicate, ORIGINAL)
+    with storage.open(duplicate, ORIGINAL) as fr:
+        assert fr.read() == b"%PDF-1.7"
+
+    # flat folders and everything that is no document are skipped
+    (tmp_path / ".cache" / "previews").mkdir(parents=True)
+    legacy = uuid.uuid4()
+    storage.put(legacy, ORIGINAL, io.BytesIO(b"old"))
+    os.rename(Path(tmp_path, shard(legacy)), Path(tmp_path, str(legacy)))
+    assert storage.fetch(legacy, ORIGINAL) == Path(tmp_path, str(legacy), ORIGINAL)
+    assert sorted(storage.ids()) == sorted([id, duplicate, legacy])
+
+    storage.delete(duplicate)
+    assert not storage.exists(duplicate, ORIGINAL)
+    assert storage.exists(id, ORIGINAL)
+
+
+class SlowReader(io.BytesIO):
+    # the puts overlap for sure
+    def readinto(self, buffer) -> int:
+        time.sleep(0.001)
+        return super().readinto(buffer)
+
+
+def test_local_put_concurrently(tmp_path: Path):
+    storage = LocalStorage(tmp_path)
+    id = uuid.uuid4()
+    contents = [bytes([i]) * 1024 * 1024 for i in range(8)]
+
+    with ThreadPoolExecutor(8) as executor:
+        list(
+            executor.map(
+                lambda content: storage.put(id, ORIGINAL, SlowReader(content)),
+                contents,
+            )
+        )
+
+    # one of the puts, not a mix, and no temporary file left
+    assert storage.fetch(id, ORIGINAL).read_bytes() in contents
+    assert [path.name for path in storage.folder(id).iterdir()] == [ORIGINAL]
+
+
+def test_shard_legacy_folders(tmp_path: Path):
+    storage = LocalStorage(tmp_path)
+    ids = [uuid.uuid4() for _ in range(3)]
+    for id in ids:
+        Path(tmp_path, str(id)).mkdir()
+        Path(tmp_path, str(id), ORIGINAL).write_bytes(id.bytes)
+    (tmp_path / ".cache").mkdir()
+
+    assert shard_legacy_folders(storage, dry_run=True) == 3
+    assert len(list(storage.legacy_ids())) == 3
+    assert shard_legacy_folders(storage) == 3
+
+    assert list(storage.legacy_ids()) == []
+    assert (tmp_path / ".cache").is_dir()
+    for id in ids:
+        assert storage.fetch(id, ORIGINAL) == Path(tmp_path, shard(id), ORIGINAL)
+
+
+def test_copy_files(tmp_path: Path):
+    source = LocalStorage(tmp_path / "source")
+    target = LocalStorage(tmp_path / "target")
+    ids = [uuid.uuid4() for _ in range(3)]
+    for id in ids:
+        source.put(id, ORIGINAL, io.BytesIO(id.bytes))
+    source.put(ids[0], OCR, io.BytesIO(b"ocr"))
+    target.put(ids[1], ORIGINAL, io.BytesIO(ids[1].bytes))
+
+    assert copy_files(source, target, delete=True) == 3
+
+    assert list(source.ids()) == []
+    assert sorted(target.ids()) == sorted(ids)
+    with target.open(ids[0], OCR) as fr:
+        assert fr.read() == b"ocr"
+
+
+@pytest.mark.skipif(
+    "S3_TEST_ENDPOINT_URL" not in os.environ,
+    reason="needs an s3 compatible server, e.g. minio, at S3_TEST_ENDPOINT_URL",
+)
+def test_s3_storage(tmp_path: Path):
+    boto3 = pytest.importorskip("boto3")
+    from api.modules.storage.s3 import S3Storage
+
+    bucket = f"edms-test-{uuid.uuid4().hex[:8]}"
+    endpoint_url = os.environ["S3_TEST_ENDPOINT_URL"]
+    boto3.client("s3", endpoint_url=endpoint_url).create_bucket(Bucket=bucket)
+    storage = S3Storage(bucket, "files/", tmp_path / "cache", 1, endpoint_url)
+    id, duplicate = uuid.uuid4(), uuid.uuid4()
+
+    storage.save(id, ORIGINAL, io.BytesIO(b"%PDF-1.7"))
+    storage.copy(id, duplicate, ORIGINAL)
+    # just used
+    assert storage.evict() == 0
+    assert storage.evict(min_idle=0) == 2
+    assert storage.exists(duplicate, ORIGINAL)
+    assert not storage.exists(duplicate, OCR)
+    assert storage.fetch(duplicate, ORIGINAL).read_bytes() == b"%PDF-1.7"
+    assert sorted(storage.ids()) == sorted([id, duplicate])
+
+    # replaced by another node, the local copy is outdated
+    other = S3Storage(bucket, "files/", tmp_path / "other", 2**20, endpoint_url)
+    other.save(duplicate, ORIGINAL, io.BytesIO(b"%PDF-2.0"))
+    assert storage.fetch(duplicate, ORIGINAL).read_bytes() == b"%PDF-2.0"
+    with storage.open(duplicate, ORIGINAL) as fr:
+        assert fr.read() == b"%PDF-2.0"
+
+    storage.delete(id)
+    storage.delete(duplicate)
+    assert list(storage.ids()) == []
@@ -0,0 +1,76 @@
+import sys
+import hashlib
+import tempfile
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.append(".")
+
+from api.exceptions.file import FileTooLargeException
+from api.modules.file.stream import hash_file, link_file, replacing, spool_to_disk
+
+DATA = b"%PDF-1.7 " + bytes(range(256)) * 4096
+
+
+def test_spool_to_disk_hash(tmp_path: Path):
+    result = spool_to_disk(BytesIO(DATA), tmp_path / "out.pdf", chunk_size=4096)
+
+    assert result.size == len(DATA)
+    assert result.sha256 == hashlib.sha256(DATA).hexdigest()
+    assert (tmp_path / "out.pdf").read_bytes() == DATA
+    assert hash_file(tmp_path / "out.pdf") == result.sha256
+
+
+def test_spool_to_disk_in_kernel(tmp_path: Path):
+    with tempfile.TemporaryFile() as source:
+        source.write(DATA)
+        source.seek(9)
+
+        result = spool_to_disk(source, tmp_path / "out.pdf", with_hash=False)
+
+    assert result.sha256 is None
+    assert result.size == len(DATA) - 9
+    assert (tmp_path / "out.pdf").read_bytes() == DATA[9:]
+
+
+def test_spool_to_disk_max_size(tmp_path: Path):
+    with pytest.raises(FileTooLargeException):
+        spool_to_disk(BytesIO(DATA), tmp_path / "out.pdf", max_size=1024)
+
+    assert not (tmp_path / "out.pdf").exists()
+
+
+def test_replacing_keeps_links(tmp_path: Path):
+    source = tmp_path / "a.pdf"
+    source.write_bytes(b"shared")
+    link_file(source, tmp_path / "b.pdf")
+
+    with replacing(tmp_path / "b.pdf") as output:
+        output.write_bytes(b"own")
+
+    assert source.read_bytes() == b"shared"
+    assert (tmp_path / "b.pdf").read_bytes() == b"own"
+
+    with pytest.raises(RuntimeError):
+        with replacing(tmp_path / "b.pdf") as output:
+            output.write_bytes(b"partial")
+            raise RuntimeError()
+
+    assert (tmp_path / "b.pdf").read_bytes() == b"own"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.pdf", "b.pdf"]
+
+
+def test_link_file_concurrently(tmp_path: Path):
+    sources = []
+    for i in range(8):
+        sources.append(tmp_path / f"{i}.pdf")
+        sources[-1].write_bytes(b"same")
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(link_file, sources, [tmp_path / "target.pdf"] * 8))
+
+    assert (tmp_path / "target.pdf").read_bytes() == b"same"
+    assert len(list(tmp_path.iterdir())) == 9
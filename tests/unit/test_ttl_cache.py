@@ -0,0 +1,57 @@
+import sys
+import time
+
+sys.path.append(".")
+
+from api.modules.cache.ttl import TTLCache
+
+
+def test_get_set():
+    cache: TTLCache[str, int] = TTLCache(10, 60)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("b", 2) == 2
+
+
+def test_expiry():
+    cache: TTLCache[str, int] = TTLCache(10, 60)
+    cache.set("a", 1, ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache: TTLCache[str, int] = TTLCache(2, 60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # a is now the most recently used entry
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_invalidation():
+    cache: TTLCache[str, int] = TTLCache(10, 60)
+    cache.set("a", 1)
+    cache.set("b", 1)
+    cache.set("c", 2)
+
+    cache.pop("c")
+    assert cache.get("c") is None
+
+    cache.pop_where(lambda key, value: value == 1)
+    assert len(cache) == 0
+
+
+def test_disabled():
+    cache: TTLCache[str, int] = TTLCache(0, 60)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None